@@ -85,7 +85,9 @@ async def polling_main():
             await bot.delete_webhook(drop_pending_updates=True)
             logger.info("✅ Webhook очищен")
         
-        await dp.start_polling(bot, handle_signals=False)
+        # Обновления не запускаются отдельными задачами: dp сразу ставит их
+        # в очереди чатов, а при переполнении конвейера polling ждет
+        await dp.start_polling(bot, handle_signals=False, handle_as_tasks=False)
         
     except Exception as e:
         logger.error(f"❌ Критическая ошибка при запуске: {e}")
@@ -6,7 +6,7 @@ import os
 import asyncio
 import logging
 import os
-from aiogram import Bot, Dispatcher
+from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
@@ -34,8 +34,10 @@ bot = Bot(
     default=DefaultBotProperties(parse_mode=ParseMode.HTML)
 )
 
-# Создаем диспетчер с поддержкой FSM
-dp = Dispatcher(storage=MemoryStorage())
+# Создаем диспетчер с поддержкой FSM: обновления одного чата - по порядку,
+# разных чатов - параллельно (см. services.update_pipeline)
+from .services.update_pipeline import PipelineDispatcher
+dp = PipelineDispatcher(storage=MemoryStorage())
 
 
 # Импортируем и регистрируем handlers сразу
@@ -66,10 +68,19 @@ dp.include_router(fallback.router)
 
 # Подключаем middleware для обработки ошибок и мониторинга
 from .middlewares.error_handler import ErrorHandlerMiddleware, PerformanceMiddleware
+from .middlewares.request_store import RequestStoreMiddleware
+from .middlewares.unreachable import UnreachableResetMiddleware
+# Снимаем отметку «недоступен» до фильтров: пользователь мог написать что угодно
+dp.message.outer_middleware(UnreachableResetMiddleware())
+dp.callback_query.outer_middleware(UnreachableResetMiddleware())
 dp.message.middleware(PerformanceMiddleware(slow_threshold_ms=500))
 dp.callback_query.middleware(PerformanceMiddleware(slow_threshold_ms=500))
 dp.message.middleware(ErrorHandlerMiddleware())
 dp.callback_query.middleware(ErrorHandlerMiddleware())
+# Последним: видит ошибку обработчика раньше ErrorHandlerMiddleware и не фиксирует изменения
+request_store_middleware = RequestStoreMiddleware()
+dp.message.middleware(request_store_middleware)
+dp.callback_query.middleware(request_store_middleware)
 
 logger.info("Handlers зарегистрированы")
 logger.info("Middleware подключены")
@@ -140,6 +151,18 @@ async def on_startup():
         logger.error(f"❌ Ошибка запуска планировщика: {e}")
         # Продолжаем работу без планировщика
     
+    # Продолжаем рассылки, прерванные остановкой бота, и следим за новыми (outbox)
+    try:
+        from .services.broadcast_jobs import BroadcastJobManager
+        BroadcastJobManager.for_bot(bot).start()
+        logger.info("📤 Фоновая отправка рассылок запущена")
+    except Exception as e:
+        logger.error(f"❌ Ошибка продолжения рассылок: {e}")
+    
+    # Запускаем фоновую запись ID сообщений бота
+    from .services.message_manager import message_manager
+    message_manager.message_store.start()
+    
     # Запускаем мониторинг здоровья
     try:
         from .services.health_monitor import health_monitor
@@ -160,11 +183,25 @@ async def on_startup():
 
 async def on_shutdown():
     """Выполняется при остановке бота."""
+    # Дообрабатываем уже принятые обновления
+    await dp.pipeline.stop(timeout=10)
+    
     # Останавливаем планировщик
     scheduler = dp.get('scheduler')
     if scheduler:
         scheduler.stop()
     
+    # Останавливаем рассылки (прогресс сохраняется, после запуска они продолжатся)
+    from .services.broadcast_jobs import BroadcastJobManager
+    await BroadcastJobManager.for_bot(bot).stop()
+    
+    # Записываем несохраненные ID сообщений бота
+    from .services.message_manager import message_manager
+    try:
+        message_manager.message_store.stop()
+    except Exception as e:
+        logger.error(f"Ошибка записи ID сообщений: {e}")
+    
     # Останавливаем мониторинг здоровья
     health_monitor = dp.get('health_monitor')
     if health_monitor:
@@ -7,6 +7,7 @@ from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 from aiogram.filters import Command
 
 from ..services.acl import require_admin
+from ..services.broadcast_jobs import BroadcastJobManager
 from ..services.notify import NotificationService
 
 router = Router()
@@ -61,13 +62,16 @@ async def callback_broadcast_waiting(callback: CallbackQuery):
         await callback.answer("Ошибка: исходное сообщение не найдено.")
         return
     
+    # Рассылка выполняется в фоне заданием; прогресс показывается в этом же сообщении
     notify_service = NotificationService(callback.bot)
-    sent_count = await notify_service.broadcast_to_waiting(broadcast_text)
-    
-    await callback.message.edit_text(
-        f"✅ Сообщение разослано ожидающим в очереди.\n📤 Доставлено: {sent_count}"
+    broadcast_jobs = BroadcastJobManager.for_bot(callback.bot)
+    job_id = broadcast_jobs.create_message_job(
+        notify_service.get_waiting_recipients(), broadcast_text, title="ожидающим в очереди",
+        report_chat_id=callback.message.chat.id, report_message_id=callback.message.message_id
     )
-    await callback.answer()
+    broadcast_jobs.submit(job_id)
+    
+    await callback.answer(f"Рассылка {job_id} запущена")
 
 
 @router.callback_query(F.data.startswith("broadcast_teams:"))
@@ -91,10 +95,13 @@ async def callback_broadcast_teams(callback: CallbackQuery):
         await callback.answer("Ошибка: исходное сообщение не найдено.")
         return
     
+    # Рассылка выполняется в фоне заданием; прогресс показывается в этом же сообщении
     notify_service = NotificationService(callback.bot)
-    sent_count = await notify_service.broadcast_to_teams(broadcast_text)
-    
-    await callback.message.edit_text(
-        f"✅ Сообщение разослано участникам команд.\n📤 Доставлено: {sent_count}"
+    broadcast_jobs = BroadcastJobManager.for_bot(callback.bot)
+    job_id = broadcast_jobs.create_message_job(
+        notify_service.get_team_recipients(), broadcast_text, title="участникам команд",
+        report_chat_id=callback.message.chat.id, report_message_id=callback.message.message_id
     )
-    await callback.answer()
+    broadcast_jobs.submit(job_id)
+    
+    await callback.answer(f"Рассылка {job_id} запущена")
@@ -11,6 +11,9 @@ from ..services.storage import Storage
 
 router = Router()
 
+# Сколько найденных пользователей показывать в списке
+SEARCH_LIMIT = 20
+
 
 @router.message(Command("adm_change"))
 @require_admin
@@ -25,16 +28,22 @@ async def cmd_adm_change(message: Message):
     search_name = args[1].strip()
     storage = Storage()
     
-    # Ищем пользователя по полному имени
-    store = storage.load()
-    found_users = []
-    
-    for tg_id, user in store['users'].items():
-        if user.get('full_name') and search_name.lower() in user['full_name'].lower():
-            found_users.append((tg_id, user))
+    # Ищем пользователя по имени, username или ссылке (через поисковый индекс)
+    results = storage.search_users(search_name, limit=SEARCH_LIMIT)
+    found_users = [(hit.tg_id, user) for hit, user in results if hit.exact]
     
     if not found_users:
-        await message.reply(f"Пользователь с именем '{search_name}' не найден.")
+        if not results:
+            await message.reply(f"Пользователь с именем '{search_name}' не найден.")
+            return
+        
+        # Точных совпадений нет - предлагаем похожих, но ничего не меняем
+        response = f"Пользователь с именем '{search_name}' не найден. Возможно, имелся в виду:\n\n"
+        for hit, user in results:
+            response += f"• {user.get('full_name', 'Без имени')} (@{user.get('username', 'без username')})\n"
+            response += f"  ID: {hit.tg_id}\n\n"
+        response += "Используйте команду: /adm_change_id <tg_id> для точного выбора"
+        await message.reply(response)
         return
     
     if len(found_users) > 1:
@@ -99,17 +108,19 @@ async def _return_user_to_queue(storage: Storage, tg_id: int, user: dict) -> str
     elif user['status'] == 'teamed':
         # Пользователь в команде, убираем из команды и возвращаем в очередь
         team_id = user.get('team_id')
-        if team_id:
-            storage.remove_from_team(team_id, tg_id)
-        
-        storage.set_user_status(tg_id, 'waiting', None)
-        storage.enqueue(tg_id)
+        with storage.transaction():
+            if team_id:
+                storage.remove_from_team(team_id, tg_id)
+            
+            storage.set_user_status(tg_id, 'waiting', None)
+            storage.enqueue(tg_id)
         
         team_info = f" из команды {team_id}" if team_id else ""
         return f"✅ Пользователь {user_name} перемещен{team_info} в лист ожидания."
     
     else:
         # Неизвестный статус
-        storage.set_user_status(tg_id, 'waiting', None)
-        storage.enqueue(tg_id)
+        with storage.transaction():
+            storage.set_user_status(tg_id, 'waiting', None)
+            storage.enqueue(tg_id)
         return f"✅ Пользователь {user_name} перемещен в лист ожидания (был статус: {user['status']})."
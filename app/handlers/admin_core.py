@@ -119,6 +119,7 @@ async def show_admin_panel(bot, chat_id: int, user_id: int):
     keyboard = nav.create_simple_keyboard_with_back([
         ("📊 Статистика", "admin_stats"),
         ("👥 Команды", "admin_teams_export"),
+        ("👀 Предпросмотр матчинга", "admin_match_preview"),
         ("🔄 Провести матчинг", "admin_match"),
         ("💥 Расформировать команду", "admin_rematch_input"),
         ("📢 Рассылка", "admin_broadcast_input"),
@@ -206,6 +207,32 @@ async def callback_admin_match(callback: CallbackQuery):
         await callback.answer(f"Ошибка: {e}", show_alert=True)
 
 
+@router.callback_query(F.data == "admin_match_preview")
+async def callback_admin_match_preview(callback: CallbackQuery):
+    """Кнопка предпросмотра матчинга (общая очередь)."""
+    if not callback.from_user or not is_admin(callback.from_user.id):
+        await callback.answer("Нет прав доступа", show_alert=True)
+        return
+    
+    try:
+        from ..services.cohorts import get_cohort
+        from ..services.match_preview import get_match_preview
+        from ..services.matching_strategies import create_matcher
+        
+        response = get_match_preview(Storage(), get_cohort(None), create_matcher())
+        
+        keyboard = nav.create_simple_keyboard_with_back([
+            ("🔄 Провести матчинг", "admin_match"),
+            ("🏠 К панели", "back_to_admin_panel")
+        ], None)
+        
+        await message_manager.edit_and_store(callback, response, reply_markup=keyboard)
+        await callback.answer()
+        
+    except Exception as e:
+        await callback.answer(f"Ошибка: {e}", show_alert=True)
+
+
 @router.callback_query(F.data == "admin_rematch_input")
 async def callback_admin_rematch_input(callback: CallbackQuery):
     """Кнопка расформирования команды - запрос ID команды."""
@@ -493,8 +520,7 @@ async def callback_admin_teams_export(callback: CallbackQuery):
     
     try:
         storage = Storage()
-        data = storage.load()
-        teams = data.get('teams', {})
+        teams = storage.get_active_teams()
         
         if not teams:
             await message_manager.edit_and_store(
@@ -514,22 +540,22 @@ async def callback_admin_teams_export(callback: CallbackQuery):
         content = "# АКТИВНЫЕ КОМАНДЫ\n"
         content += f"# Сгенерировано: {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
         
-        for team_id, team in teams.items():
-            if team.get('status') == 'active':
-                content += f"КОМАНДА: {team_id}\n"
-                content += f"Создана: {team.get('created_at', 'неизвестно')}\n"
-                content += f"Участников: {len(team.get('members', []))}\n"
-                content += "Участники:\n"
-                
-                for member_id in team.get('members', []):
-                    users = data.get('users', {})
-                    user = users.get(str(member_id), {})
-                    full_name = user.get('full_name', 'неизвестно')
-                    telegram_link = user.get('telegram_link', 'неизвестно')
-                    username = user.get('username', '')
-                    content += f"  - {full_name} | {telegram_link} | @{username} | ID: {member_id}\n"
-                
-                content += "\n" + "="*50 + "\n\n"
+        # Участники всех команд одним чтением
+        users = storage.get_users(member_id for team in teams for member_id in team.get('members', []))
+        for team in teams:
+            content += f"КОМАНДА: {team['id']}\n"
+            content += f"Создана: {team.get('created_at', 'неизвестно')}\n"
+            content += f"Участников: {len(team.get('members', []))}\n"
+            content += "Участники:\n"
+            
+            for member_id in team.get('members', []):
+                user = users.get(str(member_id), {})
+                full_name = user.get('full_name', 'неизвестно')
+                telegram_link = user.get('telegram_link', 'неизвестно')
+                username = user.get('username', '')
+                content += f"  - {full_name} | {telegram_link} | @{username} | ID: {member_id}\n"
+            
+            content += "\n" + "="*50 + "\n\n"
         
         # Создаем файл в памяти
         file_content = content.encode('utf-8')
@@ -652,6 +678,7 @@ async def cmd_admin_help(message: Message):
 
 🛠️ **Полные команды:**
 • `/adm_stats` — подробная статистика
+• `/adm_match_preview` — предпросмотр матчинга
 • `/adm_match` — провести матчинг
 • `/adm_broadcast [текст]` — рассылка
 • `/adm_rematch <id> [--front]` — расформировать
@@ -761,11 +788,11 @@ async def callback_logout_all_sessions(callback: CallbackQuery):
     
     try:
         storage = Storage()
-        store = storage.load()
         
-        # Завершаем все сессии
-        for tg_id in list(store['admins'].keys()):
-            storage.set_admin(int(tg_id), False)
+        # Завершаем все активные сессии одной транзакцией
+        with storage.transaction():
+            for tg_id in storage.get_admin_ids():
+                storage.set_admin(tg_id, False)
         
         await message_manager.edit_and_store(callback, "🚪 Все админские сессии завершены.\n\nДля повторного входа используйте /admin <код>")
         await callback.answer("Все сессии завершены")
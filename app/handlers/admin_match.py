@@ -2,78 +2,84 @@
 Админская команда /adm_match для комплектования команд.
 """
 
-import os
+from typing import Optional
+
 from aiogram import Router
 from aiogram.types import Message
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 
 from ..services.acl import require_admin
+from ..services.broadcast_jobs import BroadcastJobManager
+from ..services.cohorts import get_cohort, load_cohorts
+from ..services.match_preview import get_match_preview
+from ..services.scheduler import MatchScheduler
 from ..services.storage import Storage
-from ..services.matcher import match_round
-from ..services.notify import NotificationService
+from ..services.matching_strategies import create_matcher
 
 router = Router()
 
 
 @router.message(Command("adm_match"))
 @require_admin
-async def cmd_adm_match(message: Message):
-    """Админская команда для проведения одного раунда комплектования."""
+async def cmd_adm_match(message: Message, command: Optional[CommandObject] = None,
+                        scheduler: Optional[MatchScheduler] = None):
+    """Админская команда для проведения одного раунда комплектования (/adm_match [когорта])."""
     storage = Storage()
-    notify_service = NotificationService(message.bot)
+    broadcast_jobs = BroadcastJobManager.for_bot(message.bot)
     
-    # Получаем настройки из env
-    team_base = int(os.getenv('TEAM_BASE', '5'))
-    elastic_max = int(os.getenv('ELASTIC_MAX', '2'))
+    # Получаем настройки когорты (без аргумента - общая очередь, TEAM_BASE/ELASTIC_MAX из env)
+    cohort_id = (command.args or '').strip() if command else ''
+    cohort = get_cohort(cohort_id)
+    if cohort is None:
+        await message.reply(f"Когорта {cohort_id} не найдена. Доступные: {', '.join(filter(None, load_cohorts())) or 'нет'}.")
+        return
+    team_base = cohort.team_base
     
-    # Загружаем текущее состояние
-    store = storage.load()
-    queue = store['queue'].copy()
+    # Проверяем размер очереди
+    queue_size = storage.get_queue_size(cohort.id)
     
-    if len(queue) < team_base:
-        await message.reply(f"Недостаточно людей в очереди для комплектования. Нужно минимум {team_base}, а в очереди {len(queue)}.")
+    if queue_size < team_base:
+        await message.reply(f"Недостаточно людей в очереди для комплектования. Нужно минимум {team_base}, а в очереди {queue_size}.")
         return
     
-    # Выполняем матчинг
-    teams_data, remaining_queue = match_round(queue, team_base, elastic_max)
+    # Считаем раунд вне цикла событий, как планировщик, и фиксируем команды
+    # одной транзакцией с заданием рассылки карточек (outbox)
+    if scheduler is not None:
+        created_teams = await scheduler.match_round(cohort, report_chat_id=message.chat.id)
+    else:
+        # Планировщик не запущен - временный, его пул процессов закрываем сразу
+        scheduler = MatchScheduler(message.bot)
+        try:
+            created_teams = await scheduler.match_round(cohort, report_chat_id=message.chat.id)
+        finally:
+            scheduler.stop()
     
-    if not teams_data:
+    if not created_teams:
         await message.reply("Не удалось сформировать ни одной команды.")
         return
     
-    # Создаем команды и обновляем пользователей
-    created_teams = []
-    for team_members in teams_data:
-        # Создаем команду в storage
-        team_id = storage.create_team(team_members)
-        
-        # Обновляем статус участников
-        for tg_id in team_members:
-            storage.set_user_status(tg_id, 'teamed', team_id)
-        
-        # Убираем участников из очереди
-        for tg_id in team_members:
-            storage.remove_from_queue(tg_id)
-        
-        created_teams.append(team_id)
-    
-    # Обновляем очередь (остаток)
-    store = storage.load()
-    store['queue'] = remaining_queue
-    storage.save(store)
-    
-    # Отправляем карточки командам
-    for team_id in created_teams:
-        team = storage.get_team(team_id)
-        if team:
-            await notify_service.send_team_card_to_members(team)
+    # Карточки рассылаются в фоне, прогресс - отдельным сообщением в этом чате
+    broadcast_jobs.resume()
     
     # Отвечаем админу
     teams_count = len(created_teams)
-    remaining_count = len(remaining_queue)
+    remaining_count = storage.get_queue_size(cohort.id)
     
     response = f"✅ Сформировано команд: {teams_count}\n"
     response += f"📋 Команды: {', '.join(created_teams)}\n"
     response += f"⏳ В очереди осталось: {remaining_count}"
     
     await message.reply(response)
+
+
+@router.message(Command("adm_match_preview"))
+@require_admin
+async def cmd_adm_match_preview(message: Message, command: Optional[CommandObject] = None):
+    """Показывает, какие команды сформирует раунд, ничего не меняя (/adm_match_preview [когорта])."""
+    cohort_id = (command.args or '').strip() if command else ''
+    cohort = get_cohort(cohort_id)
+    if cohort is None:
+        await message.reply(f"Когорта {cohort_id} не найдена. Доступные: {', '.join(filter(None, load_cohorts())) or 'нет'}.")
+        return
+    
+    await message.reply(get_match_preview(Storage(), cohort, create_matcher()))
@@ -6,7 +6,7 @@ import asyncio
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from aiogram import Router, F
+from aiogram import Dispatcher, Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 
@@ -19,6 +19,17 @@ logger = get_logger('admin_monitoring')
 router = Router()
 
 
+def format_pipeline_stats(dispatcher: Dispatcher) -> str:
+    """Строка с очередью обновлений (см. services.update_pipeline)."""
+    pipeline = getattr(dispatcher, 'pipeline', None)
+    if pipeline is None:
+        return ""
+    stats = pipeline.stats()
+    return (f"📥 <b>Очередь обновлений:</b> {stats['queued']}/{stats['queue_size']} "
+            f"(чатов {stats['chats']}, макс. {stats['max_queued']}), "
+            f"занято обработчиков {stats['busy']}/{stats['workers']}\n")
+
+
 @router.message(Command("health"))
 @require_admin
 async def cmd_health_check(message: Message):
@@ -123,7 +134,7 @@ async def callback_health_refresh(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "show_metrics")
-async def callback_show_metrics(callback: CallbackQuery):
+async def callback_show_metrics(callback: CallbackQuery, dispatcher: Dispatcher):
     """Показывает метрики производительности."""
     from ..services.acl import is_admin
     if not callback.from_user or not is_admin(callback.from_user.id):
@@ -142,6 +153,7 @@ async def callback_show_metrics(callback: CallbackQuery):
         text += f"🔘 <b>Callback'ов обработано:</b> {metrics.get('callbacks_processed', 0)}\n"
         text += f"❌ <b>Ошибок:</b> {metrics.get('errors_count', 0)}\n"
         text += f"👥 <b>Активных пользователей:</b> {metrics.get('active_users_count', 0)}\n"
+        text += format_pipeline_stats(dispatcher)
         
         # Время работы
         uptime_seconds = metrics.get('uptime_seconds', 0)
@@ -304,7 +316,7 @@ async def callback_view_log(callback: CallbackQuery):
 
 @router.message(Command("metrics"))
 @require_admin
-async def cmd_metrics(message: Message):
+async def cmd_metrics(message: Message, dispatcher: Dispatcher):
     """Быстрый просмотр метрик."""
     try:
         metrics = get_metrics()
@@ -314,6 +326,7 @@ async def cmd_metrics(message: Message):
         text += f"🔘 Callback'ов: {metrics.get('callbacks_processed', 0)}\n"
         text += f"❌ Ошибок: {metrics.get('errors_count', 0)}\n"
         text += f"👥 Активных пользователей: {metrics.get('active_users_count', 0)}\n"
+        text += format_pipeline_stats(dispatcher)
         
         uptime_seconds = metrics.get('uptime_seconds', 0)
         if uptime_seconds > 0:
@@ -7,6 +7,7 @@ from aiogram.types import Message
 from aiogram.filters import Command
 
 from ..services.acl import require_admin
+from ..services.cohorts import DEFAULT_COHORT
 from ..services.storage import Storage
 
 router = Router()
@@ -40,30 +41,25 @@ async def cmd_adm_rematch(message: Message):
     # Получаем участников команды
     members = team['members'].copy()
     
-    # Расформировываем команду
-    store = storage.load()
-    
-    # Архивируем команду
-    team['status'] = 'archived'
-    
-    # Обновляем статус участников
-    for tg_id in members:
-        storage.set_user_status(tg_id, 'waiting', None)
-    
-    # Добавляем участников в очередь
-    if add_to_front:
-        # Добавляем в начало очереди (в обратном порядке, чтобы сохранить порядок)
-        for tg_id in reversed(members):
-            if tg_id not in store['queue']:
-                store['queue'].insert(0, tg_id)
-    else:
-        # Добавляем в конец очереди
+    # Расформировываем команду одной транзакцией
+    with storage.transaction() as store:
+        # Архивируем команду
+        store['teams'][team_id]['status'] = 'archived'
+        
+        # Обновляем статус участников
         for tg_id in members:
-            if tg_id not in store['queue']:
-                store['queue'].append(tg_id)
-    
-    # Сохраняем изменения
-    storage.save(store)
+            storage.set_user_status(tg_id, 'waiting', None)
+        
+        # Возвращаем участников в очередь когорты команды (очередь создается при необходимости)
+        cohort = team.get('cohort') or DEFAULT_COHORT
+        if add_to_front:
+            # В начало очереди, сохраняя порядок участников
+            for tg_id in reversed(members):
+                storage.enqueue(tg_id, cohort, front=True)
+        else:
+            # В конец очереди
+            for tg_id in members:
+                storage.enqueue(tg_id, cohort)
     
     # Формируем ответ
     position_text = "в начало" if add_to_front else "в конец"
@@ -7,6 +7,7 @@ from aiogram.types import Message
 from aiogram.filters import Command
 
 from ..services.acl import require_admin
+from ..services.broadcast import BLOCKED, DEACTIVATED, NOT_FOUND
 from ..services.storage import Storage
 
 router = Router()
@@ -16,24 +17,43 @@ async def get_stats_response():
     """Получает текст статистики для отображения."""
     storage = Storage()
     
-    # Получаем основную статистику
-    queue_size = storage.get_queue_size()
-    active_teams_count = storage.get_active_teams_count()
-    avg_team_size = storage.get_active_teams_avg_size()
+    # Получаем основную статистику (агрегаты поддерживаются хранилищем)
+    stats = storage.get_stats()
+    queue_size = stats['queue_size']
+    active_teams_count = stats['active_teams']
+    avg_team_size = stats['active_members'] / active_teams_count if active_teams_count else 0.0
     
-    # Получаем первые 10 username в очереди
-    queue_usernames = storage.get_queue_usernames(limit=10)
+    # Размеры очередей когорт и первые 10 username в каждой непустой
+    queue_sizes = storage.get_queue_sizes()
+    queue_usernames = {cohort: storage.get_queue_usernames(limit=10, cohort=cohort)
+                       for cohort, size in queue_sizes.items() if size}
+    
+    # Недоступные получатели (пропускаются рассылками)
+    unreachable = storage.get_unreachable_stats()
     
     # Формируем ответ
     response = "📊 **Статистика бота**\n\n"
-    response += f"⏳ **Ожидающих в очереди:** {queue_size}\n"
+    response += f"⏳ **Ожидающих в очереди:** {queue_size}"
+    if len(queue_sizes) > 1:
+        response += " (" + ", ".join(
+            f"{cohort or 'общая'}: {size}" for cohort, size in queue_sizes.items()
+        ) + ")"
+    response += "\n"
     response += f"🏆 **Активных команд:** {active_teams_count}\n"
-    response += f"📈 **Средний размер команды:** {avg_team_size:.1f}\n\n"
+    response += f"📈 **Средний размер команды:** {avg_team_size:.1f}\n"
+    response += f"🚫 **Недоступны для рассылок:** {sum(unreachable.values())}"
+    if unreachable:
+        response += (f" (заблокировали бота: {unreachable.get(BLOCKED, 0)}, "
+                     f"удалили аккаунт: {unreachable.get(DEACTIVATED, 0)}, "
+                     f"чат не найден: {unreachable.get(NOT_FOUND, 0)})")
+    response += "\n\n"
     
     if queue_usernames:
-        response += "👥 **Первые в очереди:**\n"
-        for i, username in enumerate(queue_usernames, 1):
-            response += f"{i}. {username}\n"
+        for cohort, usernames in queue_usernames.items():
+            title = f" (когорта {cohort})" if cohort else ""
+            response += f"👥 **Первые в очереди{title}:**\n"
+            for i, username in enumerate(usernames, 1):
+                response += f"{i}. {username}\n"
     else:
         response += "👥 **Очередь пуста**\n"
     
@@ -284,11 +284,9 @@ async def notify_admins_about_update(webhook_data: dict, result: dict):
 
 {"⚠️ Запланирован перезапуск бота" if result['restart_required'] else "ℹ️ Перезапуск не требуется"}"""
         
-        for admin_id in admins:
-            try:
-                await bot.send_message(admin_id, message)
-            except Exception as e:
-                logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
+        # Админы, заблокировавшие бота, пропускаются по реестру недоступных
+        from ..services.broadcast import BroadcastEngine
+        await BroadcastEngine.for_bot(bot).broadcast(admins, message)
                 
     except Exception as e:
         logger.error(f"Ошибка уведомления админов: {e}")
@@ -6,12 +6,38 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
 from ..services.storage import Storage
+from ..services.async_storage import AsyncStorage
 from ..services.message_manager import message_manager
 from ..services.navigation import nav
 
 router = Router()
 
 
+def _return_to_queue(storage: Storage, team_id: str, tg_id: int) -> None:
+    """Убирает пользователя из команды и возвращает в очередь одной транзакцией."""
+    with storage.transaction():
+        # Убираем пользователя из команды
+        storage.remove_from_team(team_id, tg_id)
+        
+        # Возвращаем в статус ожидания и добавляем в очередь
+        storage.set_user_status(tg_id, 'waiting', None)
+        storage.enqueue(tg_id)
+
+
+def _leave_waiting(storage: Storage, team_id: str, tg_id: int) -> None:
+    """Убирает пользователя из команды и из очереди одной транзакцией."""
+    with storage.transaction():
+        # Убираем пользователя из команды
+        storage.remove_from_team(team_id, tg_id)
+        
+        # Убираем из очереди (если был там)
+        storage.remove_from_queue(tg_id)
+        
+        # Можно установить специальный статус или удалить пользователя
+        # Пока оставим в статусе waiting, но без очереди
+        storage.set_user_status(tg_id, 'waiting', None)
+
+
 @router.callback_query(F.data.startswith("team_confirm:"))
 async def callback_team_confirm(callback: CallbackQuery):
     """Обработчик подтверждения участия в команде."""
@@ -19,16 +45,16 @@ async def callback_team_confirm(callback: CallbackQuery):
         return
     
     team_id = callback.data.split(":", 1)[1]
-    storage = Storage()
+    storage = AsyncStorage()
     tg_id = callback.from_user.id
     
     # Проверяем, что пользователь действительно в этой команде
-    user = storage.get_user(tg_id)
+    user = await storage.get_user(tg_id)
     if not user or user.get('team_id') != team_id:
         await callback.answer("Ошибка: ты не состоишь в этой команде.", show_alert=True)
         return
     
-    team = storage.get_team(team_id)
+    team = await storage.get_team(team_id)
     if not team:
         await callback.answer("Ошибка: команда не найдена.", show_alert=True)
         return
@@ -48,11 +74,11 @@ async def callback_team_decline(callback: CallbackQuery):
         return
     
     team_id = callback.data.split(":", 1)[1]
-    storage = Storage()
+    storage = AsyncStorage()
     tg_id = callback.from_user.id
     
     # Проверяем, что пользователь действительно в этой команде
-    user = storage.get_user(tg_id)
+    user = await storage.get_user(tg_id)
     if not user or user.get('team_id') != team_id:
         await callback.answer("Ошибка: ты не состоишь в этой команде.", show_alert=True)
         return
@@ -77,19 +103,14 @@ async def callback_decline_return(callback: CallbackQuery):
         return
     
     team_id = callback.data.split(":", 1)[1]
-    storage = Storage()
+    storage = AsyncStorage()
     tg_id = callback.from_user.id
     
-    # Убираем пользователя из команды
-    storage.remove_from_team(team_id, tg_id)
-    
-    # Возвращаем в статус ожидания и добавляем в очередь
-    storage.set_user_status(tg_id, 'waiting', None)
-    storage.enqueue(tg_id)
+    await storage.run(_return_to_queue, storage.storage, team_id, tg_id)
     
     # Получаем информацию для ответа
     from .user_start import get_next_match_time
-    queue_count = len(storage.load()['queue'])
+    queue_count = (await storage.get_user_snapshot(tg_id))['queue_size']
     next_match_time = get_next_match_time()
     
     text = f"""Ты возвращен в лист ожидания.
@@ -110,18 +131,10 @@ async def callback_decline_leave(callback: CallbackQuery):
         return
     
     team_id = callback.data.split(":", 1)[1]
-    storage = Storage()
+    storage = AsyncStorage()
     tg_id = callback.from_user.id
     
-    # Убираем пользователя из команды
-    storage.remove_from_team(team_id, tg_id)
-    
-    # Убираем из очереди (если был там)
-    storage.remove_from_queue(tg_id)
-    
-    # Можно установить специальный статус или удалить пользователя
-    # Пока оставим в статусе waiting, но без очереди
-    storage.set_user_status(tg_id, 'waiting', None)
+    await storage.run(_leave_waiting, storage.storage, team_id, tg_id)
     
     keyboard = nav.create_keyboard_with_back([], "go_back_to_start")
     await message_manager.edit_and_store(callback,
@@ -6,9 +6,10 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command
 
-from ..services.storage import Storage
+from ..services.async_storage import AsyncStorage
 from ..services.message_manager import message_manager
 from ..services.navigation import nav
+from ..services.request_store import RequestStore
 
 router = Router()
 
@@ -25,16 +26,16 @@ async def cmd_leave(message: Message):
     if not message.from_user:
         return
     
-    storage = Storage()
+    storage = AsyncStorage()
     tg_id = message.from_user.id
     
-    user = storage.get_user(tg_id)
+    user = await storage.get_user(tg_id)
     if not user:
         await message_manager.answer_and_store(message, "Ты не зарегистрирован.")
         return
     
     # Проверяем, есть ли что покидать
-    in_queue = storage.get_queue_position(tg_id) != -1
+    in_queue = await storage.get_queue_position(tg_id) != -1
     in_team = user['status'] == 'teamed' and user.get('team_id')
     
     if not in_queue and not in_team:
@@ -53,34 +54,34 @@ async def cmd_leave(message: Message):
 
 
 @router.callback_query(F.data == "leave_confirm")
-async def callback_leave_confirm(callback: CallbackQuery):
+async def callback_leave_confirm(callback: CallbackQuery, request_store: RequestStore):
     """Обработчик подтверждения выхода."""
     if not callback.from_user:
         return
     
-    storage = Storage()
+    storage = AsyncStorage()
     tg_id = callback.from_user.id
     
-    user = storage.get_user(tg_id)
+    user = await storage.get_user(tg_id)
     if not user:
         await message_manager.edit_and_store(callback, "Ошибка: пользователь не найден.")
         return
     
     # Убираем из очереди
-    removed_from_queue = storage.remove_from_queue(tg_id)
+    removed_from_queue = await storage.remove_from_queue(tg_id)
     
     # Убираем из команды, если был в команде
     if user['status'] == 'teamed' and user.get('team_id'):
         team_id = user['team_id']
-        storage.remove_from_team(team_id, tg_id)
-        storage.set_user_status(tg_id, 'waiting', None)
+        await storage.remove_from_team(team_id, tg_id)
+        await storage.set_user_status(tg_id, 'waiting', None)
         
         keyboard = nav.create_keyboard_with_back([], None)  # Убираем кнопку "Назад"
         await message_manager.edit_and_store(callback, LEAVE_SUCCESS_TEAM_TEXT, reply_markup=keyboard)
     elif removed_from_queue:
         # После выхода из очереди показываем стартовый экран
         from .user_start import show_registered_user_start_screen
-        success = await show_registered_user_start_screen(callback.message, tg_id)
+        success = await show_registered_user_start_screen(callback.message, tg_id, request_store)
         if not success:
             # Если не удалось показать стартовый экран, показываем простое сообщение
             keyboard = nav.create_keyboard_with_back([], None)  # Убираем кнопку "Назад" 
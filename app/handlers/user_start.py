@@ -3,15 +3,19 @@
 """
 
 import logging
+from typing import Optional
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
-from aiogram.filters import CommandStart
+from aiogram.filters import CommandObject, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from ..services.storage import Storage
+from ..services.async_storage import AsyncStorage
+from ..services.broadcast import BroadcastEngine
+from ..services.cohorts import get_cohort
 from ..services.message_manager import message_manager
 from ..services.navigation import nav
+from ..services.request_store import RequestStore
 
 logger = logging.getLogger(__name__)
 
@@ -54,8 +58,9 @@ QUESTION_SENT_TEXT = """Ваш вопрос отправлен организа
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
-    """Обработчик команды /start."""
+async def cmd_start(message: Message, state: FSMContext, request_store: RequestStore,
+                    command: Optional[CommandObject] = None):
+    """Обработчик команды /start (ссылка ?start=<когорта> записывает в когорту)."""
     if not message.from_user:
         logger.warning("Получена команда /start без информации о пользователе")
         return
@@ -68,9 +73,16 @@ async def cmd_start(message: Message, state: FSMContext):
         # Очищаем состояние FSM на всякий случай
         await state.clear()
         
-        storage = Storage()
-        user = storage.get_user(tg_id)
+        user = await request_store.get_user()
         logger.debug(f"Пользователь {tg_id}: {user}")
+        
+        # Пользователь пришел по ссылке когорты - следующая постановка в очередь будет в нее
+        # (если он уже ждет в другой очереди, когорту не меняем)
+        cohort = get_cohort(command.args) if command and command.args else None
+        if (cohort and cohort.id and (user or {}).get('cohort') != cohort.id
+                and await request_store.get_queue_position() == -1):
+            request_store.write('update_user', tg_id, cohort=cohort.id)
+            logger.info(f"Пользователь {tg_id} записан в когорту {cohort.id}")
     except Exception as e:
         logger.error(f"Ошибка при обработке /start для {tg_id}: {e}")
         await message.reply("Произошла ошибка. Попробуйте позже.")
@@ -92,7 +104,7 @@ async def cmd_start(message: Message, state: FSMContext):
         ], None)  # Нет кнопки "Назад" на главном экране
         
         # Пытаемся использовать кэшированный file_id
-        stored_file_id = storage.get_cached_photo_file_id()
+        stored_file_id = await request_store.storage.get_cached_photo_file_id()
         
         try:
             if stored_file_id:
@@ -119,7 +131,7 @@ async def cmd_start(message: Message, state: FSMContext):
                 # Сохраняем file_id для будущих быстрых отправок
                 if sent_message.photo:
                     largest_photo = max(sent_message.photo, key=lambda p: p.file_size or 0)
-                    storage.cache_photo_file_id(largest_photo.file_id)
+                    request_store.write('cache_photo_file_id', largest_photo.file_id)
                     logger.info(f"📸 Сохранен file_id для быстрых отправок: {largest_photo.file_id}")
                 
                 message_manager.store_message(tg_id, sent_message.message_id)
@@ -173,23 +185,24 @@ async def callback_start_bot(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "start_registration")
-async def callback_start_registration(callback: CallbackQuery, state: FSMContext):
+async def callback_start_registration(callback: CallbackQuery, state: FSMContext, request_store: RequestStore):
     """Начинаем процесс регистрации или добавляем в очередь уже зарегистрированного пользователя."""
     if not callback.from_user:
         return
     
-    storage = Storage()
     tg_id = callback.from_user.id
-    user = storage.get_user(tg_id)
+    user = await request_store.get_user()
     
     # Если пользователь уже зарегистрирован, сразу добавляем в очередь
     if user and user.get('full_name') and user.get('telegram_link'):
         # Обновляем статус на waiting и добавляем в очередь
-        storage.set_user_status(tg_id, 'waiting', None)
-        storage.enqueue(tg_id)
+        request_store.write('set_user_status', tg_id, 'waiting', None)
+        request_store.write('enqueue', tg_id)
+        # Размер очереди нужен уже с пользователем - фиксируем изменения сразу
+        await request_store.commit()
         
         # Показываем экран успешного присоединения
-        queue_count = len(storage.load()['queue'])
+        queue_count = await request_store.get_queue_size()
         next_match_time = get_next_match_time()
         
         text = JOIN_SUCCESS_TEXT.format(
@@ -254,7 +267,7 @@ async def callback_write_question(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.in_(["go_back", "go_back_to_start"]))
-async def callback_go_back(callback: CallbackQuery, state: FSMContext):
+async def callback_go_back(callback: CallbackQuery, state: FSMContext, request_store: RequestStore):
     """Возврат к предыдущему экрану."""
     if not callback.from_user:
         return
@@ -268,16 +281,15 @@ async def callback_go_back(callback: CallbackQuery, state: FSMContext):
         
         await state.clear()
         
-        storage = Storage()
-        user = storage.get_user(tg_id)
+        user = await request_store.get_user()
         
         # Если пользователь уже зарегистрирован
         if user and user.get('full_name') and user.get('telegram_link'):
             if user.get('status') == 'waiting':
                 # Проверяем, действительно ли пользователь в очереди
-                in_queue = storage.get_queue_position(tg_id) != -1
+                in_queue = await request_store.get_queue_position() != -1
                 if in_queue:
-                    queue_count = len(storage.load()['queue'])
+                    queue_count = await request_store.get_queue_size()
                     next_match_time = get_next_match_time()
                     text = JOIN_SUCCESS_TEXT.format(
                         queue_count=queue_count,
@@ -375,8 +387,8 @@ async def process_question(message: Message, state: FSMContext):
         await message.reply("Пожалуйста, введи вопрос текстом.")
         return
     
-    storage = Storage()
-    question_id = storage.create_question(
+    storage = AsyncStorage()
+    question_id = await storage.create_question(
         user_id=message.from_user.id,
         username=message.from_user.username,
         text=message.text
@@ -460,17 +472,17 @@ async def process_telegram_link(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "confirm_registration")
-async def callback_confirm_registration(callback: CallbackQuery, state: FSMContext):
+async def callback_confirm_registration(callback: CallbackQuery, state: FSMContext, request_store: RequestStore):
     """Подтверждение регистрации и добавление в очередь."""
     if not callback.from_user:
         return
     
     data = await state.get_data()
-    storage = Storage()
     tg_id = callback.from_user.id
     
     # Создаем/обновляем пользователя
-    storage.update_user(
+    request_store.write(
+        'update_user',
         tg_id=tg_id,
         username=callback.from_user.username,
         name=callback.from_user.full_name,
@@ -479,11 +491,12 @@ async def callback_confirm_registration(callback: CallbackQuery, state: FSMConte
         status='waiting'
     )
     
-    # Добавляем в очередь
-    storage.enqueue(tg_id)
+    # Добавляем в очередь (одной транзакцией с данными пользователя)
+    request_store.write('enqueue', tg_id)
+    await request_store.commit()
     
     # Получаем информацию для ответа
-    queue_count = len(storage.load()['queue'])
+    queue_count = await request_store.get_queue_size()
     next_match_time = get_next_match_time()
     
     text = JOIN_SUCCESS_TEXT.format(
@@ -515,13 +528,14 @@ def get_next_match_time() -> str:
     return scheduler.get_next_match_time_str()
 
 
-async def show_registered_user_start_screen(callback_or_message, tg_id: int):
+async def show_registered_user_start_screen(callback_or_message, tg_id: int,
+                                            request_store: Optional[RequestStore] = None):
     """
     Показывает стартовый экран для зарегистрированного пользователя.
     Может использоваться как после выхода из очереди, так и при повторном /start.
     """
-    storage = Storage()
-    user = storage.get_user(tg_id)
+    request_store = request_store or RequestStore(tg_id)
+    user = await request_store.get_user()
     
     if not user or not user.get('full_name') or not user.get('telegram_link'):
         # Пользователь не полностью зарегистрирован
@@ -529,11 +543,11 @@ async def show_registered_user_start_screen(callback_or_message, tg_id: int):
     
     if user.get('status') == 'waiting':
         # Проверяем, действительно ли пользователь в очереди
-        in_queue = storage.get_queue_position(tg_id) != -1
+        in_queue = await request_store.get_queue_position() != -1
         
         if in_queue:
             # Пользователь в очереди - показываем экран ожидания
-            queue_count = len(storage.load()['queue'])
+            queue_count = await request_store.get_queue_size()
             next_match_time = get_next_match_time()
             text = JOIN_SUCCESS_TEXT.format(
                 queue_count=queue_count,
@@ -568,19 +582,13 @@ async def show_registered_user_start_screen(callback_or_message, tg_id: int):
 
 async def notify_admins_about_question(bot, question_id: str, user, question_text: str):
     """Уведомляет всех администраторов о новом вопросе."""
-    storage = Storage()
-    store = storage.load()
+    admin_ids = await AsyncStorage().get_admin_ids()
     
     user_mention = f"@{user.username}" if user.username else f"ID {user.id}"
     admin_text = f"📋 Новый вопрос от пользователя {user_mention}:\n\n{question_text}\n\n💬 Для ответа используй: /answer {question_id} ваш_ответ"
     
-    for admin_id, is_admin in store['admins'].items():
-        if is_admin:
-            try:
-                await bot.send_message(admin_id, admin_text)
-            except Exception as e:
-                # Игнорируем ошибки отправки (админ мог заблокировать бота)
-                print(f"Не удалось отправить уведомление админу {admin_id}: {e}")
+    # Админы, заблокировавшие бота, пропускаются по реестру недоступных
+    await BroadcastEngine.for_bot(bot).broadcast(sorted(admin_ids), admin_text)
 
 
 # Обработчики кнопок из основного интерфейса
@@ -612,23 +620,20 @@ async def callback_status(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "leave")
-async def callback_leave(callback: CallbackQuery):
+async def callback_leave(callback: CallbackQuery, request_store: RequestStore):
     """Обработчик кнопки 'Выйти из ожидания объединения'."""
     if not callback.from_user:
         return
     
     try:
-        storage = Storage()
-        tg_id = callback.from_user.id
-        
-        user = storage.get_user(tg_id)
+        user = await request_store.get_user()
         if not user:
             await callback.message.edit_text("Ошибка: пользователь не найден.")
             await callback.answer()
             return
         
         # Проверяем, есть ли что покидать
-        in_queue = storage.get_queue_position(tg_id) != -1
+        in_queue = await request_store.get_queue_position() != -1
         in_team = user.get('status') == 'teamed' and user.get('team_id')
         
         if not in_queue and not in_team:
@@ -659,7 +664,7 @@ async def callback_leave(callback: CallbackQuery):
 
 # ОБЩИЙ ОБРАБОТЧИК СООБЩЕНИЙ - ДОЛЖЕН БЫТЬ ПОСЛЕДНИМ!
 @router.message(~F.text.startswith('/'))
-async def handle_any_message(message: Message, state: FSMContext):
+async def handle_any_message(message: Message, state: FSMContext, request_store: RequestStore):
     """
     Обработчик любых НЕ-командных сообщений от пользователя. 
     Для новых пользователей автоматически показывает стартовый экран.
@@ -676,8 +681,7 @@ async def handle_any_message(message: Message, state: FSMContext):
         return
     
     tg_id = message.from_user.id
-    storage = Storage()
-    user = storage.get_user(tg_id)
+    user = await request_store.get_user()
     
     try:
         # Если пользователь не зарегистрирован - НЕ показываем экран, а перенаправляем на /start
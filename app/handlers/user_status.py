@@ -6,7 +6,7 @@ from aiogram import Router
 from aiogram.types import Message
 from aiogram.filters import Command
 
-from ..services.storage import Storage
+from ..services.async_storage import AsyncStorage
 from ..services.notify import NotificationService
 from ..services.message_manager import message_manager
 from ..services.navigation import nav
@@ -20,11 +20,11 @@ async def cmd_status(message: Message):
     if not message.from_user:
         return
     
-    storage = Storage()
+    storage = AsyncStorage()
     notify_service = NotificationService(message.bot)
     tg_id = message.from_user.id
     
-    user = storage.get_user(tg_id)
+    user = await storage.get_user(tg_id)
     
     if not user:
         await message_manager.answer_and_store(message, "Ты не зарегистрирован. Используй /start для регистрации.")
@@ -32,12 +32,12 @@ async def cmd_status(message: Message):
     
     if user['status'] == 'waiting':
         # Пользователь в очереди
-        position = storage.get_queue_position(tg_id)
+        position = await storage.get_queue_position(tg_id)
         if position == -1:
             await message_manager.answer_and_store(message, "Ты не в очереди. Используй /start и нажми 'Присоединиться'.")
         else:
             from .user_start import get_next_match_time
-            queue_count = len(storage.load()['queue'])
+            queue_count = await storage.get_queue_size(user.get('cohort'))
             next_match_time = get_next_match_time()
             
             text = f"""В ожидании сейчас {queue_count} человек.
@@ -57,7 +57,7 @@ async def cmd_status(message: Message):
             await message_manager.answer_and_store(message, "Ошибка: статус 'teamed', но team_id не найден.")
             return
         
-        team = storage.get_team(team_id)
+        team = await storage.get_team(team_id)
         if not team:
             await message_manager.answer_and_store(message, f"Ошибка: команда {team_id} не найдена.")
             return
@@ -0,0 +1,43 @@
+"""
+Middleware, передающий обработчику RequestStore и фиксирующий его изменения.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from ..services.async_storage import AsyncStorage
+from ..services.request_store import RequestStore
+
+
+class RequestStoreMiddleware(BaseMiddleware):
+    """
+    Кладет в data['request_store'] снимок хранилища для автора обновления.
+
+    Регистрируется как внутренний middleware: срабатывает только для
+    найденного обработчика. Изменения записываются одной транзакцией после
+    успешного завершения обработчика и отбрасываются при ошибке.
+    """
+
+    def __init__(self, storage: Optional[AsyncStorage] = None):
+        super().__init__()
+        # Один AsyncStorage на процесс: без создания Storage на каждое обновление
+        self.storage = storage or AsyncStorage()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = getattr(event, 'from_user', None)
+        request_store = RequestStore(user.id if user else None, self.storage)
+        data['request_store'] = request_store
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            request_store.discard()
+            raise
+        await request_store.commit()
+        return result
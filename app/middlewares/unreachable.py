@@ -0,0 +1,35 @@
+"""
+Middleware, убирающий пользователя из реестра недоступных, когда он снова пишет боту.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from ..services.async_storage import AsyncStorage
+from ..services.logger import get_logger
+from ..services.storage import Storage
+
+logger = get_logger('middleware')
+
+
+class UnreachableResetMiddleware(BaseMiddleware):
+    """Снимает отметку «недоступен» с автора сообщения или нажатия кнопки."""
+
+    def __init__(self, storage: Optional[Storage] = None):
+        super().__init__()
+        self.storage = storage or Storage()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = getattr(event, 'from_user', None)
+        # Проверка - поиск в закэшированном Store; запись только для тех, кто в реестре
+        if user is not None and self.storage.is_unreachable(user.id):
+            if await AsyncStorage(storage=self.storage).clear_unreachable(user.id):
+                logger.info(f"Пользователь {user.id} снова доступен")
+        return await handler(event, data)
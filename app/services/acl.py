@@ -3,8 +3,9 @@
 """
 
 import os
+import time
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, FrozenSet, Optional, Set
 from aiogram import types
 
 from .storage import Storage
@@ -16,11 +17,63 @@ def get_storage() -> Storage:
     return Storage()
 
 
+class AdminACL:
+    """
+    Решения о правах админа без чтения хранилища на каждую проверку.
+    
+    Белый список ADMINS разбирается один раз при создании, runtime-админы
+    держатся в памяти и перечитываются не чаще раза в ttl секунд
+    (ACL_CACHE_SECONDS, по умолчанию 60) - это срок, за который доходят
+    изменения из других процессов. Изменения через Storage.set_admin в этом
+    процессе сбрасывают кэш сразу.
+    """
+    
+    def __init__(self, storage: Optional[Storage] = None, ttl: Optional[float] = None):
+        self.storage = storage or get_storage()
+        self.ttl = ttl if ttl is not None else float(os.getenv('ACL_CACHE_SECONDS', '60'))
+        self.env_admins: FrozenSet[int] = frozenset(parse_int_list(os.getenv('ADMINS', '')))
+        self._runtime_admins: Optional[Set[int]] = None
+        self._loaded_at = 0.0
+        self._version = -1
+    
+    def is_admin_by_env(self, tg_id: int) -> bool:
+        """Проверяет белый список из env."""
+        return tg_id in self.env_admins
+    
+    def runtime_admins(self) -> Set[int]:
+        """Возвращает runtime-админов, перечитывая их по истечении ttl или после set_admin."""
+        now = time.monotonic()
+        version = self.storage.admins_version
+        if (self._runtime_admins is None or version != self._version
+                or now - self._loaded_at >= self.ttl):
+            self._runtime_admins = self.storage.get_admin_ids()
+            self._loaded_at = now
+            self._version = version
+        return self._runtime_admins
+    
+    def is_admin(self, tg_id: int) -> bool:
+        """Проверяет белый список из env и runtime-права."""
+        return self.is_admin_by_env(tg_id) or tg_id in self.runtime_admins()
+    
+    def invalidate(self) -> None:
+        """Сбрасывает кэш runtime-админов."""
+        self._runtime_admins = None
+
+
+_acl: Optional[AdminACL] = None
+
+
+def get_acl() -> AdminACL:
+    """Возвращает общий для процесса AdminACL (создается при первой проверке)."""
+    global _acl
+    if _acl is None:
+        _acl = AdminACL()
+    return _acl
+
+
 def is_admin_by_env(tg_id: int) -> bool:
     """Проверяет, является ли пользователь админом согласно переменной окружения ADMINS."""
-    admins_str = os.getenv('ADMINS', '')
-    admin_ids = parse_int_list(admins_str)
-    return tg_id in admin_ids
+    return get_acl().is_admin_by_env(tg_id)
 
 
 def is_admin(tg_id: int) -> bool:
@@ -28,13 +81,7 @@ def is_admin(tg_id: int) -> bool:
     Проверяет, является ли пользователь админом.
     Проверяет как белый список из env, так и runtime-права в storage.
     """
-    # Проверяем белый список из env
-    if is_admin_by_env(tg_id):
-        return True
-    
-    # Проверяем runtime-права из storage
-    storage = get_storage()
-    return storage.is_admin(tg_id)
+    return get_acl().is_admin(tg_id)
 
 
 def require_admin(func: Callable) -> Callable:
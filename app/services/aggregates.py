@@ -0,0 +1,89 @@
+"""
+Агрегаты хранилища: размер очередей всех когорт, команды и пользователи по статусам.
+
+Агрегаты хранятся в Store (коллекция stats) и поддерживаются инкрементально:
+при фиксации транзакции Storage передает сюда прежний и новый вид каждой
+затронутой записи users/teams, поэтому статистика обновляется за время,
+пропорциональное изменению, а не размеру хранилища. Полный пересчет
+нужен только для данных без stats и при замене коллекции целиком.
+"""
+
+from typing import Any, Dict, Optional
+
+from ..types import Store
+from .storage_backends import is_queue_collection
+
+# Ключ Store с агрегатами
+STATS_KEY = 'stats'
+
+# Коллекции, изменения записей которых влияют на агрегаты
+AGGREGATED_COLLECTIONS = frozenset({'users', 'teams'})
+
+
+def empty_stats() -> Dict[str, Any]:
+    """Возвращает агрегаты пустого хранилища."""
+    return {
+        'queue_size': 0,
+        'users_total': 0,
+        'users_by_status': {},
+        'teams_total': 0,
+        'active_teams': 0,
+        'active_members': 0,
+    }
+
+
+def queue_size(store: Store) -> int:
+    """Суммарный размер очередей всех когорт (общей и queue.<id>)."""
+    return sum(len(value or []) for name, value in store.items() if is_queue_collection(name))
+
+
+def compute_stats(store: Store) -> Dict[str, Any]:
+    """Считает агрегаты полным проходом по Store."""
+    stats = empty_stats()
+    stats['queue_size'] = queue_size(store)
+    for user in (store.get('users') or {}).values():
+        apply_change(stats, 'users', None, user)
+    for team in (store.get('teams') or {}).values():
+        apply_change(stats, 'teams', None, team)
+    return stats
+
+
+def apply_change(stats: Dict[str, Any], collection: str,
+                 before: Optional[dict], after: Optional[dict]) -> None:
+    """
+    Учитывает в агрегатах изменение одной записи.
+
+    Args:
+        stats: Агрегаты (изменяются на месте)
+        collection: 'users' или 'teams'
+        before: Запись до изменения (None - записи не было)
+        after: Запись после изменения (None - запись удалена)
+    """
+    if collection == 'users':
+        _count_user(stats, before, -1)
+        _count_user(stats, after, 1)
+    elif collection == 'teams':
+        _count_team(stats, before, -1)
+        _count_team(stats, after, 1)
+
+
+def _count_user(stats: Dict[str, Any], user: Optional[dict], sign: int) -> None:
+    """Добавляет (sign=1) или вычитает (sign=-1) пользователя из агрегатов."""
+    if not isinstance(user, dict):
+        return
+    stats['users_total'] += sign
+    by_status = stats['users_by_status']
+    status = user.get('status') or 'unknown'
+    by_status[status] = by_status.get(status, 0) + sign
+    if not by_status[status]:
+        del by_status[status]
+
+
+def _count_team(stats: Dict[str, Any], team: Optional[dict], sign: int) -> None:
+    """Добавляет (sign=1) или вычитает (sign=-1) команду из агрегатов."""
+    if not isinstance(team, dict):
+        return
+    stats['teams_total'] += sign
+    if team.get('status') == 'active':
+        stats['active_teams'] += sign
+        stats['active_members'] += sign * len(team.get('members') or [])
@@ -0,0 +1,91 @@
+"""
+Асинхронный фасад над Storage для обработчиков aiogram.
+
+Все обращения к хранилищу (чтение и разбор файлов, сериализация, запись)
+выполняются в отдельном потоке-писателе, по одному на хранилище, поэтому
+не блокируют цикл событий. Вызовы выполняются строго по очереди в порядке
+поступления, так что порядок изменений от одного обработчика сохраняется.
+
+Пример:
+    storage = AsyncStorage()
+    user = await storage.get_user(tg_id)
+    await storage.enqueue(tg_id)
+"""
+
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .storage import Storage
+
+T = TypeVar('T')
+
+
+class AsyncStorage:
+    """
+    Awaitable-версии всех публичных методов Storage.
+
+    Методы генерируются по Storage (см. _add_async_methods): у каждого та же
+    сигнатура и документация, но вызов возвращает корутину. Транзакции и
+    составные операции выполняются через run().
+    """
+
+    _writers: Dict[Any, ThreadPoolExecutor] = {}
+    _writers_lock = Lock()
+
+    def __init__(self, file_path: str = 'data.json', storage: Optional[Storage] = None):
+        """
+        Args:
+            file_path: Путь к JSON-файлу хранилища
+            storage: Готовый синхронный Storage (по умолчанию создается по file_path)
+        """
+        self.storage = storage or Storage(file_path)
+        self._executor = self._writer_for(self.storage)
+
+    @classmethod
+    def _writer_for(cls, storage: Storage) -> ThreadPoolExecutor:
+        """Возвращает поток-писатель хранилища (один на кэш Store в процессе)."""
+        with cls._writers_lock:
+            executor = cls._writers.get(storage._cache)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-writer')
+                cls._writers[storage._cache] = executor
+            return executor
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Выполняет произвольную синхронную функцию в потоке-писателе.
+
+        Используется для составных операций, которые должны выполниться
+        целиком, например транзакции:
+
+            def archive(storage, team_id):
+                with storage.transaction() as store:
+                    ...
+
+            await async_storage.run(archive, async_storage.storage, team_id)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+
+def _make_async(name: str, method: Callable) -> Callable:
+    """Создает awaitable-версию метода Storage."""
+    @functools.wraps(method)
+    async def wrapper(self: AsyncStorage, *args, **kwargs):
+        return await self.run(getattr(self.storage, name), *args, **kwargs)
+    return wrapper
+
+
+def _add_async_methods() -> None:
+    """Добавляет в AsyncStorage awaitable-версии публичных методов Storage."""
+    for name, method in inspect.getmembers(Storage, inspect.isfunction):
+        if name.startswith('_') or name == 'transaction' or hasattr(AsyncStorage, name):
+            continue
+        setattr(AsyncStorage, name, _make_async(name, method))
+
+
+_add_async_methods()
@@ -0,0 +1,325 @@
+"""
+Движок рассылок: параллельная отправка сообщений в пределах лимитов Telegram.
+
+Telegram допускает около 30 сообщений в секунду на бота и около одного
+сообщения в секунду в один чат. Движок отправляет сообщения параллельно
+(не больше BROADCAST_CONCURRENCY одновременно), общий темп ограничивает
+корзиной токенов (BROADCAST_RATE сообщений в секунду), а темп в один чат -
+интервалом BROADCAST_PER_CHAT_INTERVAL. Ответ RetryAfter приостанавливает
+все отправки на указанное время, после чего сообщение отправляется снова;
+сетевые ошибки и ошибки сервера Telegram повторяются с экспоненциальной
+задержкой (до BROADCAST_MAX_RETRIES раз).
+
+Движок один на бота (см. BroadcastEngine.for_bot), чтобы все рассылки
+процесса делили общий лимит.
+
+Получатели, заблокировавшие бота или удалившие аккаунт, попадают в реестр
+недоступных (Store['unreachable']); следующие рассылки, карточки команд
+и уведомления админов их пропускают, не тратя лимит. Пользователь
+убирается из реестра, когда снова пишет боту (см. middlewares.unreachable).
+В реестр попадают только личные чаты пользователей: группы и служебные
+чаты (MOD_CHAT_ID, админы из ADMINS) сами боту не пишут и не вышли бы
+из него, поэтому ошибки доставки им остаются обычными неудачами.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional, Set, Tuple, Union
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+
+from .async_storage import AsyncStorage
+from .storage import Storage
+
+logger = logging.getLogger(__name__)
+
+# Итог доставки одному получателю
+SENT = 'sent'
+FAILED = 'failed'
+# Получатель заблокировал бота, удалил аккаунт или чат не существует
+UNREACHABLE = 'unreachable'
+
+# Причины недоступности получателя (реестр недоступных)
+BLOCKED = 'blocked'
+DEACTIVATED = 'deactivated'
+NOT_FOUND = 'not_found'
+
+# Ответы BadRequest, означающие, что чата больше нет
+_UNREACHABLE_BAD_REQUESTS = ('chat not found', 'user not found', 'peer_id_invalid')
+
+# Сколько раз подряд выполнять RetryAfter для одного сообщения, прежде чем сдаться
+_MAX_RETRY_AFTER = 10
+
+ChatId = Union[int, str]
+
+
+class Delivery(NamedTuple):
+    """Результат отправки одному получателю."""
+    chat_id: ChatId
+    status: str
+    # Текст ошибки для FAILED/UNREACHABLE
+    error: Optional[str] = None
+
+
+def unreachable_reason(error: str) -> str:
+    """Причина недоступности по тексту ответа Telegram."""
+    error = error.lower()
+    if 'blocked' in error:
+        return BLOCKED
+    if 'deactivated' in error:
+        return DEACTIVATED
+    return NOT_FOUND
+
+
+def service_chat_ids() -> FrozenSet[str]:
+    """Возвращает служебные чаты из ADMINS и MOD_CHAT_ID (строковые ID)."""
+    service_chats = {value.strip() for value in os.getenv('ADMINS', '').split(',')}
+    service_chats.add(os.getenv('MOD_CHAT_ID', '').strip())
+    service_chats.discard('')
+    return frozenset(service_chats)
+
+
+def tracks_unreachable(chat_id: ChatId, service_chats: FrozenSet[str]) -> bool:
+    """
+    Проверяет, что недоступность чата можно запомнить в реестре.
+    
+    Только личные чаты (положительный ID пользователя), кроме служебных
+    чатов service_chats (см. service_chat_ids): «chat not found» для них
+    скорее означает ошибку настройки, чем ушедшего пользователя.
+    """
+    try:
+        tg_id = int(chat_id)
+    except (TypeError, ValueError):
+        # @username канала или группы
+        return False
+    if tg_id <= 0:
+        return False
+    return str(tg_id) not in service_chats
+
+
+class BroadcastResult(NamedTuple):
+    """Итог рассылки."""
+    sent: int
+    failed: int
+    unreachable: int
+    elapsed: float
+
+    @property
+    def rate(self) -> float:
+        """Средняя скорость отправки, сообщений в секунду."""
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class TokenBucket:
+    """Корзина токенов: не больше rate операций в секунду, всплеск до capacity."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Приостанавливает выдачу токенов (ответ RetryAfter)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        # Не выдаем накопленный всплеск сразу после паузы
+        self._tokens = min(self._tokens, 1.0)
+
+    async def acquire(self) -> None:
+        """Ждет и забирает один токен."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BroadcastEngine:
+    """Параллельная отправка сообщений с общим и поканальным ограничением темпа."""
+
+    _engines: 'weakref.WeakKeyDictionary[Bot, BroadcastEngine]' = weakref.WeakKeyDictionary()
+
+    def __init__(self, bot: Bot, rate: Optional[float] = None, concurrency: Optional[int] = None,
+                 per_chat_interval: Optional[float] = None, max_retries: Optional[int] = None,
+                 backoff: float = 0.5, storage: Optional[Storage] = None):
+        """
+        Args:
+            bot: Бот для отправки
+            rate: Сообщений в секунду на весь бот (BROADCAST_RATE, по умолчанию 30)
+            concurrency: Одновременных запросов (BROADCAST_CONCURRENCY, по умолчанию 20)
+            per_chat_interval: Минимальный интервал между сообщениями в один чат, секунды
+                (BROADCAST_PER_CHAT_INTERVAL, по умолчанию 1)
+            max_retries: Повторов при сетевых ошибках (BROADCAST_MAX_RETRIES, по умолчанию 3)
+            backoff: Начальная задержка перед повтором, секунды
+            storage: Хранилище с реестром недоступных (None - реестр не ведется)
+        """
+        self.bot = bot
+        self.storage = storage
+        self.bucket = TokenBucket(rate or float(os.getenv('BROADCAST_RATE', '30')))
+        self.concurrency = concurrency or int(os.getenv('BROADCAST_CONCURRENCY', '20'))
+        self.per_chat_interval = (per_chat_interval if per_chat_interval is not None
+                                  else float(os.getenv('BROADCAST_PER_CHAT_INTERVAL', '1')))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('BROADCAST_MAX_RETRIES', '3'))
+        self.backoff = backoff
+        # Служебные чаты не попадают в реестр недоступных (разбираются один раз)
+        self.service_chats = service_chat_ids()
+        self._in_flight = asyncio.Semaphore(self.concurrency)
+        # chat_id -> время (monotonic), раньше которого в чат нельзя писать
+        self._chat_ready: Dict[str, float] = {}
+
+    @classmethod
+    def for_bot(cls, bot: Bot) -> 'BroadcastEngine':
+        """Возвращает общий движок бота (один лимит на все рассылки процесса)."""
+        engine = cls._engines.get(bot)
+        if engine is None:
+            engine = cls._engines[bot] = cls(bot, storage=Storage())
+        return engine
+
+    async def _wait_chat(self, chat_id: ChatId) -> None:
+        """Выдерживает интервал между сообщениями в один чат."""
+        key = str(chat_id)
+        now = time.monotonic()
+        ready = self._chat_ready.get(key, 0.0)
+        self._chat_ready[key] = max(now, ready) + self.per_chat_interval
+        if ready > now:
+            await asyncio.sleep(ready - now)
+        if len(self._chat_ready) > 10000:
+            # Забываем чаты, в которые уже можно писать
+            self._chat_ready = {chat: t for chat, t in self._chat_ready.items() if t > now}
+
+    async def _remember_unreachable(self, deliveries: Iterable[Delivery]) -> None:
+        """Вносит недоступных получателей в реестр (одной записью)."""
+        records: Dict[str, Tuple[str, str]] = {
+            str(delivery.chat_id): (unreachable_reason(delivery.error or ''), delivery.error or '')
+            for delivery in deliveries
+            if delivery.status == UNREACHABLE and tracks_unreachable(delivery.chat_id, self.service_chats)
+        }
+        if records and self.storage is not None:
+            await AsyncStorage(storage=self.storage).mark_unreachable(records)
+
+    def _skipped(self, chat_id: ChatId) -> Delivery:
+        """Итог для получателя из реестра недоступных (сообщение не отправляется)."""
+        return Delivery(chat_id, UNREACHABLE, 'skipped: unreachable')
+
+    async def send(self, chat_id: ChatId, text: str, **kwargs: Any) -> Delivery:
+        """
+        Отправляет одно сообщение с учетом лимитов и повторов.
+
+        Получатели из реестра недоступных пропускаются, а недоступные
+        вносятся в него.
+
+        Args:
+            chat_id: Получатель
+            text: Текст
+            **kwargs: Дополнительные параметры send_message (reply_markup и т.п.)
+
+        Returns:
+            Delivery со статусом SENT, FAILED или UNREACHABLE
+        """
+        if self.storage is not None and tracks_unreachable(chat_id, self.service_chats) and self.storage.is_unreachable(chat_id):
+            return self._skipped(chat_id)
+        delivery = await self._deliver(chat_id, text, **kwargs)
+        await self._remember_unreachable([delivery])
+        return delivery
+
+    async def _deliver(self, chat_id: ChatId, text: str, **kwargs: Any) -> Delivery:
+        """Отправляет одно сообщение с учетом лимитов и повторов (без реестра недоступных)."""
+        attempts = 0
+        retry_afters = 0
+        while True:
+            await self._wait_chat(chat_id)
+            await self.bucket.acquire()
+            try:
+                async with self._in_flight:
+                    await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                return Delivery(chat_id, SENT)
+            except TelegramRetryAfter as e:
+                retry_afters += 1
+                if retry_afters > _MAX_RETRY_AFTER:
+                    return Delivery(chat_id, FAILED, str(e))
+                logger.warning(f"Лимит Telegram: пауза рассылки на {e.retry_after} с")
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError as e:
+                return Delivery(chat_id, UNREACHABLE, str(e))
+            except TelegramBadRequest as e:
+                if any(reason in str(e).lower() for reason in _UNREACHABLE_BAD_REQUESTS):
+                    return Delivery(chat_id, UNREACHABLE, str(e))
+                return Delivery(chat_id, FAILED, str(e))
+            except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as e:
+                attempts += 1
+                if attempts > self.max_retries:
+                    logger.warning(f"Не удалось отправить сообщение {chat_id}: {e}")
+                    return Delivery(chat_id, FAILED, str(e))
+                # Экспоненциальная задержка со случайным разбросом
+                await asyncio.sleep(self.backoff * 2 ** (attempts - 1) * (0.5 + random.random()))
+
+    async def broadcast(self, chat_ids: Iterable[ChatId], text: str,
+                        on_delivery: Optional[Callable[[Delivery], Optional[Awaitable[None]]]] = None,
+                        **kwargs: Any) -> BroadcastResult:
+        """
+        Рассылает сообщение получателям (каждому один раз).
+
+        Получатели из реестра недоступных не получают сообщение, но учитываются
+        как UNREACHABLE; новые недоступные вносятся в реестр в конце рассылки.
+
+        Args:
+            chat_ids: Получатели (повторы пропускаются)
+            text: Текст
+            on_delivery: Вызывается после каждой доставки (может быть корутиной)
+            **kwargs: Дополнительные параметры send_message
+
+        Returns:
+            BroadcastResult с числом отправленных, неудачных и недоступных
+        """
+        started = time.monotonic()
+        counts = {SENT: 0, FAILED: 0, UNREACHABLE: 0}
+        seen = set()
+        recipients = iter(chat_ids)
+        unreachable: Set[str] = self.storage.get_unreachable_ids() if self.storage is not None else set()
+        new_unreachable = []
+
+        def next_recipient() -> Optional[ChatId]:
+            for chat_id in recipients:
+                if str(chat_id) not in seen:
+                    seen.add(str(chat_id))
+                    return chat_id
+            return None
+
+        async def worker() -> None:
+            while True:
+                chat_id = next_recipient()
+                if chat_id is None:
+                    return
+                if str(chat_id) in unreachable and tracks_unreachable(chat_id, self.service_chats):
+                    delivery = self._skipped(chat_id)
+                else:
+                    delivery = await self._deliver(chat_id, text, **kwargs)
+                    if delivery.status == UNREACHABLE:
+                        new_unreachable.append(delivery)
+                counts[delivery.status] += 1
+                if on_delivery is not None:
+                    result = on_delivery(delivery)
+                    if asyncio.iscoroutine(result):
+                        await result
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            await self._remember_unreachable(new_unreachable)
+        return BroadcastResult(counts[SENT], counts[FAILED], counts[UNREACHABLE], time.monotonic() - started)
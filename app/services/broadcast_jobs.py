@@ -0,0 +1,336 @@
+"""
+Задания рассылок: рассылки, которые переживают перезапуск бота.
+
+Рассылка (/adm_broadcast, карточки новых команд) сначала сохраняется
+в Store['broadcasts'] заданием со списком получателей, а затем выполняется
+в фоне через движок рассылок (см. services.broadcast). Итог доставки
+каждому получателю и курсор (сколько первых получателей уже обработано)
+записываются в задание каждые BROADCAST_PROGRESS_SECONDS секунд, и тогда же
+обновляется одно сообщение с прогрессом у администратора.
+
+При запуске бота (resume) незавершенные задания продолжаются с места
+остановки: повторно отправляются только получатели, итог для которых
+не успел записаться.
+
+Задания работают и как outbox для карточек команд: комплектование
+записывает задание в той же транзакции, что и команды
+(Storage.create_teams(..., notify=True)), а менеджер подхватывает его
+сразу по сигналу (resume) или при фоновой проверке раз в
+BROADCAST_OUTBOX_SECONDS секунд. Доставка - хотя бы один раз: после сбоя
+получатель без записанного итога получит карточку повторно.
+
+Запуск, прерванный ошибкой, повторяется при следующей проверке; после
+BROADCAST_MAX_ATTEMPTS таких запусков задание помечается 'failed',
+и администратор получает отчет с последней ошибкой.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+
+from ..types import Broadcast
+from .async_storage import AsyncStorage
+from .broadcast import FAILED, BroadcastEngine, Delivery
+from .notify import NotificationService
+from .storage import Storage
+
+logger = logging.getLogger(__name__)
+
+MESSAGE = 'message'
+TEAM_CARDS = 'team_cards'
+
+
+def format_progress(job: Broadcast, rate: float = 0.0) -> str:
+    """
+    Текст сообщения с прогрессом задания.
+
+    Args:
+        job: Задание
+        rate: Текущая скорость отправки, сообщений в секунду
+    """
+    remaining = len(job['recipients']) - len(job['results'])
+    done = job['status'] == 'done'
+    failed = job['status'] == 'failed'
+    if done:
+        header = f"✅ Рассылка {job['id']} завершена"
+    elif failed:
+        header = f"⛔ Рассылка {job['id']} остановлена после {job.get('attempts', 0)} неудачных попыток"
+    else:
+        header = f"📤 Рассылка {job['id']} выполняется"
+    lines = [
+        f"{header} ({job['title']})" if job['title'] else header,
+        "",
+        f"📬 Доставлено: {job['sent']}",
+        f"❌ Ошибки: {job['failed']}",
+        f"🚫 Недоступны: {job['unreachable']}",
+    ]
+    if failed:
+        lines.append(f"⏳ Не отправлено: {remaining}")
+        lines.append(f"⚠️ Ошибка: {job.get('error')}")
+    elif not done:
+        lines.append(f"⏳ Осталось: {remaining}")
+        lines.append(f"⚡ Скорость: {rate:.1f} сообщ./с")
+    return "\n".join(lines)
+
+
+class BroadcastJobManager:
+    """Создает задания рассылок и выполняет их в фоне."""
+
+    _managers: 'weakref.WeakKeyDictionary[Bot, BroadcastJobManager]' = weakref.WeakKeyDictionary()
+    # Выполняемые задания всех менеджеров процесса: (хранилище, ID задания) -> задача
+    _tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def __init__(self, bot: Bot, storage: Optional[Storage] = None,
+                 notify_service: Optional[NotificationService] = None,
+                 progress_interval: Optional[float] = None, max_attempts: Optional[int] = None):
+        """
+        Args:
+            bot: Бот для отправки
+            storage: Хранилище заданий (по умолчанию data.json)
+            notify_service: Сервис уведомлений для карточек команд
+            progress_interval: Как часто сохранять прогресс и обновлять отчет, секунды
+                (BROADCAST_PROGRESS_SECONDS, по умолчанию 3)
+            max_attempts: Сколько запусков с ошибкой допускается до статуса 'failed'
+                (BROADCAST_MAX_ATTEMPTS, по умолчанию 5)
+        """
+        self.bot = bot
+        self.storage = storage or Storage()
+        self.notify_service = notify_service or NotificationService(bot, self.storage)
+        self.progress_interval = (progress_interval if progress_interval is not None
+                                  else float(os.getenv('BROADCAST_PROGRESS_SECONDS', '3')))
+        self.outbox_interval = float(os.getenv('BROADCAST_OUTBOX_SECONDS', '15'))
+        self.max_attempts = max_attempts or int(os.getenv('BROADCAST_MAX_ATTEMPTS', '5'))
+        self._drain_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def for_bot(cls, bot: Bot) -> 'BroadcastJobManager':
+        """Возвращает общий менеджер заданий бота."""
+        manager = cls._managers.get(bot)
+        if manager is None:
+            manager = cls._managers[bot] = cls(bot)
+        return manager
+
+    @property
+    def engine(self) -> BroadcastEngine:
+        """Общий движок рассылок бота."""
+        return BroadcastEngine.for_bot(self.bot)
+
+    def create_message_job(self, recipients: List, text: str, title: str = '',
+                           report_chat_id: Optional[Union[int, str]] = None,
+                           report_message_id: Optional[int] = None) -> str:
+        """Сохраняет задание рассылки текста. Возвращает ID задания."""
+        return self.storage.create_broadcast(
+            MESSAGE, recipients, title=title, text=text,
+            report_chat_id=report_chat_id, report_message_id=report_message_id
+        )
+
+    def create_team_cards_job(self, team_ids: List[str],
+                              report_chat_id: Optional[Union[int, str]] = None) -> str:
+        """
+        Сохраняет задание рассылки карточек команд их участникам. Возвращает ID задания.
+
+        Для новых команд задание лучше создавать вместе с ними
+        (Storage.create_teams(..., notify=True)).
+        """
+        return self.storage.create_team_cards_broadcast(team_ids, report_chat_id)
+
+    def submit(self, job_id: str) -> asyncio.Task:
+        """Запускает задание в фоне (если оно уже выполняется - возвращает его задачу)."""
+        key = (self.storage.file_path, job_id)
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._run(job_id))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+        return task
+
+    def resume(self) -> List[str]:
+        """
+        Запускает незавершенные задания, которые еще не выполняются.
+
+        Так подхватываются задания, прерванные перезапуском, и задания,
+        записанные транзакциями комплектования (outbox). Возвращает ID
+        запущенных заданий.
+        """
+        job_ids = []
+        for job in self.storage.get_unfinished_broadcasts():
+            task = self._tasks.get((self.storage.file_path, job['id']))
+            if task is None or task.done():
+                logger.info(f"Запускаем рассылку {job['id']} ({job['title']})")
+                self.submit(job['id'])
+                job_ids.append(job['id'])
+        return job_ids
+
+    def start(self) -> None:
+        """Запускает задания и фоновую проверку новых каждые BROADCAST_OUTBOX_SECONDS секунд."""
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain_loop())
+
+    async def _drain_loop(self) -> None:
+        """Периодически запускает новые и прерванные задания."""
+        while True:
+            try:
+                self.resume()
+            except Exception as e:
+                logger.error(f"Ошибка запуска рассылок: {e}", exc_info=True)
+            await asyncio.sleep(self.outbox_interval)
+
+    async def stop(self) -> None:
+        """
+        Останавливает выполняемые задания этого хранилища (прогресс сохраняется).
+
+        Ждет, пока отмененные задания запишут последний прогресс: иначе при
+        остановке бота цикл событий мог закрыться раньше, и после запуска
+        уже получившие сообщение чаты получили бы его повторно.
+        """
+        cancelled = []
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            cancelled.append(self._drain_task)
+            self._drain_task = None
+        for (file_path, _), task in list(self._tasks.items()):
+            if file_path == self.storage.file_path and not task.done():
+                task.cancel()
+                cancelled.append(task)
+        await asyncio.gather(*cancelled, return_exceptions=True)
+
+    async def join(self) -> None:
+        """Ждет завершения выполняемых заданий этого хранилища."""
+        while True:
+            tasks = [task for (file_path, _), task in list(self._tasks.items())
+                     if file_path == self.storage.file_path and not task.done()]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job_id: str) -> None:
+        """Выполняет задание, периодически сохраняя прогресс."""
+        job = self.storage.get_broadcast(job_id)
+        if job is None or job['status'] != 'running':
+            return
+
+        async_storage = AsyncStorage(storage=self.storage)
+        pending: Dict[str, str] = {}
+        started = time.monotonic()
+        sent_now = 0
+
+        def on_delivery(delivery: Delivery) -> None:
+            nonlocal sent_now
+            pending[str(delivery.chat_id)] = delivery.status
+            sent_now += 1
+
+        async def flush(finished: bool = False) -> None:
+            nonlocal job
+            batch = dict(pending)
+            if batch or finished:
+                job = await async_storage.record_broadcast_progress(job_id, batch, finished) or job
+            # Убираем из буфера только записанное: при отмене записи итоги сохранит обработчик отмены
+            for tg_id in batch:
+                pending.pop(tg_id, None)
+            elapsed = time.monotonic() - started
+            await self._report(job, sent_now / elapsed if elapsed > 0 else 0.0)
+
+        stopped = asyncio.Event()
+
+        async def report_loop() -> None:
+            while not stopped.is_set():
+                try:
+                    await asyncio.wait_for(stopped.wait(), self.progress_interval)
+                except asyncio.TimeoutError:
+                    await flush()
+
+        reporter = asyncio.create_task(report_loop())
+        try:
+            await self._report(job)
+            await self._send(job, on_delivery)
+        except asyncio.CancelledError:
+            # Остановка бота: сохраняем то, что успели отправить, и выходим
+            reporter.cancel()
+            if pending:
+                self.storage.record_broadcast_progress(job_id, dict(pending))
+            raise
+        except Exception as e:
+            # Задание продолжится при следующей проверке, пока не исчерпает попытки
+            logger.error(f"Ошибка рассылки {job_id}: {e}", exc_info=True)
+            stopped.set()
+            await reporter
+            await flush()
+            await self._record_failure(job, f"{type(e).__name__}: {e}")
+            return
+
+        stopped.set()
+        await reporter
+        await flush(finished=True)
+        logger.info(f"Рассылка {job_id} завершена: доставлено {job['sent']}, ошибок {job['failed']}, "
+                    f"недоступны {job['unreachable']}")
+
+    async def _record_failure(self, job: Broadcast, error: str) -> None:
+        """Учитывает неудачный запуск; исчерпавшее попытки задание останавливает и сообщает об этом."""
+        job = await AsyncStorage(storage=self.storage).record_broadcast_failure(
+            job['id'], error, self.max_attempts
+        ) or job
+        if job['status'] != 'failed':
+            logger.warning(f"Рассылка {job['id']}: неудачная попытка {job['attempts']} из {self.max_attempts}")
+            return
+
+        logger.error(f"Рассылка {job['id']} остановлена после {job['attempts']} неудачных попыток: {error}")
+        if job.get('report_chat_id'):
+            await self._report(job)
+        else:
+            # Отчета у задания нет (карточки команд из планировщика) - пишем модераторам
+            await self.notify_service.send_to_moderators(format_progress(job))
+
+    async def _send(self, job: Broadcast, on_delivery) -> None:
+        """Отправляет задание получателям, для которых еще нет итога."""
+        done = job['results']
+        remaining = [tg_id for tg_id in job['recipients'][job['cursor']:] if tg_id not in done]
+        if not remaining:
+            return
+
+        if job['kind'] == MESSAGE:
+            await self.engine.broadcast(remaining, job['text'] or '', on_delivery=on_delivery)
+            return
+
+        # Карточки строятся из текущих данных команды; команды отправляются параллельно
+        remaining_set = set(remaining)
+        teams = [team for team in map(self.storage.get_team, job['team_ids']) if team]
+        # Текст карточки строится один раз на команду по одному снимку пользователей
+        cards = self.notify_service.render_team_cards(teams)
+        sends = []
+        for team in teams:
+            members = [tg_id for tg_id in team['members'] if str(tg_id) in remaining_set]
+            remaining_set.difference_update(str(tg_id) for tg_id in members)
+            if members:
+                sends.append(self.notify_service.send_team_card_to_members(
+                    team, members, on_delivery, text=cards[team['id']]
+                ))
+
+        # Остальные ушли из команды или команда расформирована до отправки
+        for tg_id in remaining_set:
+            on_delivery(Delivery(tg_id, FAILED, 'team member not found'))
+        await asyncio.gather(*sends)
+
+    async def _report(self, job: Broadcast, rate: float = 0.0) -> None:
+        """Показывает прогресс в сообщении-отчете задания (создает его при первом вызове)."""
+        chat_id = job.get('report_chat_id')
+        if not chat_id:
+            return
+        text = format_progress(job, rate)
+        try:
+            if job.get('report_message_id'):
+                await self.bot.edit_message_text(text=text, chat_id=chat_id, message_id=job['report_message_id'])
+            else:
+                message = await self.bot.send_message(chat_id=chat_id, text=text)
+                job['report_message_id'] = message.message_id
+                await AsyncStorage(storage=self.storage).set_broadcast_report_message(job['id'], message.message_id)
+        except TelegramBadRequest as e:
+            if 'message is not modified' not in str(e):
+                logger.warning(f"Не удалось обновить отчет рассылки {job['id']}: {e}")
+        except TelegramAPIError as e:
+            logger.warning(f"Не удалось обновить отчет рассылки {job['id']}: {e}")
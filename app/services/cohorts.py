@@ -0,0 +1,88 @@
+"""
+Когорты: независимые потоки комплектования (мероприятия, номинации).
+
+У каждой когорты своя очередь, своя нумерация команд и свои размеры
+команды. Когорта по умолчанию (id '') - это общая очередь Store['queue']
+с нумерацией counters.teamSeq и настройками TEAM_BASE/ELASTIC_MAX, поэтому
+без дополнительной настройки бот работает как раньше.
+
+Дополнительные когорты задаются переменной окружения COHORTS:
+    COHORTS=hack:4:1,art:3:0
+(id:база:эластика, размеры можно опустить - тогда берутся TEAM_BASE/ELASTIC_MAX).
+Пользователь попадает в когорту по ссылке https://t.me/<бот>?start=<id>.
+"""
+
+import os
+import re
+from typing import Dict, NamedTuple, Optional
+
+from .storage_backends import COHORT_QUEUE_PREFIX
+
+# ID когорты по умолчанию (общая очередь)
+DEFAULT_COHORT = ''
+
+# Допустимый ID когорты: он же часть имени файла и ссылки /start
+_COHORT_ID_RE = re.compile(r'^[a-z0-9_]{1,32}$')
+
+
+class Cohort(NamedTuple):
+    """Когорта и ее размеры команд."""
+    id: str
+    team_base: int
+    elastic_max: int
+
+
+def queue_key(cohort_id: Optional[str]) -> str:
+    """Ключ Store с очередью когорты."""
+    return f'{COHORT_QUEUE_PREFIX}{cohort_id}' if cohort_id else 'queue'
+
+
+def team_seq_key(cohort_id: Optional[str]) -> str:
+    """Ключ counters с последним номером команды когорты."""
+    return f'teamSeq.{cohort_id}' if cohort_id else 'teamSeq'
+
+
+def queue_version_key(cohort_id: Optional[str]) -> str:
+    """Ключ counters с версией очереди когорты (растет при каждом ее изменении)."""
+    return f'queueVersion.{cohort_id}' if cohort_id else 'queueVersion'
+
+
+def cohort_of_queue(collection: str) -> str:
+    """ID когорты по ключу Store с ее очередью (обратное к queue_key)."""
+    if collection.startswith(COHORT_QUEUE_PREFIX):
+        return collection[len(COHORT_QUEUE_PREFIX):]
+    return DEFAULT_COHORT
+
+
+def team_id(cohort_id: Optional[str], seq: int) -> str:
+    """ID команды когорты: C-12 для общей очереди, C-hack-12 для когорты hack."""
+    return f'C-{cohort_id}-{seq}' if cohort_id else f'C-{seq}'
+
+
+def load_cohorts() -> Dict[str, Cohort]:
+    """
+    Читает когорты из окружения.
+
+    Returns:
+        Когорты по ID; когорта по умолчанию всегда первая
+    """
+    team_base = int(os.getenv('TEAM_BASE', '5'))
+    elastic_max = int(os.getenv('ELASTIC_MAX', '2'))
+    cohorts = {DEFAULT_COHORT: Cohort(DEFAULT_COHORT, team_base, elastic_max)}
+
+    for spec in os.getenv('COHORTS', '').split(','):
+        parts = [part.strip() for part in spec.split(':')]
+        cohort_id = parts[0].lower()
+        if not cohort_id:
+            continue
+        if not _COHORT_ID_RE.match(cohort_id):
+            raise ValueError(f"Недопустимый ID когорты в COHORTS: {parts[0]!r}")
+        base = int(parts[1]) if len(parts) > 1 and parts[1] else team_base
+        elastic = int(parts[2]) if len(parts) > 2 and parts[2] else elastic_max
+        cohorts[cohort_id] = Cohort(cohort_id, base, elastic)
+    return cohorts
+
+
+def get_cohort(cohort_id: Optional[str]) -> Optional[Cohort]:
+    """Возвращает когорту по ID (None - такой когорты нет)."""
+    return load_cohorts().get((cohort_id or DEFAULT_COHORT).lower())
@@ -150,27 +150,31 @@ class HealthMonitor:
     def check_storage(self) -> HealthStatus:
         """Проверяет состояние хранилища данных."""
         try:
-            # Проверяем доступность файла данных
-            data_file = Path('data.json')
+            # Проверяем доступность файла данных (data.json, каталог коллекций или база SQLite)
+            data_file = Path(storage.backend.path)
             if not data_file.exists():
                 return HealthStatus(
                     'storage',
                     'critical',
-                    'Файл данных data.json не найден'
+                    f'Файл данных {data_file.name} не найден'
                 )
             
             # Проверяем размер файла и время последней модификации
-            file_stat = data_file.stat()
-            file_size_mb = file_stat.st_size / (1024 * 1024)
-            last_modified = datetime.fromtimestamp(file_stat.st_mtime)
+            if data_file.is_dir():
+                # Каталог коллекций: суммарный размер и самое свежее изменение
+                file_stats = [f.stat() for f in data_file.glob('*.json')] or [data_file.stat()]
+            else:
+                file_stats = [data_file.stat()]
+            file_size_mb = sum(st.st_size for st in file_stats) / (1024 * 1024)
+            last_modified = datetime.fromtimestamp(max(st.st_mtime for st in file_stats))
             age_minutes = (datetime.now() - last_modified).total_seconds() / 60
             
             # Пытаемся загрузить данные
             try:
-                data = storage.load()
-                users_count = len(data.get('users', {}))
-                teams_count = len(data.get('teams', {}))
-                queue_count = len(data.get('queue', []))
+                stats = storage.get_stats()
+                users_count = stats['users_total']
+                teams_count = stats['teams_total']
+                queue_count = stats['queue_size']
             except Exception as e:
                 return HealthStatus(
                     'storage',
@@ -199,7 +203,9 @@ class HealthMonitor:
                     'age_minutes': round(age_minutes, 1),
                     'users_count': users_count,
                     'teams_count': teams_count,
-                    'queue_count': queue_count
+                    'queue_count': queue_count,
+                    'active_teams': stats['active_teams'],
+                    'users_by_status': stats['users_by_status']
                 }
             )
         except Exception as e:
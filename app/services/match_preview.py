@@ -0,0 +1,81 @@
+"""
+Предпросмотр раунда комплектования для /adm_match_preview.
+
+Результат раунда и готовый текст кэшируются в памяти процесса по ключу
+(когорта, версия очереди, размеры команды, стратегия). Версию очереди
+Storage увеличивает при каждом изменении очереди (enqueue, remove_from_queue,
+создание и расформирование команд), поэтому повторный предпросмотр ничего
+не пересчитывает, пока очередь не изменится.
+"""
+
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from .cohorts import Cohort
+from .matching_strategies import Matcher
+from .storage import Storage
+
+# Сколько команд показывать в сообщении (ограничение длины сообщения Telegram)
+PREVIEW_TEAMS_LIMIT = 15
+
+# (файл хранилища, когорта) -> (ключ, текст)
+_cache: Dict[Tuple[str, str], Tuple[tuple, str]] = {}
+_cache_lock = Lock()
+
+
+def _member_name(user: Optional[dict], tg_id: str) -> str:
+    """Имя участника для предпросмотра."""
+    user = user or {}
+    name = user.get('full_name') or user.get('name') or f"ID:{tg_id}"
+    username = user.get('username')
+    return f"{name} (@{username})" if username else name
+
+
+def _render(cohort: Cohort, teams: List[List[str]], remaining: List[str],
+            users: Dict[str, dict], queue_size: int) -> str:
+    """Форматирует предпросмотр раунда."""
+    title = f" (когорта {cohort.id})" if cohort.id else ""
+    if not teams:
+        return (f"👀 Предпросмотр матчинга{title}\n\n"
+                f"Команды не сформируются: нужно минимум {cohort.team_base}, а в очереди {queue_size}.")
+
+    lines = [
+        f"👀 Предпросмотр матчинга{title}",
+        f"Будет сформировано команд: {len(teams)}, в очереди останется: {len(remaining)}",
+        "",
+    ]
+    for number, members in enumerate(teams[:PREVIEW_TEAMS_LIMIT], 1):
+        lines.append(f"Команда {number} ({len(members)} чел.):")
+        for position, tg_id in enumerate(members):
+            mark = "👑" if position == 0 else "•"
+            lines.append(f"  {mark} {_member_name(users.get(tg_id), tg_id)}")
+    if len(teams) > PREVIEW_TEAMS_LIMIT:
+        lines.append(f"\n… и еще {len(teams) - PREVIEW_TEAMS_LIMIT} команд")
+    lines.append("\nЧтобы сформировать команды, используйте /adm_match")
+    return "\n".join(lines)
+
+
+def get_match_preview(storage: Storage, cohort: Cohort, matcher: Matcher) -> str:
+    """
+    Возвращает текст предпросмотра раунда когорты (из кэша, если очередь не менялась).
+
+    Args:
+        storage: Хранилище
+        cohort: Когорта
+        matcher: Стратегия комплектования
+    """
+    key = (storage.get_queue_version(cohort.id), cohort.team_base, cohort.elastic_max,
+           matcher.name, getattr(matcher, 'attributes', None))
+    cache_key = (storage.file_path, cohort.id)
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+    head, users = storage.get_match_input(cohort.id)
+    teams, remaining = matcher.match(head, users, cohort.team_base, cohort.elastic_max)
+    text = _render(cohort, teams, remaining, users, len(head))
+
+    with _cache_lock:
+        _cache[cache_key] = (key, text)
+    return text
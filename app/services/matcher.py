@@ -2,13 +2,50 @@
 Логика комплектования команд: база 5 + эластика +1/+2.
 """
 
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 
 
-def match_round(queue: List[int], base: int = 5, elastic: int = 2) -> Tuple[List[List[int]], List[int]]:
+def match_boundaries(queue_size: int, base: int = 5,
+                     elastic: int = 2) -> Tuple[List[Tuple[int, int, int, int]], int]:
+    """
+    Рассчитывает раунд комплектования по индексам, не трогая саму очередь.
+    
+    Команда j состоит из базового отрезка очереди [start, stop) и отрезка
+    эластичных участников [extra_start, extra_stop) (может быть пустым).
+    Остаток распределяется по командам по порядку: первая команда добирается
+    до base + elastic, затем вторая и т.д. - как в match_round.
+    
+    Args:
+        queue_size: Размер очереди
+        base: Базовый размер команды
+        elastic: Максимальное количество дополнительных участников
+        
+    Returns:
+        Кортеж (границы_команд, начало_остатка)
+        границы_команд: список (start, stop, extra_start, extra_stop)
+        начало_остатка: индекс, с которого начинаются не попавшие в команды
+    """
+    teams_count = queue_size // base
+    if not teams_count:
+        return [], 0
+    
+    tail = teams_count * base
+    leftover = queue_size - tail
+    boundaries = []
+    for j in range(teams_count):
+        extra_start = min(tail + j * elastic, queue_size)
+        extra_stop = min(extra_start + elastic, queue_size)
+        boundaries.append((j * base, (j + 1) * base, extra_start, extra_stop))
+    return boundaries, tail + min(leftover, teams_count * max(elastic, 0))
+
+
+def match_round(queue: Sequence[int], base: int = 5, elastic: int = 2) -> Tuple[List[List[int]], List[int]]:
     """
     Комплектует команды из очереди пользователей.
     
+    Работает за O(n): границы команд считаются арифметически
+    (см. match_boundaries), команды собираются срезами очереди.
+    
     Args:
         queue: Список ID пользователей в очереди (FIFO)
         base: Базовый размер команды (по умолчанию 5)
@@ -19,32 +56,13 @@ def match_round(queue: List[int], base: int = 5, elastic: int = 2) -> Tuple[List
         команды: список списков ID участников (первый в списке - капитан)
         остаток_очереди: участники, которые не вошли ни в одну команду
     """
-    if not queue:
-        return [], []
-    
-    # Создаем копию очереди для работы
-    queue_copy = queue.copy()
-    teams: List[List[int]] = []
+    if not isinstance(queue, list):
+        queue = list(queue)
     
-    # Формируем полные команды базового размера
-    i = 0
-    while i + base <= len(queue_copy):
-        teams.append(queue_copy[i:i + base])
-        i += base
-    
-    # Остаток после формирования полных команд
-    leftover = queue_copy[i:]
-    
-    # Эластичное распределение остатка по уже созданным командам
-    j = 0
-    while leftover and j < len(teams):
-        # Добавляем участников в команды, не превышая base + elastic
-        if len(teams[j]) < base + elastic:
-            teams[j].append(leftover.pop(0))
-        else:
-            j += 1
-    
-    return teams, leftover
+    boundaries, leftover_start = match_boundaries(len(queue), base, elastic)
+    teams = [queue[start:stop] + queue[extra_start:extra_stop]
+             for start, stop, extra_start, extra_stop in boundaries]
+    return teams, queue[leftover_start:]
 
 
 def validate_team_constraints(teams: List[List[int]], base: int = 5, elastic: int = 2) -> bool:
@@ -69,6 +87,8 @@ def get_match_stats(queue_size: int, base: int = 5, elastic: int = 2) -> dict:
     """
     Возвращает статистику потенциального матчинга без его выполнения.
     
+    Считается по формуле за O(1), результат совпадает с match_round.
+    
     Args:
         queue_size: Размер очереди
         base: Базовый размер команды
@@ -77,19 +97,12 @@ def get_match_stats(queue_size: int, base: int = 5, elastic: int = 2) -> dict:
     Returns:
         Словарь со статистикой: teams_count, players_matched, players_remaining
     """
-    if queue_size < base:
-        return {
-            'teams_count': 0,
-            'players_matched': 0,
-            'players_remaining': queue_size
-        }
-    
-    # Симулируем матчинг для получения статистики
-    dummy_queue = list(range(queue_size))
-    teams, leftover = match_round(dummy_queue, base, elastic)
+    teams_count = queue_size // base
+    # Остаток от базовых команд раздается по эластичным местам, сколько поместится
+    players_remaining = max(queue_size - teams_count * base - teams_count * max(elastic, 0), 0)
     
     return {
-        'teams_count': len(teams),
-        'players_matched': queue_size - len(leftover),
-        'players_remaining': len(leftover)
+        'teams_count': teams_count,
+        'players_matched': queue_size - players_remaining,
+        'players_remaining': players_remaining
     }
@@ -0,0 +1,193 @@
+"""
+Стратегии комплектования команд.
+
+Стратегия получает очередь (FIFO) и пользователей и возвращает команды
+и остаток очереди так же, как match_round. Состав раунда (сколько команд,
+какого размера и кто из очереди в них попадает) у всех стратегий одинаковый
+и считается match_boundaries: в команды попадают те, кто дольше ждет,
+а стратегия решает только, как распределить их по командам.
+
+Стратегия выбирается переменной окружения MATCHER (fifo|scoring).
+"""
+
+import heapq
+from abc import ABC, abstractmethod
+import logging
+import os
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+
+from .matcher import match_boundaries, match_round
+
+logger = logging.getLogger(__name__)
+
+# Атрибуты пользователя, по которым ScoringMatcher выравнивает команды (по убыванию важности).
+# participations бот считает сам (Storage.create_teams); другие поля пользователя
+# (district, age_group, skills) можно перечислить в MATCH_ATTRIBUTES, если они заполнены
+DEFAULT_MATCH_ATTRIBUTES = ('participations',)
+
+
+class Matcher(ABC):
+    """Интерфейс стратегии комплектования."""
+
+    name = 'base'
+    # Ресурсоемкая стратегия: планировщик считает ее в пуле процессов (MATCH_WORKERS)
+    cpu_heavy = False
+
+    @abstractmethod
+    def match(self, queue: Sequence[str], users: Mapping[str, dict],
+              base: int = 5, elastic: int = 2) -> Tuple[List[List[str]], List[str]]:
+        """
+        Комплектует команды из очереди.
+
+        Args:
+            queue: ID пользователей в очереди (FIFO)
+            users: Пользователи по строковому tg_id
+            base: Базовый размер команды
+            elastic: Максимальное количество дополнительных участников
+
+        Returns:
+            Кортеж (команды, остаток_очереди), как у match_round
+        """
+
+
+class FifoMatcher(Matcher):
+    """Команды из подряд идущих участников очереди (match_round)."""
+
+    name = 'fifo'
+
+    def match(self, queue: Sequence[str], users: Mapping[str, dict],
+              base: int = 5, elastic: int = 2) -> Tuple[List[List[str]], List[str]]:
+        return match_round(queue, base, elastic)
+
+
+# Ключ отсутствующего значения атрибута: не участвует в оценке баланса
+_MISSING = (3,)
+
+# Значения атрибутов, которые бот ведет сам, у пользователей без записи
+# (participations появляется при первом попадании в команду)
+_IMPLICIT_VALUES = {'participations': 0}
+
+
+def _attribute_key(value: Any) -> tuple:
+    """Приводит значение атрибута к сравнимому ключу сортировки."""
+    if value is None or value == '' or value == []:
+        return _MISSING
+    if isinstance(value, bool):
+        return (0, int(value))
+    if isinstance(value, (int, float)):
+        return (0, value)
+    if isinstance(value, (list, tuple, set)):
+        return (2, tuple(sorted(str(item).lower() for item in value)))
+    return (1, str(value).lower())
+
+
+class ScoringMatcher(Matcher):
+    """
+    Команды, сбалансированные по атрибутам участников.
+
+    Участники раунда берутся по порядку атрибутов (по умолчанию - опыт
+    участия; в порядке важности), и каждый жадно попадает
+    в ту из CANDIDATE_TEAMS наименее заполненных команд, где меньше всего
+    уже есть его значений атрибутов (штраф imbalance). Итоговое
+    распределение сравнивается по imbalance с FIFO-раундом, и FIFO
+    остается, если балансировка его не улучшает. Если ни у кого из
+    участников раунда нет ни одного атрибута, раунд комплектуется FIFO
+    с предупреждением. Сложность O(n log n). Капитан - участник команды,
+    который дольше всех ждет.
+    """
+
+    name = 'scoring'
+    cpu_heavy = True
+
+    # Сколько наименее заполненных команд рассматривается для каждого участника
+    CANDIDATE_TEAMS = 8
+
+    def __init__(self, attributes: Sequence[str] = DEFAULT_MATCH_ATTRIBUTES):
+        """
+        Args:
+            attributes: Поля пользователя для выравнивания, по убыванию важности
+        """
+        self.attributes = tuple(attributes)
+
+    def _user_key(self, user: Optional[dict]) -> tuple:
+        """Ключ сортировки участника по атрибутам."""
+        user = user or {}
+        return tuple(_attribute_key(user.get(attribute, _IMPLICIT_VALUES.get(attribute)))
+                     for attribute in self.attributes)
+
+    def match(self, queue: Sequence[str], users: Mapping[str, dict],
+              base: int = 5, elastic: int = 2) -> Tuple[List[List[str]], List[str]]:
+        if not isinstance(queue, list):
+            queue = list(queue)
+
+        fifo_teams, leftover = match_round(queue, base, elastic)
+        boundaries, leftover_start = match_boundaries(len(queue), base, elastic)
+        if not boundaries:
+            return fifo_teams, leftover
+
+        keys = [self._user_key(users.get(str(queue[pos]))) for pos in range(leftover_start)]
+        # Значения атрибутов участника, по которым он может повторить кого-то в команде
+        values = [{(attribute, value) for attribute, value in enumerate(key) if value != _MISSING}
+                  for key in keys]
+        if not any(values):
+            logger.warning(f"MATCHER=scoring: ни у кого из {leftover_start} участников раунда нет "
+                           f"атрибутов {', '.join(self.attributes)} - команды собраны по очереди (fifo)")
+            return fifo_teams, leftover
+
+        teams: List[List[int]] = [[] for _ in boundaries]
+        team_values: List[set] = [set() for _ in boundaries]
+        capacity = [(stop - start) + (extra_stop - extra_start)
+                    for start, stop, extra_start, extra_stop in boundaries]
+        heap = [(0, index) for index in range(len(boundaries))]
+        for pos in sorted(range(leftover_start), key=keys.__getitem__):
+            candidates = [heapq.heappop(heap) for _ in range(min(self.CANDIDATE_TEAMS, len(heap)))]
+            best = min(candidates, key=lambda candidate: (len(values[pos] & team_values[candidate[1]]), candidate))
+            for candidate in candidates:
+                if candidate is not best:
+                    heapq.heappush(heap, candidate)
+
+            filled, index = best
+            teams[index].append(pos)
+            team_values[index] |= values[pos]
+            if filled + 1 < capacity[index]:
+                heapq.heappush(heap, (filled + 1, index))
+
+        balanced = [[queue[pos] for pos in sorted(team)] for team in teams]
+        if self.imbalance(balanced, users) < self.imbalance(fifo_teams, users):
+            return balanced, leftover
+        return fifo_teams, leftover
+
+    def imbalance(self, teams: Sequence[Sequence[str]], users: Mapping[str, dict]) -> int:
+        """
+        Оценка несбалансированности команд: сколько раз в команде
+        повторяется уже встречавшееся в ней значение атрибута (меньше - лучше).
+        """
+        penalty = 0
+        for team in teams:
+            seen = set()
+            for tg_id in team:
+                key = self._user_key(users.get(str(tg_id)))
+                for attribute, value in zip(self.attributes, key, strict=True):
+                    if value == _MISSING:
+                        continue
+                    if (attribute, value) in seen:
+                        penalty += 1
+                    seen.add((attribute, value))
+        return penalty
+
+
+def create_matcher() -> Matcher:
+    """
+    Создает стратегию комплектования согласно MATCHER.
+
+    Returns:
+        FifoMatcher (по умолчанию) или ScoringMatcher с атрибутами
+        из MATCH_ATTRIBUTES (через запятую)
+    """
+    matcher = os.getenv('MATCHER', 'fifo').lower()
+    if matcher == 'scoring':
+        attributes = [name.strip() for name in os.getenv('MATCH_ATTRIBUTES', '').split(',') if name.strip()]
+        return ScoringMatcher(attributes or DEFAULT_MATCH_ATTRIBUTES)
+    if matcher != 'fifo':
+        logger.warning(f"Неизвестный MATCHER={matcher}, используется fifo")
+    return FifoMatcher()
@@ -0,0 +1,106 @@
+"""
+Фоновое удаление старых сообщений бота.
+
+Обработчик только ставит ID сообщений в очередь и сразу продолжает
+работу: пользователь видит новый экран, не дожидаясь удалений. Удаления
+одного чата объединяются (повторная постановка до обработки лишь
+добавляет ID к ожидающим) и выполняются одним запросом deleteMessages
+(до 100 ID за раз). Если пакетное удаление не удалось, сообщения
+удаляются по одному параллельно.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from aiogram.exceptions import TelegramAPIError
+
+logger = logging.getLogger(__name__)
+
+# Ограничение Telegram на число ID в одном deleteMessages
+DELETE_MESSAGES_LIMIT = 100
+
+
+class DeletionQueue:
+    """Очередь удалений с объединением по чатам и пулом фоновых обработчиков."""
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers: Сколько чатов обрабатывать одновременно (MESSAGE_DELETE_WORKERS, по умолчанию 4)
+        """
+        self.workers = workers or int(os.getenv('MESSAGE_DELETE_WORKERS', '4'))
+        # chat_id -> (бот, ID сообщений, ожидающих удаления)
+        self._pending: Dict[Any, Tuple[Any, Set[int]]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: list = []
+
+    def schedule(self, bot, chat_id: Any, message_ids: Iterable[int]) -> None:
+        """Ставит сообщения чата в очередь на удаление (без ожидания)."""
+        message_ids = set(message_ids)
+        if not message_ids:
+            return
+        self._ensure_workers()
+        pending = self._pending.get(chat_id)
+        if pending is not None:
+            # Чат уже ждет обработки - объединяем удаления
+            pending[1].update(message_ids)
+            return
+        self._pending[chat_id] = (bot, message_ids)
+        self._queue.put_nowait(chat_id)
+
+    def _ensure_workers(self) -> None:
+        """Запускает обработчики в текущем цикле событий (при первой постановке)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Новый цикл событий (перезапуск) - очередь прежнего цикла недействительна
+            self._queue = asyncio.Queue()
+            self._loop = loop
+            self._pending.clear()
+            self._tasks = []
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def _worker(self) -> None:
+        """Обрабатывает чаты из очереди по одному."""
+        while True:
+            chat_id = await self._queue.get()
+            try:
+                bot, message_ids = self._pending.pop(chat_id)
+                await self._delete(bot, chat_id, sorted(message_ids))
+            except Exception as e:
+                logger.debug(f"Ошибка удаления сообщений в чате {chat_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _delete(self, bot, chat_id: Any, message_ids: list) -> None:
+        """Удаляет сообщения пачками, при ошибке - по одному параллельно."""
+        for start in range(0, len(message_ids), DELETE_MESSAGES_LIMIT):
+            chunk = message_ids[start:start + DELETE_MESSAGES_LIMIT]
+            try:
+                await bot.delete_messages(chat_id, chunk)
+                logger.debug(f"Удалены сообщения {chunk} в чате {chat_id}")
+                continue
+            except TelegramAPIError as e:
+                logger.debug(f"Пакетное удаление в чате {chat_id} не удалось ({e}), удаляем по одному")
+            results = await asyncio.gather(
+                *(bot.delete_message(chat_id, message_id) for message_id in chunk),
+                return_exceptions=True
+            )
+            for message_id, result in zip(chunk, results):
+                if isinstance(result, Exception):
+                    # Сообщение могло быть уже удалено или устарело
+                    logger.debug(f"Не удалось удалить сообщение {message_id} в чате {chat_id}: {result}")
+
+    @property
+    def size(self) -> int:
+        """Чатов, ожидающих удаления."""
+        return len(self._pending)
+
+    async def join(self) -> None:
+        """Ждет, пока очередь опустеет."""
+        if self._queue is not None:
+            await self._queue.join()
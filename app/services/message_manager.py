@@ -3,8 +3,10 @@
 """
 
 import logging
-from typing import Dict, Optional, List
+from typing import Optional, List
 from aiogram.types import Message, CallbackQuery
+from .message_cleanup import DeletionQueue
+from .message_store import MessageIdStore
 from .storage import Storage
 
 logger = logging.getLogger(__name__)
@@ -13,34 +15,20 @@ logger = logging.getLogger(__name__)
 class MessageManager:
     """Класс для управления сообщениями бота и их автоматического удаления."""
     
-    def __init__(self):
-        self.storage = Storage()
-        
-    def _get_user_messages_key(self, user_id: int) -> str:
-        """Возвращает ключ для хранения сообщений пользователя."""
-        return f"user_messages_{user_id}"
+    def __init__(self, message_store: Optional[MessageIdStore] = None,
+                 deletion_queue: Optional[DeletionQueue] = None):
+        # ID сообщений живут в памяти и в собственном файле, а не в data.json
+        self.message_store = message_store or MessageIdStore(
+            legacy_loader=lambda: Storage().load().get('user_messages', {})
+        )
+        self.deletion_queue = deletion_queue or DeletionQueue()
     
     def store_message(self, user_id: int, message_id: int) -> None:
         """Сохраняет ID сообщения бота для пользователя."""
         try:
-            store = self.storage.load()
-            key = self._get_user_messages_key(user_id)
-            
-            # Инициализируем список сообщений если его нет
-            if 'user_messages' not in store:
-                store['user_messages'] = {}
-            
-            if key not in store['user_messages']:
-                store['user_messages'][key] = []
-            
-            # Добавляем новое сообщение
-            store['user_messages'][key].append(message_id)
-            
-            # Ограничиваем количество сохраняемых сообщений (последние 10)
-            if len(store['user_messages'][key]) > 10:
-                store['user_messages'][key] = store['user_messages'][key][-10:]
-            
-            self.storage.save(store)
+            messages = self.message_store.get(user_id)
+            # Добавляем новое сообщение и ограничиваем количество (последние 10)
+            self.message_store.set(user_id, (messages + [message_id])[-10:])
             logger.debug(f"Сохранен message_id {message_id} для пользователя {user_id}")
             
         except Exception as e:
@@ -49,13 +37,7 @@ class MessageManager:
     def get_user_messages(self, user_id: int) -> List[int]:
         """Получает список ID сообщений пользователя."""
         try:
-            store = self.storage.load()
-            key = self._get_user_messages_key(user_id)
-            
-            if 'user_messages' not in store:
-                return []
-                
-            return store['user_messages'].get(key, [])
+            return self.message_store.get(user_id)
             
         except Exception as e:
             logger.error(f"Ошибка при получении сообщений пользователя {user_id}: {e}")
@@ -64,41 +46,34 @@ class MessageManager:
     def clear_user_messages(self, user_id: int) -> None:
         """Очищает список сообщений пользователя."""
         try:
-            store = self.storage.load()
-            key = self._get_user_messages_key(user_id)
-            
-            if 'user_messages' in store and key in store['user_messages']:
-                store['user_messages'][key] = []
-                self.storage.save(store)
-                logger.debug(f"Очищены сообщения для пользователя {user_id}")
+            if self.message_store.get(user_id):
+                self.message_store.set(user_id, [])
+            logger.debug(f"Очищены сообщения для пользователя {user_id}")
                 
         except Exception as e:
             logger.error(f"Ошибка при очистке сообщений пользователя {user_id}: {e}")
     
+    def _keep_only_message(self, user_id: int, message_id: int) -> None:
+        """Оставляет в списке сообщений пользователя только message_id."""
+        self.message_store.set(user_id, [message_id])
+    
     async def delete_previous_messages(self, bot, user_id: int, chat_id: int, exclude_message_id: Optional[int] = None) -> None:
-        """Удаляет все предыдущие сообщения бота для пользователя."""
+        """
+        Удаляет все предыдущие сообщения бота для пользователя.
+        
+        Удаление выполняется в фоне (см. message_cleanup), поэтому новый экран
+        пользователь видит, не дожидаясь запросов к Telegram.
+        """
         message_ids = self.get_user_messages(user_id)
         
-        for message_id in message_ids:
-            # Пропускаем сообщение, которое исключено
-            if exclude_message_id and message_id == exclude_message_id:
-                continue
-                
-            try:
-                await bot.delete_message(chat_id, message_id)
-                logger.debug(f"Удалено сообщение {message_id} для пользователя {user_id}")
-            except Exception as e:
-                # Игнорируем ошибки удаления (сообщение может быть уже удалено)
-                logger.debug(f"Не удалось удалить сообщение {message_id} для пользователя {user_id}: {e}")
+        # Пропускаем сообщение, которое исключено
+        self.deletion_queue.schedule(bot, chat_id, (message_id for message_id in message_ids
+                                                    if message_id != exclude_message_id))
         
         # Очищаем список после удаления (кроме исключенного сообщения)
         if exclude_message_id:
             # Сохраняем только исключенное сообщение
-            store = self.storage.load()
-            key = self._get_user_messages_key(user_id)
-            if 'user_messages' in store and key in store['user_messages']:
-                store['user_messages'][key] = [exclude_message_id]
-                self.storage.save(store)
+            self._keep_only_message(user_id, exclude_message_id)
         else:
             self.clear_user_messages(user_id)
     
@@ -139,8 +114,7 @@ class MessageManager:
                     # Удаляем старые сообщения кроме текущего
                     await self.delete_previous_messages(message_or_callback.bot, user_id, chat_id, exclude_message_id=edited_message.message_id)
                     # Сохраняем ID текущего сообщения (если его еще нет)
-                    current_messages = self.get_user_messages(user_id)
-                    if edited_message.message_id not in current_messages:
+                    if edited_message.message_id not in self.get_user_messages(user_id):
                         self.store_message(user_id, edited_message.message_id)
                 
                 return edited_message
@@ -158,8 +132,7 @@ class MessageManager:
                     # Удаляем старые сообщения кроме текущего
                     await self.delete_previous_messages(message_or_callback.bot, user_id, chat_id, exclude_message_id=edited_message.message_id)
                     # Сохраняем ID текущего сообщения (если его еще нет)
-                    current_messages = self.get_user_messages(user_id)
-                    if edited_message.message_id not in current_messages:
+                    if edited_message.message_id not in self.get_user_messages(user_id):
                         self.store_message(user_id, edited_message.message_id)
                 
                 return edited_message
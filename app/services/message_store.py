@@ -0,0 +1,170 @@
+"""
+ID сообщений бота по пользователям (для удаления старых сообщений).
+
+Списки держатся в памяти в LRU-кэше на MESSAGE_CACHE_SIZE пользователей
+(активные пользователи), а измененные записи пачкой сбрасываются в
+отдельный файл SQLite (MESSAGE_STATE_FILE) раз в MESSAGE_FLUSH_SECONDS
+секунд и при остановке бота. Ответы пользователю не трогают data.json:
+раньше каждый ответ перезаписывал основное хранилище до трех раз.
+
+Пользователь, вытесненный из кэша, при следующем обращении читается
+из файла одной выборкой по ключу. При первом запуске списки переносятся
+из Store['user_messages'] основного хранилища.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Префикс ключей Store['user_messages'] в старых данных
+LEGACY_KEY_PREFIX = 'user_messages_'
+
+
+class MessageIdStore:
+    """LRU-кэш ID сообщений по пользователям с пакетной записью в SQLite."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            user_id TEXT PRIMARY KEY,
+            message_ids TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: Optional[int] = None,
+                 legacy_loader: Optional[Callable[[], Dict[str, List[int]]]] = None):
+        """
+        Args:
+            path: Файл SQLite (MESSAGE_STATE_FILE, по умолчанию messages.db)
+            capacity: Сколько пользователей держать в памяти (MESSAGE_CACHE_SIZE, по умолчанию 5000)
+            legacy_loader: Возвращает Store['user_messages'] для переноса при создании файла
+        """
+        self.path = path or os.getenv('MESSAGE_STATE_FILE', 'messages.db')
+        self.capacity = capacity or int(os.getenv('MESSAGE_CACHE_SIZE', '5000'))
+        self.legacy_loader = legacy_loader
+        self._lru: 'OrderedDict[str, List[int]]' = OrderedDict()
+        # Измененные, но еще не записанные списки (в том числе вытесненные из кэша)
+        self._dirty: Dict[str, List[int]] = {}
+        # Списки, которые flush() сейчас записывает (уже не в _dirty, но еще не в файле)
+        self._flushing: Dict[str, List[int]] = {}
+        self._lock = Lock()
+        # Сбросы идут по одному, чтобы старая пачка не записалась поверх новой
+        self._flush_lock = Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Соединение с файлом (создается при первом обращении, тогда же переносятся старые данные)."""
+        if self._conn is None:
+            created = not os.path.exists(self.path)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+            if created and self.legacy_loader is not None:
+                self._import_legacy(self.legacy_loader())
+        return self._conn
+
+    def _import_legacy(self, legacy: Dict[str, List[int]]) -> None:
+        """Переносит списки из Store['user_messages']."""
+        rows = [(key[len(LEGACY_KEY_PREFIX):] if key.startswith(LEGACY_KEY_PREFIX) else key, json.dumps(ids))
+                for key, ids in (legacy or {}).items() if ids]
+        with self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO messages (user_id, message_ids) VALUES (?, ?)', rows)
+        if rows:
+            logger.info(f"Перенесены ID сообщений {len(rows)} пользователей в {self.path}")
+
+    def _remember(self, key: str, message_ids: List[int]) -> None:
+        """Кладет список в кэш, вытесняя давно не использованных пользователей."""
+        self._lru[key] = message_ids
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get(self, user_id: int) -> List[int]:
+        """Возвращает ID сообщений пользователя."""
+        key = str(user_id)
+        with self._lock:
+            message_ids = self._lru.get(key)
+            if message_ids is None:
+                message_ids = self._dirty.get(key)
+            if message_ids is None:
+                message_ids = self._flushing.get(key)
+            if message_ids is None:
+                row = self.conn.execute('SELECT message_ids FROM messages WHERE user_id = ?', (key,)).fetchone()
+                message_ids = json.loads(row[0]) if row else []
+            self._remember(key, message_ids)
+            return list(message_ids)
+
+    def set(self, user_id: int, message_ids: List[int]) -> None:
+        """Заменяет список ID сообщений пользователя (запишется при следующем сбросе)."""
+        key = str(user_id)
+        with self._lock:
+            message_ids = list(message_ids)
+            self._remember(key, message_ids)
+            self._dirty[key] = message_ids
+
+    def flush(self) -> int:
+        """
+        Записывает измененные списки одной транзакцией. Возвращает число записанных пользователей.
+        
+        Блокировка кэша держится только на время подмены пачки, поэтому
+        get()/set() в цикле событий не ждут записи в файл.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                batch, self._dirty = self._dirty, {}
+                self._flushing = batch
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        'INSERT OR REPLACE INTO messages (user_id, message_ids) VALUES (?, ?)',
+                        ((key, json.dumps(ids)) for key, ids in batch.items())
+                    )
+            except Exception:
+                with self._lock:
+                    # Не теряем изменения: более новые значения остаются поверх
+                    self._dirty = {**batch, **self._dirty}
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+            return len(batch)
+
+    def start(self, interval: Optional[float] = None) -> None:
+        """Запускает фоновый сброс раз в interval секунд (MESSAGE_FLUSH_SECONDS, по умолчанию 10)."""
+        if self._flush_task is None or self._flush_task.done():
+            interval = interval or float(os.getenv('MESSAGE_FLUSH_SECONDS', '10'))
+            self._flush_task = asyncio.create_task(self._flush_loop(interval))
+
+    async def _flush_loop(self, interval: float) -> None:
+        """Периодически сбрасывает изменения в файл вне цикла событий."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.flush)
+            except Exception as e:
+                logger.error(f"Ошибка записи ID сообщений: {e}")
+
+    def stop(self) -> None:
+        """Останавливает фоновый сброс и записывает оставшиеся изменения."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
+
+    def close(self) -> None:
+        """Записывает изменения и закрывает файл."""
+        self.stop()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -3,12 +3,12 @@
 """
 
 import os
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
 
-from ..types import Team
+from ..types import Team, User
+from .broadcast import SENT, BroadcastEngine, BroadcastResult, Delivery
 from .storage import Storage
 from .navigation import nav
 
@@ -16,24 +16,33 @@ from .navigation import nav
 class NotificationService:
     """Сервис для отправки уведомлений пользователям."""
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, storage: Optional[Storage] = None):
         self.bot = bot
-        self.storage = Storage()
+        self.storage = storage or Storage()
     
-    def format_team_card(self, team: Team) -> str:
+    @property
+    def engine(self) -> BroadcastEngine:
+        """Общий движок рассылок бота (лимиты Telegram, повторы)."""
+        return BroadcastEngine.for_bot(self.bot)
+    
+    def format_team_card(self, team: Team, users: Optional[Dict[str, User]] = None) -> str:
         """
         Форматирует карточку команды для отправки пользователям.
         
         Args:
             team: Данные команды
+            users: Участники по строковому tg_id (по умолчанию читаются из хранилища)
             
         Returns:
             Отформатированный текст карточки
         """
+        if users is None:
+            users = self.storage.get_users(team['members'])
+        
         # Получаем информацию об участниках
         members_list = []
         for i, tg_id in enumerate(team['members']):
-            user = self.storage.get_user(tg_id)
+            user = users.get(str(tg_id))
             
             # Используем введенное пользователем имя и ссылку, если есть
             if user and user.get('full_name') and user.get('telegram_link'):
@@ -60,6 +69,16 @@ class NotificationService:
         
         return text
     
+    def render_team_cards(self, teams: List[Team]) -> Dict[str, str]:
+        """
+        Форматирует карточки нескольких команд по одному снимку пользователей.
+        
+        Returns:
+            Текст карточки по ID команды
+        """
+        users = self.storage.get_users(tg_id for team in teams for tg_id in team['members'])
+        return {team['id']: self.format_team_card(team, users) for team in teams}
+    
     def get_team_card_keyboard(self, team_id: str) -> InlineKeyboardMarkup:
         """Создает клавиатуру для карточки команды."""
         buttons = [
@@ -69,27 +88,37 @@ class NotificationService:
         
         return nav.create_keyboard_with_back(buttons, "go_back_to_start")
     
-    async def send_team_card_to_members(self, team: Team) -> None:
+    async def send_team_card_to_members(self, team: Team, members: Optional[List] = None,
+                                        on_delivery: Optional[Callable[[Delivery], None]] = None,
+                                        text: Optional[str] = None) -> BroadcastResult:
         """
-        Отправляет карточку команды всем её участникам.
+        Отправляет карточку команды её участникам.
         
         Args:
             team: Данные команды
+            members: Кому отправить (по умолчанию всем участникам)
+            on_delivery: Вызывается после доставки каждому участнику
+            text: Готовый текст карточки (см. render_team_cards)
         """
-        text = self.format_team_card(team)
+        if text is None:
+            text = self.format_team_card(team)
         keyboard = self.get_team_card_keyboard(team['id'])
         
-        for tg_id in team['members']:
-            try:
-                await self.bot.send_message(
-                    chat_id=tg_id,
-                    text=text,
-                    reply_markup=keyboard
-                )
-            except (TelegramForbiddenError, TelegramBadRequest):
-                # Пользователь заблокировал бота или удалил аккаунт
-                # В продакшене здесь можно логировать или уведомлять админов
-                pass
+        # Участники получают карточку параллельно; недоступные (заблокировали бота,
+        # удалили аккаунт) пропускаются движком
+        return await self.engine.broadcast(
+            team['members'] if members is None else members, text,
+            on_delivery=on_delivery, reply_markup=keyboard
+        )
+    
+    def get_waiting_recipients(self) -> List[str]:
+        """Возвращает ожидающих в очередях всех когорт (получатели рассылки «Ожидающим»)."""
+        return self.storage.get_queued_ids()
+    
+    def get_team_recipients(self) -> List[str]:
+        """Возвращает участников активных команд без повторов (получатели рассылки «В командах»)."""
+        recipients = (str(tg_id) for team in self.storage.get_active_teams() for tg_id in team['members'])
+        return list(dict.fromkeys(recipients))
     
     async def broadcast_to_waiting(self, text: str) -> int:
         """
@@ -101,17 +130,8 @@ class NotificationService:
         Returns:
             Количество успешно доставленных сообщений
         """
-        store = self.storage.load()
-        sent_count = 0
-        
-        for tg_id in store['queue']:
-            try:
-                await self.bot.send_message(chat_id=tg_id, text=text)
-                sent_count += 1
-            except (TelegramForbiddenError, TelegramBadRequest):
-                pass
-        
-        return sent_count
+        result = await self.engine.broadcast(self.get_waiting_recipients(), text)
+        return result.sent
     
     async def broadcast_to_teams(self, text: str) -> int:
         """
@@ -123,22 +143,8 @@ class NotificationService:
         Returns:
             Количество успешно доставленных сообщений
         """
-        store = self.storage.load()
-        sent_count = 0
-        sent_to = set()  # Избегаем дублей
-        
-        for team in store['teams'].values():
-            if team['status'] == 'active':
-                for tg_id in team['members']:
-                    if tg_id not in sent_to:
-                        try:
-                            await self.bot.send_message(chat_id=tg_id, text=text)
-                            sent_count += 1
-                            sent_to.add(tg_id)
-                        except (TelegramForbiddenError, TelegramBadRequest):
-                            pass
-        
-        return sent_count
+        result = await self.engine.broadcast(self.get_team_recipients(), text)
+        return result.sent
     
     async def send_to_moderators(self, text: str) -> bool:
         """
@@ -154,8 +160,5 @@ class NotificationService:
         if not mod_chat_id:
             return False
         
-        try:
-            await self.bot.send_message(chat_id=mod_chat_id, text=text)
-            return True
-        except (TelegramForbiddenError, TelegramBadRequest):
-            return False
+        delivery = await self.engine.send(mod_chat_id, text)
+        return delivery.status == SENT
@@ -0,0 +1,90 @@
+"""
+Доступ к хранилищу в пределах одного обновления Telegram.
+
+Обработчик получает RequestStore через middleware (см.
+middlewares.request_store). Данные автора обновления (пользователь,
+позиция и размер очереди его когорты) читаются один раз при первом
+обращении, а изменения копятся и записываются одной транзакцией после
+завершения обработчика. Раньше обработчик делал несколько чтений
+подряд и по записи на каждое изменение.
+
+Пример:
+    user = await request_store.get_user()
+    request_store.write('set_user_status', tg_id, 'waiting', None)
+    request_store.write('enqueue', tg_id)
+    await request_store.commit()  # если нужно прочитать результат сразу
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..types import User, UserSnapshot
+from .async_storage import AsyncStorage
+from .storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+def _apply(storage: Storage, writes: List[Tuple[str, tuple, Dict[str, Any]]]) -> None:
+    """Выполняет накопленные изменения одной транзакцией."""
+    with storage.transaction():
+        for name, args, kwargs in writes:
+            getattr(storage, name)(*args, **kwargs)
+
+
+class RequestStore:
+    """Ленивый снимок данных автора обновления и пакет изменений."""
+
+    def __init__(self, tg_id: Optional[int], storage: Optional[AsyncStorage] = None):
+        """
+        Args:
+            tg_id: Автор обновления
+            storage: Хранилище (по умолчанию AsyncStorage())
+        """
+        self.tg_id = tg_id
+        self.storage = storage or AsyncStorage()
+        self._snapshot: Optional[UserSnapshot] = None
+        self._writes: List[Tuple[str, tuple, Dict[str, Any]]] = []
+
+    async def snapshot(self) -> UserSnapshot:
+        """Возвращает снимок (читается при первом обращении и после commit())."""
+        if self._snapshot is None:
+            self._snapshot = await self.storage.get_user_snapshot(self.tg_id)
+        return self._snapshot
+
+    async def get_user(self) -> Optional[User]:
+        """Автор обновления (None - не зарегистрирован)."""
+        return (await self.snapshot())['user']
+
+    async def get_queue_position(self) -> int:
+        """Позиция автора в очереди его когорты, -1 - не в очереди."""
+        return (await self.snapshot())['queue_position']
+
+    async def get_queue_size(self) -> int:
+        """Размер очереди когорты автора."""
+        return (await self.snapshot())['queue_size']
+
+    def write(self, method: str, *args, **kwargs) -> None:
+        """Откладывает вызов изменяющего метода Storage до commit()."""
+        if not callable(getattr(Storage, method, None)):
+            raise AttributeError(f"У Storage нет метода {method}")
+        self._writes.append((method, args, kwargs))
+
+    @property
+    def pending(self) -> int:
+        """Отложенных изменений."""
+        return len(self._writes)
+
+    async def commit(self) -> None:
+        """Записывает отложенные изменения одной транзакцией; снимок перечитается при следующем обращении."""
+        if not self._writes:
+            return
+        writes, self._writes = self._writes, []
+        await self.storage.run(_apply, self.storage.storage, writes)
+        self._snapshot = None
+
+    def discard(self) -> None:
+        """Отбрасывает отложенные изменения (обработчик завершился ошибкой)."""
+        if self._writes:
+            logger.warning(f"Отброшено изменений хранилища: {len(self._writes)} (пользователь {self.tg_id})")
+        self._writes = []
@@ -1,28 +1,52 @@
 """
 Планировщик для автоматического объединения команд.
+
+Режимы (MATCH_MODE):
+    schedule   - объединение всей очереди каждые 2 дня в 12:00 (по умолчанию);
+    continuous - очередь проверяется каждые MATCH_CHECK_SECONDS секунд, и команды
+                 формируются небольшими партиями из начала очереди, как только
+                 в ней набирается TEAM_BASE × MATCH_THRESHOLD_TEAMS человек или
+                 первый в очереди ждет дольше MATCH_MAX_WAIT_MINUTES минут.
+
+Раунды когорт (см. services.cohorts) считаются параллельно и фиксируются
+независимо; ресурсоемкие стратегии считаются в пуле из MATCH_WORKERS процессов.
 """
 
 import asyncio
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional, Union
 
+from .broadcast_jobs import BroadcastJobManager
+from .cohorts import Cohort, load_cohorts
 from .storage import Storage
-from .matcher import match_round
+from .matching_strategies import create_matcher
 from .notify import NotificationService
 
 logger = logging.getLogger(__name__)
 
 
 class MatchScheduler:
-    """Планировщик автоматического объединения команд каждые 2 дня в 12:00."""
+    """Планировщик автоматического объединения команд (по расписанию или непрерывно)."""
     
     def __init__(self, bot):
         self.bot = bot
         self.storage = Storage()
-        self.notify_service = NotificationService(bot)
+        self.notify_service = NotificationService(bot, self.storage)
+        self.broadcast_jobs = BroadcastJobManager(bot, self.storage, self.notify_service)
         self._task: Optional[asyncio.Task] = None
         self._running = False
+        
+        self.continuous = os.getenv('MATCH_MODE', 'schedule').lower() == 'continuous'
+        self.threshold_teams = max(int(os.getenv('MATCH_THRESHOLD_TEAMS', '3')), 1)
+        self.max_wait = timedelta(minutes=int(os.getenv('MATCH_MAX_WAIT_MINUTES', '60')))
+        self.check_interval = int(os.getenv('MATCH_CHECK_SECONDS', '30'))
+        
+        # Пул процессов для ресурсоемких стратегий комплектования (создается по требованию)
+        self.match_workers = int(os.getenv('MATCH_WORKERS', '0'))
+        self._process_pool: Optional[ProcessPoolExecutor] = None
     
     def start(self):
         """Запускает планировщик."""
@@ -31,11 +55,17 @@ class MatchScheduler:
             return
         
         self._running = True
-        self._task = asyncio.create_task(self._scheduler_loop())
-        logger.info("Планировщик автоматического объединения команд запущен")
+        loop = self._continuous_loop() if self.continuous else self._scheduler_loop()
+        self._task = asyncio.create_task(loop)
+        logger.info(f"Планировщик автоматического объединения команд запущен "
+                    f"(режим {'continuous' if self.continuous else 'schedule'})")
     
     def stop(self):
         """Останавливает планировщик."""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        
         if not self._running:
             return
         
@@ -69,6 +99,12 @@ class MatchScheduler:
     
     def get_next_match_time_str(self) -> str:
         """Возвращает строковое представление времени следующего объединения."""
+        if self.continuous:
+            team_base = int(os.getenv('TEAM_BASE', '5'))
+            max_wait = int(self.max_wait.total_seconds() // 60)
+            return (f"как только в очереди наберется {team_base * self.threshold_teams} человек, "
+                    f"но не позже чем через {max_wait} мин. ожидания")
+        
         next_time = self.get_next_match_time()
         
         # Русские названия месяцев
@@ -114,66 +150,146 @@ class MatchScheduler:
         except Exception as e:
             logger.error(f"Ошибка в планировщике: {e}", exc_info=True)
     
-    async def _perform_auto_match(self):
-        """Выполняет автоматическое объединение команд."""
+    def get_batch_size(self, queue_size: int, waited: Optional[timedelta], team_base: int) -> int:
+        """
+        Решает, пора ли комплектовать партию в непрерывном режиме.
+        
+        Args:
+            queue_size: Размер очереди
+            waited: Сколько ждет первый в очереди (None - неизвестно: он встал
+                в очередь до появления queued_at, поэтому считается, что
+                максимальное ожидание уже прошло)
+            team_base: Базовый размер команды
+            
+        Returns:
+            Сколько участников из начала очереди комплектовать (0 - пока рано).
+            По порогу берется целое число базовых команд, остальные дожидаются
+            следующей партии; по времени ожидания - вся очередь, чтобы остаток
+            разошелся по командам эластично.
+        """
+        if queue_size < team_base:
+            return 0
+        if waited is None or waited >= self.max_wait:
+            return queue_size
+        if queue_size >= team_base * self.threshold_teams:
+            return queue_size // team_base * team_base
+        return 0
+    
+    async def _continuous_loop(self):
+        """Цикл непрерывного режима: проверяет очереди когорт и комплектует партии."""
         try:
-            import os
+            while self._running:
+                limits = {}
+                for cohort in load_cohorts().values():
+                    since = self.storage.get_queue_head_since(cohort.id)
+                    waited = datetime.now() - since if since else None
+                    queue_size = self.storage.get_queue_size(cohort.id)
+                    batch_size = self.get_batch_size(queue_size, waited, cohort.team_base)
+                    if batch_size:
+                        limits[cohort.id] = batch_size
+                
+                if limits:
+                    await self._perform_auto_match(limits)
+                
+                await asyncio.sleep(self.check_interval)
+                
+        except asyncio.CancelledError:
+            logger.info("Планировщик был отменен")
+        except Exception as e:
+            logger.error(f"Ошибка в планировщике: {e}", exc_info=True)
+    
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Пул процессов для ресурсоемких стратегий (None, если MATCH_WORKERS=0)."""
+        if self._process_pool is None and self.match_workers > 0:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.match_workers)
+        return self._process_pool
+    
+    async def _perform_auto_match(self, limits: Optional[Dict[str, int]] = None):
+        """
+        Выполняет автоматическое объединение команд во всех когортах параллельно.
+        
+        Раунды когорт считаются одновременно и фиксируются каждый сам по себе,
+        поэтому большая когорта не задерживает остальные.
+        
+        Args:
+            limits: Сколько участников из начала очереди комплектовать по когортам
+                (None - все очереди целиком во всех когортах)
+        """
+        cohorts = load_cohorts()
+        if limits is not None:
+            cohorts = {cohort_id: cohorts[cohort_id] for cohort_id in limits if cohort_id in cohorts}
+        
+        await asyncio.gather(*(
+            self._match_cohort(cohort, (limits or {}).get(cohort.id))
+            for cohort in cohorts.values()
+        ))
+    
+    async def match_round(self, cohort: Cohort, limit: Optional[int] = None,
+                          report_chat_id: Optional[Union[int, str]] = None) -> List[str]:
+        """
+        Комплектует команды когорты, не блокируя цикл событий.
+        
+        Раунд считается в потоке (ресурсоемкие стратегии - в пуле процессов)
+        и фиксируется вместе с заданием рассылки карточек (outbox): после
+        перезапуска рассылка продолжится.
+        
+        Args:
+            cohort: Когорта
+            limit: Комплектовать только первых limit участников очереди (None - всю очередь)
+            report_chat_id: Чат для отчета о рассылке карточек
             
-            # Получаем настройки
-            team_base = int(os.getenv('TEAM_BASE', '5'))
-            elastic_max = int(os.getenv('ELASTIC_MAX', '2'))
+        Returns:
+            ID созданных команд
+        """
+        head, users = self.storage.get_match_input(cohort.id, limit)
+        matcher = create_matcher()
+        pool = self._get_process_pool() if matcher.cpu_heavy else None
+        loop = asyncio.get_running_loop()
+        teams_data, _ = await loop.run_in_executor(
+            pool, matcher.match, head, users, cohort.team_base, cohort.elastic_max
+        )
+        return self.storage.commit_match(teams_data, cohort.id, notify=True,
+                                         report_chat_id=report_chat_id)
+    
+    async def _match_cohort(self, cohort: Cohort, limit: Optional[int] = None):
+        """
+        Проводит раунд комплектования одной когорты.
+        
+        Args:
+            cohort: Когорта
+            limit: Комплектовать только первых limit участников очереди (None - всю очередь)
+        """
+        title = f"когорта {cohort.id}" if cohort.id else "общая очередь"
+        try:
+            team_base = cohort.team_base
             
-            # Загружаем текущее состояние
-            store = self.storage.load()
-            queue = store['queue'].copy()
+            # Проверяем размер очереди
+            queue_size = self.storage.get_queue_size(cohort.id)
             
-            if len(queue) < team_base:
-                logger.info(f"Недостаточно людей в очереди для автоматического объединения. Нужно минимум {team_base}, а в очереди {len(queue)}.")
+            if queue_size < team_base:
+                logger.info(f"Недостаточно людей в очереди ({title}) для автоматического объединения. Нужно минимум {team_base}, а в очереди {queue_size}.")
                 return
             
-            # Выполняем матчинг
-            teams_data, remaining_queue = match_round(queue, team_base, elastic_max)
+            # Считаем раунд вне цикла событий и фиксируем результат когорты
+            # отдельной транзакцией
+            mod_chat_id = os.getenv('MOD_CHAT_ID')
+            created_teams = await self.match_round(cohort, limit, report_chat_id=mod_chat_id)
             
-            if not teams_data:
-                logger.info("Автоматическое объединение: не удалось сформировать ни одной команды.")
+            if not created_teams:
+                logger.info(f"Автоматическое объединение ({title}): не удалось сформировать ни одной команды.")
                 return
             
-            # Создаем команды и обновляем пользователей
-            created_teams = []
-            for team_members in teams_data:
-                # Создаем команду в storage
-                team_id = self.storage.create_team(team_members)
-                
-                # Обновляем статус участников
-                for tg_id in team_members:
-                    self.storage.set_user_status(tg_id, 'teamed', team_id)
-                
-                # Убираем участников из очереди
-                for tg_id in team_members:
-                    self.storage.remove_from_queue(tg_id)
-                
-                created_teams.append(team_id)
-            
-            # Обновляем очередь (остаток)
-            store = self.storage.load()
-            store['queue'] = remaining_queue
-            self.storage.save(store)
-            
-            # Отправляем карточки командам
-            for team_id in created_teams:
-                team = self.storage.get_team(team_id)
-                if team:
-                    await self.notify_service.send_team_card_to_members(team)
+            # Карточки рассылаются в фоне, не задерживая следующие раунды
+            self.broadcast_jobs.resume()
             
             teams_count = len(created_teams)
-            remaining_count = len(remaining_queue)
+            remaining_count = self.storage.get_queue_size(cohort.id)
             
-            logger.info(f"Автоматическое объединение завершено: создано команд {teams_count}, в очереди осталось {remaining_count}")
+            logger.info(f"Автоматическое объединение ({title}) завершено: создано команд {teams_count}, в очереди осталось {remaining_count}")
             
             # Уведомляем админов о результатах (если настроен MOD_CHAT_ID)
-            mod_chat_id = os.getenv('MOD_CHAT_ID')
             if mod_chat_id:
-                admin_message = f"""🤖 Автоматическое объединение команд завершено
+                admin_message = f"""🤖 Автоматическое объединение команд завершено ({title})
 
 ✅ Сформировано команд: {teams_count}
 📋 Команды: {', '.join(created_teams)}
@@ -182,4 +298,4 @@ class MatchScheduler:
                 await self.notify_service.send_to_moderators(admin_message)
                 
         except Exception as e:
-            logger.error(f"Ошибка при автоматическом объединении команд: {e}", exc_info=True)
+            logger.error(f"Ошибка при автоматическом объединении команд ({title}): {e}", exc_info=True)
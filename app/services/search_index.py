@@ -0,0 +1,177 @@
+"""
+Поисковый индекс пользователей по имени, username и ссылке на Telegram.
+
+Индекс триграммный и нечувствителен к регистру (и к «ё»/«е»): каждое слово
+полей full_name, username и telegram_link раскладывается на триграммы
+с граничными пробелами, для каждой триграммы хранится множество tg_id.
+Запрос раскладывается так же; кандидаты берутся только из самых редких
+триграмм запроса (если у записи должно совпасть не меньше t из m триграмм,
+она обязана содержать хотя бы одну из m - t + 1 самых редких), после чего
+каждый кандидат проверяется точно. Поэтому поиск почти не зависит от
+числа пользователей.
+
+Индекс не хранится на диске: Storage строит его при первом поиске
+и поддерживает инкрементально при фиксации изменений пользователей.
+"""
+
+import heapq
+import math
+import re
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# Доля триграмм запроса, которая должна найтись у пользователя
+DEFAULT_MIN_SIMILARITY = 0.5
+
+# Поля пользователя, по которым ведется поиск
+SEARCH_FIELDS = ('full_name', 'username', 'telegram_link')
+
+# Размер множества кандидатов, которое дешевле проверить, чем сужать дальше
+_VERIFY_DIRECTLY = 32
+
+_WORD_RE = re.compile(r'\w+')
+_LINK_RE = re.compile(r'^(?:https?://)?(?:www\.)?(?:t|telegram)\.me/', re.IGNORECASE)
+
+
+class SearchHit(NamedTuple):
+    """Результат поиска: ID пользователя, оценка и признак точного совпадения."""
+    tg_id: str
+    score: float
+    # Запрос целиком входит в одно из полей как подстрока
+    exact: bool
+
+
+def normalize(text: str) -> str:
+    """Приводит текст к виду для поиска: нижний регистр, «ё» -> «е»."""
+    return text.lower().replace('ё', 'е')
+
+
+def _field_texts(user: dict) -> List[str]:
+    """Возвращает нормализованные значения полей поиска пользователя."""
+    texts = []
+    for field in SEARCH_FIELDS:
+        value = user.get(field)
+        if not value or not isinstance(value, str):
+            continue
+        if field == 'telegram_link':
+            value = _LINK_RE.sub('', value.strip())
+        texts.append(normalize(value.strip().lstrip('@')))
+    return texts
+
+
+def _trigrams(words: Iterable[str]) -> Set[str]:
+    """Возвращает триграммы слов с граничными пробелами."""
+    grams = set()
+    for word in words:
+        padded = f' {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class UserSearchIndex:
+    """Триграммный индекс пользователей с нечетким ранжированным поиском."""
+
+    def __init__(self, users: Optional[Dict[str, dict]] = None):
+        # Триграмма -> tg_id пользователей, у которых она есть
+        self._postings: Dict[str, Set[str]] = {}
+        # tg_id -> (триграммы, нормализованные поля)
+        self._docs: Dict[str, Tuple[FrozenSet[str], Tuple[str, ...]]] = {}
+        for tg_id, user in (users or {}).items():
+            self.update(tg_id, user)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def update(self, tg_id: str, user: Optional[dict]) -> None:
+        """Индексирует пользователя заново (user=None - удаляет из индекса)."""
+        self.remove(tg_id)
+        if not isinstance(user, dict):
+            return
+        texts = _field_texts(user)
+        if not texts:
+            return
+        grams = _trigrams(word for text in texts for word in _WORD_RE.findall(text))
+        self._docs[tg_id] = (frozenset(grams), tuple(texts))
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(tg_id)
+
+    def remove(self, tg_id: str) -> None:
+        """Удаляет пользователя из индекса."""
+        doc = self._docs.pop(tg_id, None)
+        if doc is None:
+            return
+        for gram in doc[0]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(tg_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def _exact_candidates(self, words: List[str]) -> Iterable[str]:
+        """
+        Возвращает надмножество пользователей, у которых запрос входит в поле подстрокой.
+        
+        Такое поле содержит все внутренние (без граничных пробелов) триграммы
+        запроса, поэтому пересекаем их списки, начиная с самых коротких.
+        У запросов короче трех символов внутренних триграмм нет, поэтому
+        проверяются все записи: подстрока может начинаться и внутри слова.
+        """
+        inner = {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+        if not inner:
+            return self._docs.keys()
+        
+        postings = sorted((self._postings.get(gram, set()) for gram in inner), key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            if len(candidates) <= _VERIFY_DIRECTLY:
+                break
+            candidates &= ids
+        return candidates
+    
+    def _verify(self, candidates: Iterable[str], needle: str, query_grams: Set[str],
+                required: int, hits: Dict[str, SearchHit]) -> None:
+        """Проверяет кандидатов и добавляет подходящих в hits."""
+        for tg_id in candidates:
+            grams, texts = self._docs[tg_id]
+            exact = any(needle in text for text in texts)
+            shared = len(query_grams & grams)
+            if not exact and (not required or shared < required):
+                continue
+            # Доля совпавших триграмм запроса, при равенстве - более короткие записи
+            score = shared / len(query_grams) + shared / (len(grams) + len(query_grams))
+            hits[tg_id] = SearchHit(tg_id, score, exact)
+    
+    def search(self, query: str, limit: int = 10,
+               min_similarity: float = DEFAULT_MIN_SIMILARITY) -> List[SearchHit]:
+        """
+        Ищет пользователей по запросу.
+
+        Args:
+            query: Имя, фамилия, username или их часть (регистр не важен)
+            limit: Максимальное число результатов
+            min_similarity: Минимальная доля совпавших триграмм запроса
+
+        Returns:
+            Результаты по убыванию оценки. Если запрос входит подстрокой хотя бы
+            в одну запись, возвращаются только такие записи (exact=True),
+            иначе - похожие записи (exact=False)
+        """
+        needle = normalize(query.strip().lstrip('@'))
+        words = _WORD_RE.findall(needle)
+        if not words:
+            return []
+
+        query_grams = _trigrams(words)
+        hits: Dict[str, SearchHit] = {}
+        self._verify(self._exact_candidates(words), needle, query_grams, 0, hits)
+        
+        if not hits and len(needle) >= 3:
+            # Точных совпадений нет - ищем похожие (опечатки, пропущенные буквы)
+            required = max(1, math.ceil(len(query_grams) * min_similarity))
+            # Достаточно пройти по самым редким триграммам (принцип Дирихле)
+            rare = sorted(query_grams, key=lambda gram: len(self._postings.get(gram, ())))
+            candidates: Set[str] = set()
+            for gram in rare[:len(query_grams) - required + 1]:
+                candidates.update(self._postings.get(gram, ()))
+            self._verify(candidates, needle, query_grams, required, hits)
+        
+        return heapq.nsmallest(limit, hits.values(), key=lambda hit: (not hit.exact, -hit.score, hit.tg_id))
@@ -1,172 +1,836 @@
 """
-JSON-хранилище для данных бота с атомарной записью.
+Хранилище данных бота с атомарной записью.
+
+Разобранный Store держится в памяти процесса и переиспользуется всеми
+экземплярами Storage, открытыми на одно и то же хранилище. Данные
+перечитываются, только если их изменил другой процесс (для JSON-файла -
+по mtime, размеру и inode).
+
+Изменения вносятся в транзакциях: Store, выданный транзакцией, отмечает
+затронутые коллекции и записи, и бэкенд (см. storage_backends) записывает
+только их там, где это возможно.
+
+Очередь ожидания хранится в памяти как WaitingQueue (см. waiting_queue):
+проверка членства, позиция, добавление и удаление не требуют прохода
+по всей очереди, а в данные она по-прежнему пишется списком.
+
+Транзакция держит межпроцессную блокировку (fcntl) от чтения до записи,
+поэтому бот, дашборд и скрипты обслуживания могут работать с одним
+хранилищем одновременно. Каждая фиксация увеличивает версию Store;
+save() данных, прочитанных до чужой фиксации, отклоняется с
+StoreConflictError (см. update для повтора).
 """
 
-import json
+import logging
 import os
+from collections.abc import MutableMapping
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List
-from threading import Lock
+from typing import Any, Callable, Hashable, Iterable, Optional, List, Dict, Iterator, Set, Tuple, Union
+from threading import Lock, RLock
+
+from ..types import Broadcast, Store, User, UserSnapshot, Team, Question, Unreachable
+from .util import clone_json
+from .aggregates import AGGREGATED_COLLECTIONS, STATS_KEY, apply_change, compute_stats, queue_size
+from .cohorts import (
+    DEFAULT_COHORT, cohort_of_queue, queue_key, queue_version_key, team_id as cohort_team_id, team_seq_key
+)
+from .matching_strategies import Matcher
+from .search_index import SearchHit, UserSearchIndex
+from .storage_backends import ChangeSet, create_backend, default_store, is_queue_collection
+from .waiting_queue import WaitingQueue
+
+logger = logging.getLogger(__name__)
+
+# Ключ Store с версией данных: растет на единицу при каждой фиксации
+VERSION_KEY = 'version'
+
+
+class StoreConflictError(RuntimeError):
+    """Данные изменены другим писателем после чтения (версия не совпала)."""
+
+
+class TransactionAbortedError(RuntimeError):
+    """Вложенная транзакция завершилась ошибкой, поэтому внешняя откатана целиком."""
+
+
+class StoreCorruptedError(RuntimeError):
+    """Данные хранилища повреждены: изменять их в транзакции нельзя."""
+
+
+def _to_queue(items) -> WaitingQueue:
+    """Приводит очередь к WaitingQueue из строковых ID (в старых данных бывают int)."""
+    if isinstance(items, _TrackedQueue):
+        items = items._queue
+    return WaitingQueue(str(item) for item in items)
+
+
+def _prepare_store(store: Store) -> Store:
+    """Заменяет списки-очереди прочитанного Store на WaitingQueue, проставляет версию и агрегаты."""
+    for name in list(store):
+        if is_queue_collection(name):
+            store[name] = _to_queue(store[name])
+    # Данные, записанные до появления версий, считаем версией 0
+    store.setdefault(VERSION_KEY, 0)
+    if not isinstance(store.get(STATS_KEY), dict):
+        store[STATS_KEY] = compute_stats(store)
+    return store
+
+
+class _TrackedQueue:
+    """
+    Очередь Store в транзакции: записывает операции над элементами.
+    
+    Добавление в начало/конец и удаление попадают в ChangeSet отдельными
+    операциями, поэтому бэкенд может не переписывать очередь целиком.
+    """
+    
+    def __init__(self, name: str, queue: WaitingQueue, changes: ChangeSet):
+        self._name = name
+        self._queue = queue
+        self._changes = changes
+    
+    def append(self, item: Hashable) -> None:
+        self._queue.append(item)
+        self._changes.log_queue_op(self._name, 'push', item)
+    
+    def appendleft(self, item: Hashable) -> None:
+        self._queue.appendleft(item)
+        self._changes.log_queue_op(self._name, 'front', item)
+    
+    def extend(self, items) -> None:
+        for item in items:
+            self.append(item)
+    
+    def extendleft(self, items) -> None:
+        for item in reversed(list(items)):
+            self.appendleft(item)
+    
+    def insert(self, index: int, item: Hashable) -> None:
+        if index == 0:
+            self.appendleft(item)
+        elif index >= len(self._queue):
+            self.append(item)
+        else:
+            self._queue.insert(index, item)
+            self._changes.touch(self._name)
+    
+    def remove(self, item: Hashable) -> None:
+        self._queue.remove(item)
+        self._changes.log_queue_op(self._name, 'remove', item)
+    
+    def index(self, item: Hashable) -> int:
+        return self._queue.index(item)
+    
+    def __getitem__(self, index):
+        return self._queue[index]
+    
+    def __len__(self) -> int:
+        return len(self._queue)
+    
+    def __iter__(self):
+        return iter(self._queue)
+    
+    def __contains__(self, item) -> bool:
+        return item in self._queue
+    
+    def __add__(self, other) -> list:
+        return self._queue.to_json() + list(other)
+    
+    def __radd__(self, other) -> list:
+        return list(other) + self._queue.to_json()
+    
+    def __eq__(self, other) -> bool:
+        return self._queue == (other._queue if isinstance(other, _TrackedQueue) else other)
+
+
+class _TrackedCollection(MutableMapping):
+    """Коллекция-словарь Store, отмечающая затронутые ключи."""
+    
+    def __init__(self, name: str, entries: dict, changes: ChangeSet):
+        self._name = name
+        self._entries = entries
+        self._changes = changes
+    
+    def _touch(self, key) -> None:
+        """Отмечает запись затронутой, запоминая её прежний вид для агрегатов."""
+        if self._name in AGGREGATED_COLLECTIONS and (self._name, key) not in self._changes.before:
+            self._changes.before[(self._name, key)] = clone_json(self._entries.get(key))
+        self._changes.touch(self._name, key)
+    
+    def __getitem__(self, key):
+        value = self._entries[key]
+        # Запись могут изменить на месте - считаем её затронутой
+        self._touch(key)
+        return value
+    
+    def __setitem__(self, key, value) -> None:
+        self._touch(key)
+        self._entries[key] = value
+    
+    def __delitem__(self, key) -> None:
+        if key not in self._entries:
+            raise KeyError(key)
+        self._touch(key)
+        del self._entries[key]
+    
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+    
+    def __iter__(self):
+        return iter(self._entries)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
 
-from ..types import Store, User, Team, Question
-from .util import atomic_write, ensure_file_exists
+
+class _TrackedStore(MutableMapping):
+    """Store транзакции: оборачивает коллекции для учета изменений."""
+    
+    def __init__(self, store: Store, changes: ChangeSet):
+        self._store = store
+        self._changes = changes
+    
+    def __getitem__(self, name):
+        value = self._store[name]
+        if isinstance(value, dict):
+            return _TrackedCollection(name, value, self._changes)
+        if isinstance(value, WaitingQueue):
+            return _TrackedQueue(name, value, self._changes)
+        return value
+    
+    def __setitem__(self, name, value) -> None:
+        self._changes.touch(name)
+        if is_queue_collection(name):
+            value = _to_queue(value)
+        self._store[name] = value
+    
+    def __delitem__(self, name) -> None:
+        del self._store[name]
+        self._changes.touch(name)
+    
+    def __contains__(self, name) -> bool:
+        return name in self._store
+    
+    def __iter__(self):
+        return iter(self._store)
+    
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+class _StoreCache:
+    """Общий для процесса кэш разобранного Store одного хранилища."""
+    
+    _instances: Dict[tuple, '_StoreCache'] = {}
+    _instances_lock = Lock()
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = RLock()
+        # Межпроцессная блокировка транзакций (бот, дашборд, скрипты обслуживания);
+        # бэкенд берет ее же для своих фоновых работ (см. JournalBackend)
+        self.file_lock = backend.file_lock
+        self.store: Optional[Store] = None
+        self.signature: Optional[Hashable] = None
+        # Глубина вложенности открытых транзакций (владелец - поток, держащий lock)
+        self.depth = 0
+        # Изменения открытой транзакции
+        self.changes = ChangeSet()
+        # Ошибка вложенной транзакции: ее изменения уже в общем Store, поэтому
+        # внешняя транзакция не фиксируется, а откатывается
+        self.failed: Optional[BaseException] = None
+        # Поисковый индекс пользователей (строится при первом поиске)
+        self.search_index: Optional[UserSearchIndex] = None
+        # Растет при каждом изменении прав админов (по нему сбрасывается кэш ACL)
+        self.admins_version = 0
+    
+    @classmethod
+    def for_path(cls, file_path: str) -> '_StoreCache':
+        """Возвращает кэш для хранилища (один на бэкенд и путь в пределах процесса)."""
+        backend = create_backend(file_path)
+        key = (type(backend).__name__, os.path.abspath(backend.path))
+        with cls._instances_lock:
+            cache = cls._instances.get(key)
+            if cache is None:
+                cache = cls._instances[key] = cls(backend)
+            return cache
+    
+    def invalidate(self) -> None:
+        """Сбрасывает кэш: следующее чтение возьмет данные из бэкенда заново."""
+        self.store = None
+        self.signature = None
+        self.search_index = None
+        self.admins_version += 1
+        self.changes.clear()
+        self.failed = None
 
 
 class Storage:
-    """Класс для работы с JSON-хранилищем данных."""
+    """Класс для работы с хранилищем данных."""
     
     def __init__(self, file_path: str = 'data.json'):
         self.file_path = file_path
-        self._lock = Lock()
+        self._cache = _StoreCache.for_path(file_path)
+        self.backend = self._cache.backend
+        # Блокировка общая для всех экземпляров на это хранилище
+        self._lock = self._cache.lock
         self._ensure_initialized()
         
         # Константы для кэширования файлов
         self.CACHED_PHOTO_KEY = 'cached_welcome_photo_file_id'
     
+    @staticmethod
+    def _default_store() -> Store:
+        """Возвращает пустой Store."""
+        return default_store()
+    
     def _ensure_initialized(self) -> None:
-        """Инициализирует файл хранилища, если он не существует."""
-        default_store: Store = {
-            'users': {},
-            'queue': [],
-            'teams': {},
-            'counters': {'teamSeq': 0},
-            'admins': {},
-            'questions': {},
-            'cache': {}  # Кэш для файлов и других данных
-        }
-        ensure_file_exists(self.file_path, default_store)
+        """Инициализирует хранилище, если оно не существует."""
+        # Обычно хранилище уже есть: проверяем без блокировок, чтобы создание
+        # Storage() в обработчиках не ждало чужую транзакцию
+        if self.backend.exists():
+            return
+        with self._lock, self._cache.file_lock:
+            if not self.backend.exists():
+                self.backend.initialize(self._default_store())
     
-    def load(self) -> Store:
-        """Загружает данные из файла."""
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Если файл поврежден или отсутствует - возвращаем пустой store
-            self._ensure_initialized()
-            return self.load()
+    def _read(self, for_update: bool = False) -> Store:
+        """
+        Возвращает закэшированный Store, перечитывая его только при внешнем изменении.
+        
+        Результат разделяется между всеми экземплярами Storage: его нельзя
+        отдавать наружу без копирования, а менять можно только через transaction().
+        
+        Args:
+            for_update: Store читается для транзакции. Если данные повреждены,
+                выбрасывается StoreCorruptedError, иначе возвращается пустой
+                Store только для чтения
+        """
+        with self._lock:
+            cache = self._cache
+            if cache.depth and cache.store is not None:
+                # Внутри транзакции работаем с уже изменяемым Store, не перечитывая его
+                return cache.store
+            try:
+                signature = self.backend.signature()
+            except FileNotFoundError:
+                self._ensure_initialized()
+                signature = self.backend.signature()
+            
+            if cache.store is None or cache.signature != signature:
+                try:
+                    cache.store = _prepare_store(self.backend.read())
+                    cache.search_index = None
+                except ValueError as e:
+                    cache.invalidate()
+                    if for_update or cache.depth:
+                        # Фиксация пустого Store затерла бы поврежденные данные
+                        raise StoreCorruptedError(f"Данные хранилища {self.file_path} повреждены: {e}") from e
+                    # Данные повреждены - читаем пустой store, не перезаписывая их
+                    return _prepare_store(self._default_store())
+                cache.signature = signature
+            return cache.store
     
-    def save(self, store: Store) -> None:
-        """Сохраняет данные в файл атомарно."""
+    def _commit(self, store: Store, changes: ChangeSet) -> None:
+        """Записывает изменения Store в бэкенд и обновляет кэш."""
         with self._lock:
-            atomic_write(self.file_path, store)
-    
-    def enqueue(self, tg_id: int) -> None:
-        """Добавляет пользователя в очередь, если его там нет."""
-        store = self.load()
-        tg_id_str = str(tg_id)
-        if tg_id_str not in store['queue']:
-            store['queue'].append(tg_id_str)
-            self.save(store)
-    
-    def remove_from_queue(self, tg_id: int) -> bool:
-        """Удаляет пользователя из очереди. Возвращает True, если был удален."""
-        store = self.load()
-        tg_id_str = str(tg_id)
-        if tg_id_str in store['queue']:
-            store['queue'].remove(tg_id_str)
-            self.save(store)
-            return True
-        return False
+            cache = self._cache
+            try:
+                if changes:
+                    self._update_queue_versions(store, changes)
+                    self._update_stats(store, changes)
+                    store[VERSION_KEY] = store.get(VERSION_KEY, 0) + 1
+                    changes.touch(VERSION_KEY)
+                    self.backend.write(store, changes)
+                    self._update_search_index(store, changes)
+                cache.store = store
+                cache.signature = self.backend.signature()
+            except Exception:
+                # Кэш мог разойтись с диском - перечитаем при следующем обращении
+                cache.invalidate()
+                raise
+            finally:
+                changes.clear()
+    
+    @staticmethod
+    def _update_queue_versions(store: Store, changes: ChangeSet) -> None:
+        """Увеличивает версии очередей, измененных транзакцией (ключ кэша предпросмотра)."""
+        queues = set(changes.queue_ops)
+        queues.update(name for name in changes.collections if is_queue_collection(name))
+        if not queues:
+            return
+        counters = store['counters']
+        for name in queues:
+            key = queue_version_key(cohort_of_queue(name))
+            counters[key] = counters.get(key, 0) + 1
+            changes.touch('counters', key)
     
-    def create_team(self, members: List[int]) -> str:
-        """Создает новую команду. Возвращает ID команды."""
-        store = self.load()
+    @staticmethod
+    def _update_stats(store: Store, changes: ChangeSet) -> None:
+        """Обновляет агрегаты Store по изменениям транзакции."""
+        stats = store.get(STATS_KEY)
+        if not isinstance(stats, dict) or STATS_KEY in changes.collections or \
+                changes.collections & AGGREGATED_COLLECTIONS:
+            new_stats = compute_stats(store)
+        else:
+            new_stats = clone_json(stats)
+            for (collection, key), before in changes.before.items():
+                after = (store.get(collection) or {}).get(key)
+                apply_change(new_stats, collection, before, after)
+            new_stats['queue_size'] = queue_size(store)
         
-        # Генерируем новый ID команды
-        team_seq = store['counters']['teamSeq']
-        team_id = f"C-{team_seq + 1}"
-        store['counters']['teamSeq'] = team_seq + 1
+        if new_stats != stats:
+            store[STATS_KEY] = new_stats
+            changes.touch(STATS_KEY)
+    
+    def _update_search_index(self, store: Store, changes: ChangeSet) -> None:
+        """Переиндексирует пользователей, затронутых транзакцией."""
+        index = self._cache.search_index
+        if index is None:
+            return
+        if 'users' in changes.collections:
+            # Коллекцию заменили целиком - построим индекс заново при следующем поиске
+            self._cache.search_index = None
+            return
+        users = store.get('users') or {}
+        for tg_id in changes.entries.get('users', ()):
+            index.update(tg_id, users.get(tg_id))
+    
+    @contextmanager
+    def transaction(self) -> Iterator[Store]:
+        """
+        Открывает транзакцию над хранилищем.
         
-        # Создаем команду
-        team: Team = {
-            'id': team_id,
-            'members': members,
-            'created_at': datetime.now().isoformat(),
-            'status': 'active'
-        }
-        store['teams'][team_id] = team
+        Выдает изменяемый Store и записывает изменения один раз при выходе
+        (если они были). При исключении изменения откатываются: кэш
+        сбрасывается и следующее чтение берет последнее зафиксированное
+        состояние. Методы Storage, вызванные внутри, присоединяются
+        к транзакции и не пишут данные сами; вложенные транзакции тоже.
         
-        self.save(store)
-        return team_id
+        Если вложенная транзакция завершилась исключением, а внешний код
+        его перехватил, внешняя транзакция при выходе откатывается целиком
+        и выбрасывает TransactionAbortedError: частичные изменения
+        вложенного блока не фиксируются.
+        
+        Если данные хранилища повреждены, транзакция не открывается
+        (StoreCorruptedError), чтобы не перезаписать их пустым Store.
+        
+        Пример:
+            with storage.transaction() as store:
+                team_id = storage.create_team(members)
+                store['queue'] = remaining
+        """
+        with self._lock:
+            cache = self._cache
+            if cache.depth == 0:
+                # Внешняя транзакция: держим межпроцессную блокировку до фиксации,
+                # а данные перечитываем уже под ней
+                cache.file_lock.acquire()
+            try:
+                store = self._read(for_update=True)
+                cache.depth += 1
+                try:
+                    yield _TrackedStore(store, cache.changes)  # type: ignore[misc]
+                except BaseException as e:
+                    if cache.depth == 1:
+                        cache.invalidate()
+                    elif cache.failed is None:
+                        cache.failed = e
+                    raise
+                finally:
+                    cache.depth -= 1
+                if cache.depth == 0:
+                    if cache.failed is not None:
+                        failed = cache.failed
+                        cache.invalidate()
+                        raise TransactionAbortedError(
+                            f"Вложенная транзакция завершилась ошибкой: {failed!r}"
+                        ) from failed
+                    self._commit(store, cache.changes)
+            finally:
+                if cache.depth == 0:
+                    cache.file_lock.release()
     
-    def set_user_status(self, tg_id: int, status: str, team_id: Optional[str] = None) -> None:
-        """Устанавливает статус пользователя."""
-        store = self.load()
+    def load(self) -> Store:
+        """Загружает данные (независимую копию, которую можно менять)."""
+        return clone_json(self._read())
+    
+    def get_version(self) -> int:
+        """Возвращает версию хранилища (растет на единицу при каждой фиксации)."""
+        return self._read().get(VERSION_KEY, 0)
+    
+    def save(self, store: Store) -> None:
+        """
+        Сохраняет данные атомарно, заменяя хранилище целиком.
         
-        tg_id_str = str(tg_id)
-        if tg_id_str not in store['users']:
-            store['users'][tg_id_str] = User(tg_id=tg_id, status='waiting')
+        Если store получен из load(), он несет версию хранилища на момент
+        чтения. Когда с тех пор данные успел изменить другой писатель (в том
+        числе другой процесс), выбрасывается StoreConflictError: изменения
+        нужно применить заново к свежим данным (см. update).
+        """
+        with self.transaction():
+            live = self._read()
+            expected = store.get(VERSION_KEY)
+            if expected is not None and expected != live.get(VERSION_KEY, 0):
+                raise StoreConflictError(
+                    f"Хранилище изменено с версии {expected} до {live.get(VERSION_KEY, 0)}"
+                )
+            # Копируем, чтобы дальнейшие изменения вызывающего не попали в кэш
+            self._cache.changes.touch_all(live)
+            live.clear()
+            live.update(_prepare_store(clone_json(store)))
+            self._cache.changes.touch_all(live)
+    
+    def update(self, mutate: Callable[[Store], None], retries: int = 5) -> None:
+        """
+        Оптимистично изменяет хранилище: load(), mutate(store), save().
         
-        store['users'][tg_id_str]['status'] = status  # type: ignore
-        store['users'][tg_id_str]['team_id'] = team_id
+        При конфликте версий (данные изменил другой писатель) повторяет
+        попытку на свежих данных не больше retries раз, затем пробрасывает
+        StoreConflictError. Подходит для процессов, которым нельзя держать
+        блокировку хранилища во время вычислений.
+        """
+        for attempt in range(retries + 1):
+            store = self.load()
+            mutate(store)
+            try:
+                self.save(store)
+                return
+            except StoreConflictError:
+                if attempt == retries:
+                    raise
+                logger.info(f"Конфликт версий хранилища, повтор {attempt + 1}/{retries}")
+    
+    def _user_cohort(self, tg_id: int) -> str:
+        """Возвращает когорту пользователя (DEFAULT_COHORT, если не задана)."""
+        user = self._read()['users'].get(str(tg_id)) or {}
+        return user.get('cohort') or DEFAULT_COHORT
+    
+    @staticmethod
+    def _cohort_queue(store: Store, cohort: Optional[str]):
+        """Возвращает очередь когорты в транзакции, создавая ее при первом обращении."""
+        key = queue_key(cohort)
+        if key not in store:
+            store[key] = []
+        return store[key]
+    
+    def enqueue(self, tg_id: int, cohort: Optional[str] = None, front: bool = False) -> None:
+        """
+        Добавляет пользователя в очередь, если его там нет.
         
-        self.save(store)
+        Args:
+            tg_id: ID пользователя
+            cohort: Когорта (None - когорта пользователя, см. services.cohorts)
+            front: Поставить в начало очереди, а не в конец
+        """
+        with self.transaction() as store:
+            tg_id_str = str(tg_id)
+            if cohort is None:
+                cohort = self._user_cohort(tg_id)
+            queue = self._cohort_queue(store, cohort)
+            if tg_id_str not in queue:
+                if front:
+                    queue.appendleft(tg_id_str)
+                else:
+                    queue.append(tg_id_str)
+                if tg_id_str in store['users']:
+                    user = store['users'][tg_id_str]
+                    # Время постановки в очередь - для ограничения ожидания (см. MatchScheduler)
+                    user['queued_at'] = datetime.now().isoformat()
+                    if cohort:
+                        user['cohort'] = cohort
+                    else:
+                        user.pop('cohort', None)
+    
+    def remove_from_queue(self, tg_id: int, cohort: Optional[str] = None) -> bool:
+        """Удаляет пользователя из очереди (cohort=None - из очереди его когорты). Возвращает True, если был удален."""
+        with self.transaction() as store:
+            tg_id_str = str(tg_id)
+            if cohort is None:
+                cohort = self._user_cohort(tg_id)
+            key = queue_key(cohort)
+            if key in store and tg_id_str in store[key]:
+                store[key].remove(tg_id_str)
+                return True
+            return False
+    
+    def create_team(self, members: List[int], cohort: Optional[str] = None) -> str:
+        """Создает новую команду (в когорте cohort, по умолчанию - в общей). Возвращает ID команды."""
+        with self.transaction() as store:
+            # Генерируем новый ID команды, нумерация у каждой когорты своя
+            seq_key = team_seq_key(cohort)
+            team_seq = store['counters'].get(seq_key, 0)
+            team_id = cohort_team_id(cohort, team_seq + 1)
+            store['counters'][seq_key] = team_seq + 1
+            
+            # Создаем команду
+            team: Team = {
+                'id': team_id,
+                'members': list(members),
+                'created_at': datetime.now().isoformat(),
+                'status': 'active'
+            }
+            if cohort:
+                team['cohort'] = cohort
+            store['teams'][team_id] = team
+            
+            return team_id
+    
+    def set_user_status(self, tg_id: int, status: str, team_id: Optional[str] = None) -> None:
+        """Устанавливает статус пользователя."""
+        with self.transaction() as store:
+            tg_id_str = str(tg_id)
+            if tg_id_str not in store['users']:
+                store['users'][tg_id_str] = User(tg_id=tg_id, status='waiting')
+            
+            store['users'][tg_id_str]['status'] = status  # type: ignore
+            store['users'][tg_id_str]['team_id'] = team_id
     
     def update_user(self, tg_id: int, **kwargs) -> None:
         """Обновляет данные пользователя."""
-        store = self.load()
+        with self.transaction() as store:
+            tg_id_str = str(tg_id)
+            if tg_id_str not in store['users']:
+                store['users'][tg_id_str] = User(tg_id=tg_id, status='waiting')
+            
+            store['users'][tg_id_str].update(clone_json(kwargs))
+    
+    def create_teams(self, teams: List[List[int]], cohort: Optional[str] = None,
+                     notify: bool = False, report_chat_id: Optional[Union[int, str]] = None) -> List[str]:
+        """
+        Фиксирует результат раунда комплектования одной транзакцией.
+        
+        Создает команды когорты cohort, переводит участников в статус 'teamed',
+        увеличивает их счетчик участий (participations, см. matching_strategies)
+        и убирает их из очереди когорты. Возвращает ID созданных команд
+        в порядке teams.
+        
+        С notify=True в той же транзакции создается задание рассылки карточек
+        (outbox, см. services.broadcast_jobs): карточки будут отправлены,
+        даже если процесс остановится сразу после фиксации.
+        """
+        with self.transaction() as store:
+            created_teams = []
+            queue = self._cohort_queue(store, cohort)
+            for members in teams:
+                team_id = self.create_team(members, cohort)
+                for tg_id in members:
+                    self.set_user_status(tg_id, 'teamed', team_id)
+                    user = store['users'][str(tg_id)]
+                    user['participations'] = (user.get('participations') or 0) + 1
+                    if str(tg_id) in queue:
+                        queue.remove(str(tg_id))
+                created_teams.append(team_id)
+            if notify and created_teams:
+                self.create_team_cards_broadcast(created_teams, report_chat_id)
+            return created_teams
+    
+    def match_teams(self, matcher: Matcher, base: int = 5, elastic: int = 2,
+                    limit: Optional[int] = None, cohort: Optional[str] = None,
+                    notify: bool = False,
+                    report_chat_id: Optional[Union[int, str]] = None) -> Tuple[List[str], List[str]]:
+        """
+        Проводит раунд комплектования стратегией matcher одной транзакцией.
+        
+        Args:
+            matcher: Стратегия комплектования
+            base: Базовый размер команды
+            elastic: Максимальное количество дополнительных участников
+            limit: Комплектовать только первых limit участников очереди
+                (None - всю очередь)
+            cohort: Когорта (None - общая очередь)
+            notify: Записать в той же транзакции задание рассылки карточек (см. create_teams)
+            report_chat_id: Чат для прогресса рассылки карточек
         
-        tg_id_str = str(tg_id)
-        if tg_id_str not in store['users']:
-            store['users'][tg_id_str] = User(tg_id=tg_id, status='waiting')
+        Returns:
+            (ID созданных команд, остаток очереди)
+        """
+        with self.transaction() as store:
+            # Пользователей стратегия только читает - не отмечаем их затронутыми
+            users = self._read()['users']
+            queue = self._cohort_queue(store, cohort)
+            head = list(queue) if limit is None else list(queue[:limit])
+            teams, remaining = matcher.match(head, users, base, elastic)
+            if limit is not None:
+                remaining += list(queue[limit:])
+            return self.create_teams(teams, cohort, notify, report_chat_id), remaining
+    
+    def get_match_input(self, cohort: Optional[str] = None,
+                        limit: Optional[int] = None) -> Tuple[List[str], Dict[str, User]]:
+        """
+        Возвращает копию начала очереди когорты и ее пользователей.
         
-        store['users'][tg_id_str].update(kwargs)
-        self.save(store)
+        Нужна, чтобы считать раунд вне транзакции (в другом потоке или
+        процессе) и затем зафиксировать его через commit_match.
+        """
+        store = self._read()
+        queue = store.get(queue_key(cohort)) or []
+        head = list(queue) if limit is None else list(queue[:limit])
+        users = store['users']
+        return head, {tg_id: clone_json(users[tg_id]) for tg_id in head if tg_id in users}
+    
+    def commit_match(self, teams: List[List[str]], cohort: Optional[str] = None, notify: bool = False,
+                     report_chat_id: Optional[Union[int, str]] = None) -> List[str]:
+        """
+        Фиксирует раунд, посчитанный вне транзакции по get_match_input.
+        
+        Команды, чьи участники успели покинуть очередь, не создаются -
+        оставшиеся из них участники попадут в следующий раунд.
+        Возвращает ID созданных команд. notify и report_chat_id - как в create_teams.
+        """
+        with self.transaction() as store:
+            queue = store.get(queue_key(cohort)) or []
+            valid = [members for members in teams if all(str(tg_id) in queue for tg_id in members)]
+            if len(valid) < len(teams):
+                logger.info(f"Раунд когорты '{cohort or DEFAULT_COHORT}': пропущено команд "
+                            f"с покинувшими очередь участниками: {len(teams) - len(valid)}")
+            return self.create_teams(valid, cohort, notify, report_chat_id) if valid else []
     
     def get_user(self, tg_id: int) -> Optional[User]:
         """Получает пользователя по ID."""
-        store = self.load()
-        return store['users'].get(str(tg_id))
+        user = self._read()['users'].get(str(tg_id))
+        return clone_json(user) if user is not None else None
+    
+    def get_users(self, tg_ids: Iterable[Any]) -> Dict[str, User]:
+        """
+        Получает нескольких пользователей из одного снимка хранилища.
+        
+        Returns:
+            Найденные пользователи по строковому tg_id (отсутствующих нет в словаре)
+        """
+        users = self._read()['users']
+        found = {}
+        for tg_id in tg_ids:
+            user = users.get(str(tg_id))
+            if user is not None:
+                found[str(tg_id)] = clone_json(user)
+        return found
     
     def get_team(self, team_id: str) -> Optional[Team]:
         """Получает команду по ID."""
-        store = self.load()
-        return store['teams'].get(team_id)
+        team = self._read()['teams'].get(team_id)
+        return clone_json(team) if team is not None else None
+    
+    def get_active_teams(self) -> List[Team]:
+        """Возвращает активные команды (копии, без копирования остального хранилища)."""
+        return [clone_json(team) for team in self._read()['teams'].values() if team['status'] == 'active']
     
     def remove_from_team(self, team_id: str, tg_id: int) -> bool:
         """Удаляет пользователя из команды. Возвращает True, если был удален."""
-        store = self.load()
-        team = store['teams'].get(team_id)
-        
-        if team and tg_id in team['members']:
-            team['members'].remove(tg_id)
-            # Если команда опустела, архивируем её
-            if not team['members']:
-                team['status'] = 'archived'
-            self.save(store)
-            return True
-        return False
+        with self.transaction() as store:
+            team = store['teams'].get(team_id)
+            # Участники могут храниться как числами, так и строками (из очереди)
+            member = next((m for m in team['members'] if str(m) == str(tg_id)), None) if team else None
+            
+            if member is not None:
+                team['members'].remove(member)
+                # Если команда опустела, архивируем её
+                if not team['members']:
+                    team['status'] = 'archived'
+                return True
+            return False
     
     def get_queue_position(self, tg_id: int) -> int:
-        """Возвращает позицию пользователя в очереди (0-based). -1 если не в очереди."""
-        store = self.load()
+        """Возвращает позицию пользователя в очереди его когорты (0-based). -1 если не в очереди."""
+        store = self._read()
         try:
-            return store['queue'].index(str(tg_id))
+            return (store.get(queue_key(self._user_cohort(tg_id))) or []).index(str(tg_id))
         except ValueError:
             return -1
     
-    def get_queue_size(self) -> int:
-        """Возвращает размер очереди."""
-        store = self.load()
-        return len(store['queue'])
+    def get_user_snapshot(self, tg_id: int) -> UserSnapshot:
+        """Возвращает пользователя, его позицию и размер очереди его когорты одним чтением."""
+        store = self._read()
+        user = store['users'].get(str(tg_id))
+        queue = store.get(queue_key((user or {}).get('cohort') or DEFAULT_COHORT)) or []
+        try:
+            position = queue.index(str(tg_id))
+        except ValueError:
+            position = -1
+        return {
+            'user': clone_json(user) if user is not None else None,
+            'queue_position': position,
+            'queue_size': len(queue),
+        }
+    
+    def get_queue_head_since(self, cohort: Optional[str] = None) -> Optional[datetime]:
+        """Возвращает время постановки в очередь первого в ней (None - неизвестно или очередь пуста)."""
+        store = self._read()
+        queue = store.get(queue_key(cohort))
+        if not queue:
+            return None
+        user = store['users'].get(str(queue[0])) or {}
+        try:
+            return datetime.fromisoformat(user['queued_at'])
+        except (KeyError, TypeError, ValueError):
+            return None
+    
+    def get_queued_ids(self) -> List[str]:
+        """Возвращает ожидающих во всех очередях без повторов: сначала общая, затем когорты."""
+        store = self._read()
+        queued = list(store.get(queue_key(None)) or [])
+        for name in sorted(store):
+            if is_queue_collection(name) and name != queue_key(None):
+                queued.extend(store[name] or [])
+        return list(dict.fromkeys(queued))
+    
+    def get_queue_version(self, cohort: Optional[str] = None) -> int:
+        """Возвращает версию очереди (растет при каждом изменении очереди)."""
+        return self._read()['counters'].get(queue_version_key(cohort), 0)
+    
+    def get_queue_size(self, cohort: Optional[str] = None) -> int:
+        """Возвращает размер очереди (cohort=None - общей очереди)."""
+        return len(self._read().get(queue_key(cohort)) or [])
+    
+    def get_queue_sizes(self) -> Dict[str, int]:
+        """Возвращает размеры очередей всех когорт ({ID когорты: размер}, общая - первой)."""
+        store = self._read()
+        sizes = {DEFAULT_COHORT: len(store.get(queue_key(None)) or [])}
+        for name in sorted(store):
+            if is_queue_collection(name) and name != queue_key(None):
+                sizes[cohort_of_queue(name)] = len(store[name] or [])
+        return sizes
     
     def get_active_teams_count(self) -> int:
         """Возвращает количество активных команд."""
-        store = self.load()
-        return sum(1 for team in store['teams'].values() if team['status'] == 'active')
+        return self._read()[STATS_KEY]['active_teams']
     
     def get_active_teams_avg_size(self) -> float:
         """Возвращает средний размер активных команд."""
-        store = self.load()
-        active_teams = [team for team in store['teams'].values() if team['status'] == 'active']
-        if not active_teams:
+        stats = self._read()[STATS_KEY]
+        if not stats['active_teams']:
             return 0.0
-        return sum(len(team['members']) for team in active_teams) / len(active_teams)
+        return stats['active_members'] / stats['active_teams']
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает агрегаты хранилища без прохода по данным.
+        
+        Ключи: queue_size, users_total, users_by_status ({статус: количество}),
+        teams_total, active_teams, active_members (участников активных команд).
+        """
+        return clone_json(self._read()[STATS_KEY])
+    
+    def search_users(self, query: str, limit: int = 10) -> List[Tuple[SearchHit, User]]:
+        """
+        Ищет пользователей по имени, username или ссылке на Telegram.
+        
+        Поиск нечувствителен к регистру и допускает опечатки (см. search_index).
+        Возвращает пары (результат, пользователь) по убыванию релевантности;
+        у точных совпадений подстроки hit.exact=True.
+        """
+        with self._lock:
+            store = self._read()
+            cache = self._cache
+            if cache.search_index is None:
+                cache.search_index = UserSearchIndex(store['users'])
+            hits = cache.search_index.search(query, limit)
+            return [(hit, clone_json(store['users'][hit.tg_id])) for hit in hits]
     
     def is_admin(self, tg_id: int) -> bool:
         """Проверяет, является ли пользователь админом."""
-        store = self.load()
+        store = self._read()
         # Преобразуем tg_id в строку, так как JSON ключи всегда строки
         admin_info = store['admins'].get(str(tg_id), False)
         
@@ -180,40 +844,49 @@ class Storage:
     
     def set_admin(self, tg_id: int, is_admin: bool = True) -> None:
         """Устанавливает или снимает права админа."""
-        from datetime import datetime
-        store = self.load()
-        
-        if is_admin:
-            # Записываем время последнего входа
-            store['admins'][str(tg_id)] = {
-                'active': True,
-                'last_login': datetime.now().isoformat(),
-                'login_count': store['admins'].get(str(tg_id), {}).get('login_count', 0) + 1 if isinstance(store['admins'].get(str(tg_id)), dict) else 1
-            }
-        else:
-            # При выходе сохраняем информацию
-            tg_id_str = str(tg_id)
-            if tg_id_str in store['admins']:
-                if isinstance(store['admins'][tg_id_str], dict):
-                    store['admins'][tg_id_str]['active'] = False
-                    store['admins'][tg_id_str]['last_logout'] = datetime.now().isoformat()
-                else:
-                    # Если старый формат (bool), удаляем
-                    del store['admins'][tg_id_str]
-            
-        self.save(store)
+        with self.transaction() as store:
+            if is_admin:
+                # Записываем время последнего входа
+                store['admins'][str(tg_id)] = {
+                    'active': True,
+                    'last_login': datetime.now().isoformat(),
+                    'login_count': store['admins'].get(str(tg_id), {}).get('login_count', 0) + 1 if isinstance(store['admins'].get(str(tg_id)), dict) else 1
+                }
+            else:
+                # При выходе сохраняем информацию
+                tg_id_str = str(tg_id)
+                if tg_id_str in store['admins']:
+                    if isinstance(store['admins'][tg_id_str], dict):
+                        store['admins'][tg_id_str]['active'] = False
+                        store['admins'][tg_id_str]['last_logout'] = datetime.now().isoformat()
+                    else:
+                        # Если старый формат (bool), удаляем
+                        del store['admins'][tg_id_str]
+        # Закэшированные решения ACL больше не действительны
+        self._cache.admins_version += 1
+    
+    def get_admin_ids(self) -> Set[int]:
+        """Возвращает ID всех активных runtime-админов (одним чтением)."""
+        store = self._read()
+        return {int(tg_id) for tg_id, info in store['admins'].items()
+                if (info.get('active', False) if isinstance(info, dict) else info is True)}
+    
+    @property
+    def admins_version(self) -> int:
+        """Номер версии прав админов: меняется при каждом set_admin в этом процессе."""
+        return self._cache.admins_version
     
     def get_admin_sessions(self) -> dict:
         """Возвращает информацию о всех админских сессиях."""
-        store = self.load()
-        return {tg_id: info for tg_id, info in store['admins'].items() 
+        store = self._read()
+        return {tg_id: clone_json(info) for tg_id, info in store['admins'].items() 
                 if isinstance(info, dict) and info.get('active', False)}
     
-    def get_queue_usernames(self, limit: int = 10) -> List[str]:
-        """Возвращает список username первых пользователей в очереди."""
-        store = self.load()
+    def get_queue_usernames(self, limit: int = 10, cohort: Optional[str] = None) -> List[str]:
+        """Возвращает список username первых пользователей в очереди когорты (None - общей)."""
+        store = self._read()
         usernames = []
-        for tg_id in store['queue'][:limit]:
+        for tg_id in (store.get(queue_key(cohort)) or [])[:limit]:
             user = store['users'].get(tg_id)
             if user and user.get('username'):
                 usernames.append(f"@{user['username']}")
@@ -223,69 +896,249 @@ class Storage:
     
     def create_question(self, user_id: int, username: Optional[str], text: str) -> str:
         """Создает новый вопрос. Возвращает ID вопроса."""
-        store = self.load()
-        
-        # Генерируем новый ID вопроса
-        question_seq = store['counters'].get('questionSeq', 0)
-        question_id = f"Q-{question_seq + 1}"
-        store['counters']['questionSeq'] = question_seq + 1
-        
-        # Создаем вопрос
-        question: Question = {
-            'id': question_id,
-            'user_id': user_id,
-            'username': username,
-            'text': text,
-            'created_at': datetime.now().isoformat(),
-            'answered': False,
-            'answer': None,
-            'answered_by': None,
-            'answered_at': None
-        }
-        store['questions'][question_id] = question
-        
-        self.save(store)
-        return question_id
+        with self.transaction() as store:
+            # Генерируем новый ID вопроса
+            question_seq = store['counters'].get('questionSeq', 0)
+            question_id = f"Q-{question_seq + 1}"
+            store['counters']['questionSeq'] = question_seq + 1
+            
+            # Создаем вопрос
+            question: Question = {
+                'id': question_id,
+                'user_id': user_id,
+                'username': username,
+                'text': text,
+                'created_at': datetime.now().isoformat(),
+                'answered': False,
+                'answer': None,
+                'answered_by': None,
+                'answered_at': None
+            }
+            store['questions'][question_id] = question
+            
+            return question_id
     
     def get_unanswered_questions(self) -> List[Question]:
         """Возвращает список неотвеченных вопросов."""
-        store = self.load()
-        return [q for q in store['questions'].values() if not q['answered']]
+        store = self._read()
+        return [clone_json(q) for q in store['questions'].values() if not q['answered']]
     
     def answer_question(self, question_id: str, answer: str, admin_id: int) -> bool:
         """Отвечает на вопрос. Возвращает True, если вопрос найден и отвечен."""
-        store = self.load()
-        question = store['questions'].get(question_id)
-        
-        if question and not question['answered']:
-            question['answered'] = True
-            question['answer'] = answer
-            question['answered_by'] = admin_id
-            question['answered_at'] = datetime.now().isoformat()
-            self.save(store)
-            return True
-        return False
+        with self.transaction() as store:
+            question = store['questions'].get(question_id)
+            
+            if question and not question['answered']:
+                question['answered'] = True
+                question['answer'] = answer
+                question['answered_by'] = admin_id
+                question['answered_at'] = datetime.now().isoformat()
+                return True
+            return False
     
     def get_question(self, question_id: str) -> Optional[Question]:
         """Получает вопрос по ID."""
-        store = self.load()
-        return store['questions'].get(question_id)
+        question = self._read()['questions'].get(question_id)
+        return clone_json(question) if question is not None else None
     
-    def cache_photo_file_id(self, file_id: str) -> None:
-        """Сохраняет file_id картинки для быстрых отправок."""
-        store = self.load()
+    def create_broadcast(self, kind: str, recipients: List[Any], title: str = '',
+                         text: Optional[str] = None, team_ids: Optional[List[str]] = None,
+                         report_chat_id: Optional[Union[int, str]] = None,
+                         report_message_id: Optional[int] = None) -> str:
+        """
+        Создает задание рассылки (см. services.broadcast_jobs). Возвращает ID задания.
         
-        # Обеспечиваем наличие cache секции
-        if 'cache' not in store:
-            store['cache'] = {}
+        Args:
+            kind: 'message' - один текст всем, 'team_cards' - карточки команд team_ids
+            recipients: Получатели в порядке отправки (повторы отбрасываются)
+            title: Аудитория для отчета
+            text: Текст рассылки для kind='message'
+            team_ids: Команды для kind='team_cards'
+            report_chat_id: Чат, в котором показывать прогресс
+            report_message_id: Сообщение с прогрессом (None - отправить новое)
+        """
+        with self.transaction() as store:
+            if 'broadcasts' not in store:
+                store['broadcasts'] = {}
+            
+            broadcast_seq = store['counters'].get('broadcastSeq', 0) + 1
+            store['counters']['broadcastSeq'] = broadcast_seq
+            job_id = f"B-{broadcast_seq}"
             
-        store['cache'][self.CACHED_PHOTO_KEY] = file_id
-        self.save(store)
+            broadcast: Broadcast = {
+                'id': job_id,
+                'kind': kind,  # type: ignore[typeddict-item]
+                'title': title,
+                'text': text,
+                'team_ids': list(team_ids or []),
+                'recipients': list(dict.fromkeys(str(tg_id) for tg_id in recipients)),
+                'results': {},
+                'cursor': 0,
+                'sent': 0,
+                'failed': 0,
+                'unreachable': 0,
+                'status': 'running',
+                'attempts': 0,
+                'error': None,
+                'created_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'report_chat_id': report_chat_id,
+                'report_message_id': report_message_id,
+            }
+            store['broadcasts'][job_id] = broadcast
+            return job_id
+    
+    def create_team_cards_broadcast(self, team_ids: List[str],
+                                    report_chat_id: Optional[Union[int, str]] = None) -> str:
+        """Создает задание рассылки карточек команд их участникам. Возвращает ID задания."""
+        with self.transaction():
+            recipients = []
+            for team_id in team_ids:
+                team = self._read()['teams'].get(team_id)
+                if team:
+                    recipients.extend(team['members'])
+            return self.create_broadcast(
+                'team_cards', recipients, title=f"карточки команд: {len(team_ids)}",
+                team_ids=team_ids, report_chat_id=report_chat_id
+            )
+    
+    def get_broadcast(self, job_id: str) -> Optional[Broadcast]:
+        """Получает задание рассылки по ID."""
+        broadcast = self._read().get('broadcasts', {}).get(job_id)
+        return clone_json(broadcast) if broadcast is not None else None
+    
+    def get_unfinished_broadcasts(self) -> List[Broadcast]:
+        """Возвращает выполняемые задания рассылок (для продолжения после перезапуска)."""
+        broadcasts = self._read().get('broadcasts', {})
+        return [clone_json(b) for b in broadcasts.values() if b['status'] == 'running']
+    
+    def record_broadcast_progress(self, job_id: str, outcomes: Dict[str, str],
+                                  finished: bool = False) -> Optional[Broadcast]:
+        """
+        Записывает итоги доставки части получателей и сдвигает курсор задания.
+        
+        Args:
+            job_id: ID задания
+            outcomes: tg_id -> sent/failed/unreachable
+            finished: Отметить задание завершенным
+            
+        Returns:
+            Обновленное задание (None - задания нет)
+        """
+        with self.transaction() as store:
+            if job_id not in store.get('broadcasts', {}):
+                return None
+            broadcast = store['broadcasts'][job_id]
+            
+            results = broadcast['results']
+            for tg_id, status in outcomes.items():
+                if tg_id not in results:
+                    broadcast[status] = broadcast.get(status, 0) + 1
+                results[tg_id] = status
+            
+            # Курсор - длина обработанного начала списка: получатели отправляются
+            # параллельно и завершаются не по порядку
+            recipients = broadcast['recipients']
+            cursor = broadcast['cursor']
+            while cursor < len(recipients) and recipients[cursor] in results:
+                cursor += 1
+            broadcast['cursor'] = cursor
+            
+            if finished:
+                broadcast['status'] = 'done'
+                broadcast['finished_at'] = datetime.now().isoformat()
+            return clone_json(broadcast)
+    
+    def record_broadcast_failure(self, job_id: str, error: str, max_attempts: int) -> Optional[Broadcast]:
+        """
+        Учитывает запуск задания, завершившийся ошибкой.
+        
+        После max_attempts таких запусков задание получает статус 'failed'
+        и больше не продолжается (см. get_unfinished_broadcasts).
+        
+        Returns:
+            Обновленное задание (None - задания нет)
+        """
+        with self.transaction() as store:
+            if job_id not in store.get('broadcasts', {}):
+                return None
+            broadcast = store['broadcasts'][job_id]
+            broadcast['attempts'] = broadcast.get('attempts', 0) + 1
+            broadcast['error'] = error
+            if broadcast['attempts'] >= max_attempts:
+                broadcast['status'] = 'failed'
+                broadcast['finished_at'] = datetime.now().isoformat()
+            return clone_json(broadcast)
+    
+    def set_broadcast_report_message(self, job_id: str, message_id: int) -> None:
+        """Запоминает сообщение, в котором показывается прогресс задания."""
+        with self.transaction() as store:
+            if job_id in store.get('broadcasts', {}):
+                store['broadcasts'][job_id]['report_message_id'] = message_id
+    
+    def mark_unreachable(self, records: Dict[str, Tuple[str, str]]) -> None:
+        """
+        Вносит получателей в реестр недоступных.
+        
+        Args:
+            records: tg_id -> (причина: blocked/deactivated/not_found, текст ошибки)
+        """
+        if not records:
+            return
+        with self.transaction() as store:
+            if 'unreachable' not in store:
+                store['unreachable'] = {}
+            now = datetime.now().isoformat()
+            for tg_id, (reason, error) in records.items():
+                entry: Unreachable = {'since': now, 'reason': reason, 'error': error}  # type: ignore[typeddict-item]
+                store['unreachable'][str(tg_id)] = entry
+    
+    def clear_unreachable(self, tg_id: int) -> bool:
+        """Убирает пользователя из реестра недоступных. Возвращает True, если он там был."""
+        if not self.is_unreachable(tg_id):
+            return False
+        with self.transaction() as store:
+            if str(tg_id) not in store.get('unreachable', {}):
+                return False
+            del store['unreachable'][str(tg_id)]
+            return True
+    
+    def is_unreachable(self, tg_id: int) -> bool:
+        """Проверяет, что пользователь в реестре недоступных."""
+        return str(tg_id) in self._read().get('unreachable', {})
+    
+    def get_unreachable_ids(self) -> Set[str]:
+        """Возвращает tg_id всех недоступных получателей."""
+        return set(self._read().get('unreachable', {}))
+    
+    def get_unreachable(self, tg_id: int) -> Optional[Unreachable]:
+        """Получает запись реестра недоступных по tg_id."""
+        entry = self._read().get('unreachable', {}).get(str(tg_id))
+        return clone_json(entry) if entry is not None else None
+    
+    def get_unreachable_stats(self) -> Dict[str, int]:
+        """Возвращает число недоступных получателей по причинам ({причина: количество})."""
+        counts: Dict[str, int] = {}
+        for entry in self._read().get('unreachable', {}).values():
+            counts[entry['reason']] = counts.get(entry['reason'], 0) + 1
+        return counts
+    
+    def get_user_messages(self, key: str) -> List[int]:
+        """Получает сохраненные ID сообщений бота по ключу user_messages."""
+        return list(self._read().get('user_messages', {}).get(key, []))
+    
+    def cache_photo_file_id(self, file_id: str) -> None:
+        """Сохраняет file_id картинки для быстрых отправок."""
+        with self.transaction() as store:
+            # Обеспечиваем наличие cache секции
+            if 'cache' not in store:
+                store['cache'] = {}
+                
+            store['cache'][self.CACHED_PHOTO_KEY] = file_id
     
     def get_cached_photo_file_id(self) -> Optional[str]:
         """Получает кэшированный file_id картинки."""
-        store = self.load()
-        cache = store.get('cache', {})
+        cache = self._read().get('cache', {})
         return cache.get(self.CACHED_PHOTO_KEY)
 
 
@@ -0,0 +1,835 @@
+"""
+Бэкенды постоянного хранения Store: JSON-файл, журнал, файлы коллекций и SQLite.
+
+Storage держит разобранный Store в памяти процесса и при фиксации транзакции
+передает бэкенду сам Store и набор изменений (ChangeSet), чтобы бэкенд мог
+записать только затронутые коллекции и записи.
+
+Бэкенд выбирается переменной окружения STORAGE_BACKEND (json|journal|shards|sqlite).
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from ..types import Store
+from .util import FileLock, atomic_write, ensure_file_exists, clone_json, json_default
+from .waiting_queue import WaitingQueue
+
+logger = logging.getLogger(__name__)
+
+# Коллекции-словари, изменения в которых отслеживаются по отдельным ключам
+KEYED_COLLECTIONS = frozenset({
+    'users', 'teams', 'admins', 'questions', 'counters', 'cache', 'user_messages', 'broadcasts',
+    'unreachable'
+})
+
+# Коллекции-очереди: в памяти это WaitingQueue, изменения - операции над элементами
+QUEUE_COLLECTIONS = frozenset({'queue'})
+
+# Очереди когорт тоже коллекции-очереди: очередь когорты hack хранится как queue.hack
+COHORT_QUEUE_PREFIX = 'queue.'
+
+# Операции над очередью: в конец, в начало, удаление
+QUEUE_OPS = ('push', 'front', 'remove')
+
+
+def is_queue_collection(name: str) -> bool:
+    """Проверяет, что коллекция Store - очередь (общая или очередь когорты)."""
+    return name in QUEUE_COLLECTIONS or name.startswith(COHORT_QUEUE_PREFIX)
+
+
+def default_store() -> Store:
+    """Возвращает пустой Store."""
+    return {
+        'users': {},
+        'queue': [],
+        'teams': {},
+        'counters': {'teamSeq': 0},
+        'admins': {},
+        'questions': {},
+        'cache': {}  # Кэш для файлов и других данных
+    }
+
+
+class ChangeSet:
+    """Коллекции и записи Store, затронутые транзакцией."""
+
+    def __init__(self):
+        # Коллекции, которые нужно переписать целиком
+        self.collections: Set[str] = set()
+        # Отдельные записи коллекций-словарей: {коллекция: {ключ, ...}}
+        self.entries: Dict[str, Set[str]] = {}
+        # Операции над очередями по порядку: {коллекция: [(операция, элемент), ...]}
+        self.queue_ops: Dict[str, List[Tuple[str, Any]]] = {}
+        # Вид записей до первого изменения в транзакции: {(коллекция, ключ): запись}
+        self.before: Dict[Tuple[str, str], Any] = {}
+
+    def touch(self, collection: str, key: Optional[str] = None) -> None:
+        """Отмечает коллекцию (или одну её запись) как измененную."""
+        if key is None:
+            self.collections.add(collection)
+        else:
+            self.entries.setdefault(collection, set()).add(key)
+
+    def log_queue_op(self, collection: str, op: str, item: Any) -> None:
+        """Записывает операцию над очередью (см. QUEUE_OPS)."""
+        self.queue_ops.setdefault(collection, []).append((op, item))
+
+    def touch_all(self, store: Store) -> None:
+        """Отмечает весь Store как измененный."""
+        self.collections.update(store.keys())
+
+    def clear(self) -> None:
+        """Очищает набор изменений."""
+        self.collections.clear()
+        self.entries.clear()
+        self.queue_ops.clear()
+        self.before.clear()
+
+    def __bool__(self) -> bool:
+        return bool(self.collections or self.entries or self.queue_ops)
+
+
+class JsonFileBackend:
+    """Весь Store в одном JSON-файле, переписываемом атомарно."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Межпроцессная блокировка хранилища (ее же держат транзакции Storage)
+        self.file_lock = FileLock(path + '.lock')
+
+    def exists(self) -> bool:
+        """Проверяет, что хранилище уже создано."""
+        return os.path.exists(self.path)
+
+    def initialize(self, store: Store) -> None:
+        """Создает хранилище с начальным содержимым."""
+        ensure_file_exists(self.path, store)
+
+    def signature(self) -> Hashable:
+        """Возвращает (mtime_ns, size, inode) файла для проверки актуальности кэша."""
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def read(self) -> Store:
+        """Читает Store целиком."""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(self, store: Store, changes: ChangeSet) -> None:
+        """Записывает Store; JSON-файл всегда переписывается целиком."""
+        atomic_write(self.path, store)
+
+
+class JournalBackend(JsonFileBackend):
+    """
+    Снимок data.json плюс журнал изменений data.journal.
+    
+    Каждая фиксация дописывает в журнал одну компактную JSON-строку со
+    списком операций над затронутыми записями, поэтому объем записи
+    пропорционален изменению, а не размеру Store. При чтении журнал
+    проигрывается поверх снимка. Когда журнал превышает порог, фоновый
+    поток под блокировкой хранилища сворачивает его в свежий снимок.
+    
+    Операции журнала (все идемпотентны - повторное проигрывание безопасно):
+        [коллекция, ключ, значение]  - записать запись коллекции
+        [коллекция, ключ]            - удалить запись
+        [коллекция, null, значение]  - заменить коллекцию целиком
+        [коллекция]                  - удалить коллекцию
+        [очередь, null, операция, элемент] - push/front/remove элемента очереди
+    
+    Операции над очередью применяются как «добавить, если нет» и «удалить,
+    если есть», поэтому проигрывание журнала поверх более нового снимка
+    дает то же состояние.
+    """
+    
+    def __init__(self, path: str, journal_path: Optional[str] = None,
+                 compact_threshold: int = 1024 * 1024):
+        """
+        Args:
+            path: Путь к снимку (data.json)
+            journal_path: Путь к журналу (по умолчанию data.journal рядом со снимком)
+            compact_threshold: Размер журнала в байтах, после которого запускается сжатие
+        """
+        super().__init__(path)
+        self.journal_path = journal_path or os.path.splitext(path)[0] + '.journal'
+        self.compact_threshold = compact_threshold
+        # Защищает журнал от одновременной дозаписи и усечения компактором
+        self._journal_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        # Собственные изменения файлов не должны выглядеть как внешние
+        self._known_physical: Optional[Hashable] = None
+        self._token = 0
+    
+    def _physical_signature(self) -> Hashable:
+        """Возвращает stat снимка и журнала."""
+        snapshot = super().signature()
+        try:
+            st = os.stat(self.journal_path)
+            journal = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            journal = None
+        return snapshot, journal
+    
+    def _remember_own_change(self) -> None:
+        """Запоминает текущее состояние файлов как результат собственной записи."""
+        self._known_physical = self._physical_signature()
+    
+    def signature(self) -> Hashable:
+        """Возвращает счетчик изменений файлов другими процессами."""
+        physical = self._physical_signature()
+        if physical != self._known_physical:
+            self._token += 1
+            self._known_physical = physical
+        return self._token
+    
+    def read(self) -> Store:
+        """Читает снимок и проигрывает поверх него журнал."""
+        store = super().read()
+        try:
+            with open(self.journal_path, 'rb') as f:
+                data = f.read()
+                inode = os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            return store
+        
+        lines = data.splitlines(keepends=True)
+        for number, line in enumerate(lines, 1):
+            try:
+                ops = json.loads(line)
+            except ValueError:
+                # Оборванная при сбое последняя строка - изменения не были зафиксированы
+                logger.warning(f"Пропущена поврежденная строка {number} журнала {self.journal_path}")
+                continue
+            self._apply(store, ops)
+        
+        if len(data) >= self.compact_threshold:
+            # В снимок войдут только завершенные строки: недописанную в этот
+            # момент строку другого процесса компактор перенесет в новый журнал
+            self._start_compaction(store, inode, data.rfind(b'\n') + 1)
+        return store
+    
+    @staticmethod
+    def _apply(store: Dict[str, Any], ops: List[list]) -> None:
+        """Применяет операции одной строки журнала к store."""
+        for op in ops:
+            collection = op[0]
+            if len(op) == 1:
+                store.pop(collection, None)
+            elif len(op) == 4:
+                queue = store.get(collection)
+                if not isinstance(queue, WaitingQueue):
+                    queue = store[collection] = WaitingQueue(queue or [])
+                action, item = op[2], op[3]
+                if action == 'remove':
+                    if item in queue:
+                        queue.remove(item)
+                elif item in queue:
+                    continue
+                elif action == 'front':
+                    queue.appendleft(item)
+                else:
+                    queue.append(item)
+            elif op[1] is None:
+                store[collection] = op[2]
+            elif len(op) == 2:
+                store.get(collection, {}).pop(op[1], None)
+            else:
+                store.setdefault(collection, {})[op[1]] = op[2]
+    
+    @staticmethod
+    def _ops(store: Store, changes: ChangeSet) -> List[list]:
+        """Формирует операции журнала для набора изменений."""
+        ops: List[list] = []
+        for collection in changes.collections:
+            if collection in store:
+                ops.append([collection, None, store[collection]])
+            else:
+                ops.append([collection])
+        
+        for collection, queue_ops in changes.queue_ops.items():
+            if collection in changes.collections:
+                continue
+            ops.extend([collection, None, op, item] for op, item in queue_ops)
+        
+        for collection, keys in changes.entries.items():
+            if collection in changes.collections:
+                continue
+            values = store.get(collection)
+            if values is None:
+                ops.append([collection])
+                continue
+            for key in keys:
+                if key in values:
+                    ops.append([collection, key, values[key]])
+                else:
+                    ops.append([collection, key])
+        return ops
+    
+    def write(self, store: Store, changes: ChangeSet) -> None:
+        """Дописывает изменения в журнал одной строкой (под блокировкой хранилища, с fsync)."""
+        line = _dumps(self._ops(store, changes)) + '\n'
+        with self._journal_lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                # Зафиксированная транзакция не должна пропасть при сбое
+                f.flush()
+                os.fsync(f.fileno())
+                journal_size = f.tell()
+                inode = os.fstat(f.fileno()).st_ino
+            self._remember_own_change()
+        
+        if journal_size >= self.compact_threshold:
+            self._start_compaction(store, inode, journal_size)
+    
+    def _start_compaction(self, store: Store, inode: int, offset: int) -> None:
+        """
+        Запускает фоновое сжатие журнала.
+        
+        store должен содержать ровно первые offset байт журнала с номером
+        inode: копия снимается сразу, а сериализация и запись снимка идут
+        в отдельном потоке.
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        
+        snapshot = clone_json(store)
+        self._compactor = threading.Thread(
+            target=self._compact, args=(snapshot, inode, offset), name='journal-compactor', daemon=True
+        )
+        self._compactor.start()
+    
+    def _compact(self, snapshot: Store, inode: int, offset: int) -> None:
+        """
+        Пишет свежий снимок и убирает из журнала вошедшие в него строки.
+        
+        Работает под межпроцессной блокировкой хранилища: пока она взята,
+        никто не дописывает журнал, поэтому строки после offset переносятся
+        в новый журнал без потерь. Если журнал с тех пор уже свернул другой
+        компактор (сменился inode), снимок устарел и не записывается.
+        """
+        try:
+            with self.file_lock, self._journal_lock:
+                try:
+                    st = os.stat(self.journal_path)
+                except FileNotFoundError:
+                    return
+                if st.st_ino != inode or st.st_size < offset:
+                    logger.info(f"Журнал {self.journal_path} уже свернут другим процессом")
+                    return
+                
+                atomic_write(self.path, snapshot, fsync=True)
+                # Строки, дописанные после снятия копии, переносим в новый журнал
+                with open(self.journal_path, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+                tmp_path = self.journal_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.journal_path)
+                self._remember_own_change()
+            
+            logger.info(f"Журнал {self.journal_path} свернут в снимок {self.path}")
+        except Exception as e:
+            logger.error(f"Ошибка сжатия журнала {self.journal_path}: {e}", exc_info=True)
+
+
+class ShardedBackend:
+    """
+    Store, разложенный по файлам коллекций: users.json, queue.json, teams.json и т.д.
+    
+    Каждая коллекция верхнего уровня лежит в отдельном файле каталога
+    хранилища. Фиксация пишет (с fsync) новые файлы только затронутых
+    коллекций, поэтому частые правки user_messages или cache не сериализуют
+    пользователей и команды.
+    
+    Какие файлы составляют текущее состояние, указывает манифест MANIFEST
+    ({"generation": N, "files": {коллекция: файл}}). Файлы фиксации
+    получают имя с номером поколения и становятся видны только после
+    атомарной замены манифеста, которая идет последней: сбой посреди
+    фиксации оставляет предыдущее согласованное состояние. Чтение и запись
+    идут под блокировкой хранилища, поэтому другой процесс не увидит смесь
+    поколений.
+    """
+
+    SUFFIX = '.json'
+    MANIFEST = 'MANIFEST'
+
+    def __init__(self, path: str, import_from: Optional[str] = None):
+        """
+        Args:
+            path: Каталог с файлами коллекций
+            import_from: JSON-файл, содержимое которого раскладывается по файлам
+                при первом создании каталога
+        """
+        self.path = path
+        self.import_from = import_from
+        self.file_lock = FileLock(path + '.lock')
+        self.manifest_path = os.path.join(path, self.MANIFEST)
+
+    def exists(self) -> bool:
+        """Проверяет, что каталог хранилища уже создан."""
+        return os.path.isdir(self.path)
+
+    def initialize(self, store: Store) -> None:
+        """
+        Создает каталог хранилища.
+        
+        Если есть JSON-файл import_from, коллекции берутся из него. Каталог
+        собирается во временном каталоге и переименовывается целиком, чтобы
+        сбой не оставил его наполовину заполненным.
+        """
+        if self.exists():
+            return
+        if self.import_from and os.path.exists(self.import_from):
+            with open(self.import_from, 'r', encoding='utf-8') as f:
+                store = json.load(f)
+            logger.info(f"Данные {self.import_from} разложены по файлам в {self.path}")
+
+        tmp_dir = self.path + '.tmp'
+        # Остатки прерванного создания
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        files = {}
+        for collection, value in store.items():
+            files[collection] = collection + self.SUFFIX
+            atomic_write(os.path.join(tmp_dir, files[collection]), value, fsync=True)
+        atomic_write(os.path.join(tmp_dir, self.MANIFEST), {'generation': 0, 'files': files}, fsync=True)
+        os.replace(tmp_dir, self.path)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        """
+        Читает манифест.
+        
+        В каталоге, созданном до появления манифеста, состояние составляют
+        все файлы коллекций <коллекция>.json (поколение 0).
+        """
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            files = {name[:-len(self.SUFFIX)]: name for name in os.listdir(self.path)
+                     if name.endswith(self.SUFFIX)}
+            return {'generation': 0, 'files': files}
+
+    def signature(self) -> Hashable:
+        """Возвращает stat манифеста (он заменяется при каждой фиксации)."""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            if not self.exists():
+                raise
+            # Каталог без манифеста: смотрим на сами файлы коллекций
+            stats = []
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(self.SUFFIX):
+                        st = entry.stat()
+                        stats.append((entry.name, st.st_mtime_ns, st.st_size, st.st_ino))
+            return tuple(sorted(stats))
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def read(self) -> Store:
+        """Читает файлы коллекций текущего поколения; отсутствующие коллекции берутся пустыми."""
+        store: Dict[str, Any] = {}
+        with self.file_lock:
+            for collection, name in self._read_manifest()['files'].items():
+                with open(os.path.join(self.path, name), 'r', encoding='utf-8') as f:
+                    store[collection] = json.load(f)
+        for collection, value in default_store().items():
+            store.setdefault(collection, value)
+        return store
+
+    def write(self, store: Store, changes: ChangeSet) -> None:
+        """Пишет файлы затронутых коллекций нового поколения и затем переключает на них манифест."""
+        touched = set(changes.collections) | set(changes.entries) | set(changes.queue_ops)
+        with self.file_lock:
+            manifest = self._read_manifest()
+            generation = manifest['generation'] + 1
+            files = dict(manifest['files'])
+            for collection in touched:
+                if collection in store:
+                    files[collection] = f'{collection}.{generation}{self.SUFFIX}'
+                    atomic_write(os.path.join(self.path, files[collection]), store[collection], fsync=True)
+                else:
+                    files.pop(collection, None)
+            atomic_write(self.manifest_path, {'generation': generation, 'files': files}, fsync=True)
+            self._remove_unreferenced(files)
+
+    def _remove_unreferenced(self, files: Dict[str, str]) -> None:
+        """Удаляет файлы коллекций прежних поколений и прерванных фиксаций."""
+        referenced = set(files.values())
+        for name in os.listdir(self.path):
+            if name.endswith(self.SUFFIX) and name not in referenced:
+                try:
+                    os.unlink(os.path.join(self.path, name))
+                except OSError as e:
+                    logger.warning(f"Не удалось удалить {name} из {self.path}: {e}")
+
+
+class SqliteBackend:
+    """
+    Store в базе SQLite (WAL) с отдельными таблицами и индексами.
+
+    Пользователи, команды, вопросы и очереди (общая и очереди когорт,
+    различаются колонкой cohort) лежат в собственных таблицах, остальные
+    коллекции-словари - в общей таблице entries, прочие значения верхнего
+    уровня - в meta. Запись затрагивает только измененные строки.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            tg_id TEXT PRIMARY KEY,
+            status TEXT,
+            team_id TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_status ON users(status);
+
+        CREATE TABLE IF NOT EXISTS queue (
+            cohort TEXT NOT NULL DEFAULT '',
+            tg_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (cohort, tg_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_queue_position ON queue(cohort, position);
+
+        CREATE TABLE IF NOT EXISTS teams (
+            id TEXT PRIMARY KEY,
+            status TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_teams_status ON teams(status);
+
+        CREATE TABLE IF NOT EXISTS questions (
+            id TEXT PRIMARY KEY,
+            answered INTEGER NOT NULL DEFAULT 0,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_questions_answered ON questions(answered);
+
+        CREATE TABLE IF NOT EXISTS entries (
+            collection TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (collection, key)
+        );
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    # Коллекции с собственными таблицами: (таблица, ключевая колонка, доп. колонки)
+    TABLES = {
+        'users': ('users', 'tg_id', ('status', 'team_id')),
+        'teams': ('teams', 'id', ('status',)),
+        'questions': ('questions', 'id', ('answered',)),
+    }
+
+    # Служебный ключ meta, отмечающий завершенную инициализацию
+    INITIALIZED_KEY = '__initialized__'
+
+    def __init__(self, path: str, import_from: Optional[str] = None):
+        """
+        Args:
+            path: Путь к файлу базы SQLite
+            import_from: JSON-файл, импортируемый при первой инициализации
+        """
+        self.path = path
+        self.import_from = import_from
+        self.file_lock = FileLock(path + '.lock')
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Соединение с базой (создается при первом обращении)."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._migrate_queue(conn)
+            self._conn = conn
+        return self._conn
+
+    def _migrate_queue(self, conn: sqlite3.Connection) -> None:
+        """
+        Создает схему; базу прежнего формата переводит на очереди с колонкой cohort.
+        
+        Раньше таблица queue хранила только общую очередь, а очереди когорт
+        лежали в meta целиком (ключи queue.<id>).
+        """
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(queue)')}
+        if not columns or 'cohort' in columns:
+            conn.executescript(self.SCHEMA)
+            return
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('ALTER TABLE queue RENAME TO queue_legacy')
+            conn.execute('DROP INDEX IF EXISTS idx_queue_position')
+            for statement in self.SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute("INSERT INTO queue (cohort, tg_id, position) "
+                         "SELECT '', tg_id, position FROM queue_legacy")
+            conn.execute('DROP TABLE queue_legacy')
+            rows = conn.execute('SELECT key, data FROM meta WHERE key LIKE ?',
+                                (COHORT_QUEUE_PREFIX + '%',)).fetchall()
+            for key, data in rows:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO queue (cohort, tg_id, position) VALUES (?, ?, ?)',
+                    ((self._queue_cohort(key), str(tg_id), position)
+                     for position, tg_id in enumerate(json.loads(data)))
+                )
+                conn.execute('DELETE FROM meta WHERE key = ?', (key,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        logger.info(f"Очереди когорт в {self.path} перенесены в таблицу queue")
+
+    @staticmethod
+    def _queue_cohort(collection: str) -> str:
+        """Значение колонки cohort для коллекции-очереди ('' - общая очередь)."""
+        return collection[len(COHORT_QUEUE_PREFIX):] if collection.startswith(COHORT_QUEUE_PREFIX) else ''
+
+    @staticmethod
+    def _queue_collection(cohort: str) -> str:
+        """Коллекция-очередь по значению колонки cohort (обратное к _queue_cohort)."""
+        return COHORT_QUEUE_PREFIX + cohort if cohort else 'queue'
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def exists(self) -> bool:
+        """Проверяет, что база создана и инициализирована."""
+        if not os.path.exists(self.path):
+            return False
+        row = self.conn.execute('SELECT 1 FROM meta WHERE key = ?', (self.INITIALIZED_KEY,)).fetchone()
+        return row is not None
+
+    def initialize(self, store: Store) -> None:
+        """Создает базу; при наличии import_from импортирует данные из JSON."""
+        if self.import_from and os.path.exists(self.import_from):
+            with open(self.import_from, 'r', encoding='utf-8') as f:
+                store = json.load(f)
+            logger.info(f"Импорт {self.import_from} в SQLite-хранилище {self.path}")
+        self.replace(store)
+
+    def replace(self, store: Store) -> None:
+        """Полностью заменяет содержимое базы на store."""
+        changes = ChangeSet()
+        changes.touch_all(store)
+        # Удаляем и коллекции, которых нет в новом store
+        changes.collections.update(self._stored_collections())
+        self.write(store, changes)
+
+    def signature(self) -> Hashable:
+        """Возвращает счетчик изменений базы другими соединениями."""
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def read(self) -> Store:
+        """Читает Store целиком."""
+        conn = self.conn
+        store: Dict[str, Any] = {}
+
+        for key, data in conn.execute('SELECT key, data FROM meta WHERE key != ?', (self.INITIALIZED_KEY,)):
+            store[key] = json.loads(data)
+
+        for collection, (table, key_column, _) in self.TABLES.items():
+            store[collection] = {
+                key: json.loads(data)
+                for key, data in conn.execute(f'SELECT {key_column}, data FROM {table}')
+            }
+
+        for cohort, tg_id in conn.execute('SELECT cohort, tg_id FROM queue ORDER BY cohort, position'):
+            store.setdefault(self._queue_collection(cohort), []).append(tg_id)
+
+        for collection, key, data in conn.execute('SELECT collection, key, data FROM entries'):
+            store.setdefault(collection, {})[key] = json.loads(data)
+
+        # Пустые коллекции в таблицах не видны - добавляем их из пустого Store
+        for key, value in default_store().items():
+            store.setdefault(key, value)
+        return store  # type: ignore[return-value]
+
+    def write(self, store: Store, changes: ChangeSet) -> None:
+        """Записывает в одной транзакции SQLite только затронутые данные."""
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for collection in changes.collections:
+                self._write_collection(collection, store)
+
+            for collection, keys in changes.entries.items():
+                if collection in changes.collections:
+                    continue
+                values = store.get(collection) or {}
+                for key in keys:
+                    self._write_entry(collection, key, values.get(key))
+
+            for collection, queue_ops in changes.queue_ops.items():
+                if collection in changes.collections:
+                    continue
+                cohort = self._queue_cohort(collection)
+                for op, item in queue_ops:
+                    self._write_queue_op(cohort, op, str(item))
+
+            conn.execute(
+                'INSERT OR REPLACE INTO meta (key, data) VALUES (?, ?)',
+                (self.INITIALIZED_KEY, 'true')
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _stored_collections(self) -> Set[str]:
+        """Возвращает имена коллекций, уже сохраненных в базе."""
+        conn = self.conn
+        names = {key for (key,) in conn.execute('SELECT key FROM meta WHERE key != ?', (self.INITIALIZED_KEY,))}
+        names.update(collection for (collection,) in conn.execute('SELECT DISTINCT collection FROM entries'))
+        names.update(self._queue_collection(cohort) for (cohort,) in conn.execute('SELECT DISTINCT cohort FROM queue'))
+        return names
+
+    def _write_collection(self, collection: str, store: Store) -> None:
+        """Переписывает коллекцию или значение верхнего уровня целиком."""
+        conn = self.conn
+        present = collection in store
+        value = store.get(collection)
+        if collection in self.TABLES:
+            conn.execute(f'DELETE FROM {self.TABLES[collection][0]}')
+            for key, item in (value or {}).items():
+                self._write_entry(collection, key, item)
+            return
+        if is_queue_collection(collection):
+            cohort = self._queue_cohort(collection)
+            conn.execute('DELETE FROM queue WHERE cohort = ?', (cohort,))
+            conn.executemany(
+                'INSERT OR IGNORE INTO queue (cohort, tg_id, position) VALUES (?, ?, ?)',
+                ((cohort, str(tg_id), position) for position, tg_id in enumerate(value or []))
+            )
+            return
+
+        conn.execute('DELETE FROM entries WHERE collection = ?', (collection,))
+        if present and not (collection in KEYED_COLLECTIONS and isinstance(value, dict) and value):
+            conn.execute('INSERT OR REPLACE INTO meta (key, data) VALUES (?, ?)', (collection, _dumps(value)))
+            return
+        conn.execute('DELETE FROM meta WHERE key = ?', (collection,))
+        if present:
+            conn.executemany(
+                'INSERT INTO entries (collection, key, data) VALUES (?, ?, ?)',
+                ((collection, key, _dumps(item)) for key, item in value.items())
+            )
+
+    def _write_queue_op(self, cohort: str, op: str, tg_id: str) -> None:
+        """Применяет к очереди когорты cohort одну операцию (см. QUEUE_OPS)."""
+        conn = self.conn
+        if op == 'remove':
+            conn.execute('DELETE FROM queue WHERE cohort = ? AND tg_id = ?', (cohort, tg_id))
+        elif op == 'front':
+            conn.execute(
+                'INSERT OR IGNORE INTO queue (cohort, tg_id, position) '
+                'SELECT ?, ?, COALESCE(MIN(position), 0) - 1 FROM queue WHERE cohort = ?', (cohort, tg_id, cohort)
+            )
+        else:
+            conn.execute(
+                'INSERT OR IGNORE INTO queue (cohort, tg_id, position) '
+                'SELECT ?, ?, COALESCE(MAX(position), 0) + 1 FROM queue WHERE cohort = ?', (cohort, tg_id, cohort)
+            )
+
+    def _write_entry(self, collection: str, key: str, item: Any) -> None:
+        """Записывает (или удаляет при item=None) одну запись коллекции."""
+        conn = self.conn
+        if collection in self.TABLES:
+            table, key_column, columns = self.TABLES[collection]
+            if item is None:
+                conn.execute(f'DELETE FROM {table} WHERE {key_column} = ?', (key,))
+                return
+            values = [item.get(column) for column in columns]
+            placeholders = ', '.join('?' * (len(columns) + 2))
+            conn.execute(
+                f'INSERT OR REPLACE INTO {table} ({key_column}, {", ".join(columns)}, data) VALUES ({placeholders})',
+                (key, *values, _dumps(item))
+            )
+        elif item is None:
+            conn.execute('DELETE FROM entries WHERE collection = ? AND key = ?', (collection, key))
+        else:
+            conn.execute(
+                'INSERT OR REPLACE INTO entries (collection, key, data) VALUES (?, ?, ?)',
+                (collection, key, _dumps(item))
+            )
+
+
+def _dumps(value: Any) -> str:
+    """Компактная JSON-сериализация значения для хранения в строке таблицы."""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=json_default)
+
+
+def create_backend(file_path: str):
+    """
+    Создает бэкенд хранения согласно STORAGE_BACKEND.
+
+    Args:
+        file_path: Путь к JSON-файлу хранилища (data.json)
+
+    Returns:
+        JsonFileBackend (по умолчанию), JournalBackend, ShardedBackend или
+        SqliteBackend. Каталог файлов коллекций лежит в SHARDS_DIR или рядом
+        с file_path с расширением .d, база SQLite - в SQLITE_PATH или рядом
+        с file_path с расширением .db; при первом запуске в них
+        импортируется существующий file_path.
+    """
+    backend = os.getenv('STORAGE_BACKEND', 'json').lower()
+    if backend == 'journal':
+        threshold = int(os.getenv('JOURNAL_COMPACT_BYTES', str(1024 * 1024)))
+        return JournalBackend(file_path, compact_threshold=threshold)
+    if backend == 'shards':
+        shards_dir = os.getenv('SHARDS_DIR') or os.path.splitext(file_path)[0] + '.d'
+        return ShardedBackend(shards_dir, import_from=file_path)
+    if backend == 'sqlite':
+        db_path = os.getenv('SQLITE_PATH') or os.path.splitext(file_path)[0] + '.db'
+        return SqliteBackend(db_path, import_from=file_path)
+    if backend != 'json':
+        logger.warning(f"Неизвестный STORAGE_BACKEND={backend}, используется json")
+    return JsonFileBackend(file_path)
+
+
+def import_json_file(json_path: str, db_path: str) -> Dict[str, int]:
+    """
+    Одноразово импортирует data.json в базу SQLite, заменяя её содержимое.
+
+    Args:
+        json_path: Путь к JSON-файлу хранилища
+        db_path: Путь к файлу базы SQLite
+
+    Returns:
+        Количество импортированных записей по основным коллекциям
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        store = json.load(f)
+
+    backend = SqliteBackend(db_path)
+    try:
+        backend.replace(store)
+    finally:
+        backend.close()
+
+    return {
+        'users': len(store.get('users', {})),
+        'teams': len(store.get('teams', {})),
+        'queue': len(store.get('queue', [])),
+        'questions': len(store.get('questions', {})),
+    }
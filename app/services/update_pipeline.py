@@ -0,0 +1,181 @@
+"""
+Конвейер обработки обновлений Telegram.
+
+Обновления раскладываются по чатам: обновления одного чата
+обрабатываются строго по очереди (в порядке поступления), разных
+чатов - параллельно пулом из UPDATE_WORKERS обработчиков. Медленный
+обработчик (анимация /admin, рассылка карточек) занимает один
+обработчик пула и задерживает только свой чат.
+
+Всего в конвейере (в очереди и в обработке) не больше
+UPDATE_QUEUE_SIZE обновлений: при переполнении прием новых ждет, и
+long polling не запрашивает обновления, которые некому обработать.
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+def update_chat_id(update: Update) -> Optional[int]:
+    """Возвращает чат обновления (для событий без чата - пользователя), None - не определен."""
+    try:
+        event = update.event
+    except Exception:
+        # Тип обновления неизвестен этой версии aiogram
+        return None
+    chat = getattr(event, 'chat', None) or getattr(getattr(event, 'message', None), 'chat', None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, 'from_user', None) or getattr(event, 'user', None)
+    return user.id if user is not None else None
+
+
+class UpdatePipeline:
+    """Очереди обновлений по чатам и ограниченный пул обработчиков."""
+
+    def __init__(self, process: Callable[..., Awaitable[Any]], workers: Optional[int] = None,
+                 queue_size: Optional[int] = None):
+        """
+        Args:
+            process: Корутина обработки одного обновления (вызывается с аргументами submit)
+            workers: Сколько чатов обрабатывать одновременно (UPDATE_WORKERS, по умолчанию 16)
+            queue_size: Сколько обновлений держать в конвейере (UPDATE_QUEUE_SIZE, по умолчанию 1000)
+        """
+        self.process = process
+        self.workers = workers or int(os.getenv('UPDATE_WORKERS', '16'))
+        self.queue_size = queue_size or int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+        # Чат -> его необработанные обновления. Чат есть в словаре, пока он стоит
+        # в _ready или обрабатывается, поэтому одним чатом занят не больше чем один обработчик
+        self._chats: Dict[Hashable, Deque[Tuple[tuple, Dict[str, Any]]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: list = []
+        # Метрики
+        self.queued = 0
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_queued = 0
+
+    def _ensure_workers(self) -> None:
+        """Запускает обработчики в текущем цикле событий (при первом обновлении)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._ready = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.queue_size)
+            self._loop = loop
+            self._chats.clear()
+            self._tasks = []
+            self.queued = self.busy = 0
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def submit(self, key: Optional[Hashable], *args, **kwargs) -> None:
+        """
+        Ставит обновление в очередь чата key и возвращается, не дожидаясь обработки.
+
+        key=None - порядок не важен, обновление обрабатывается независимо от остальных.
+        """
+        self._ensure_workers()
+        await self._slots.acquire()
+        if key is None:
+            key = object()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        updates = self._chats.get(key)
+        if updates is not None:
+            # Чат уже ждет или обрабатывается - обновление пойдет следом за предыдущими
+            updates.append((args, kwargs))
+            return
+        self._chats[key] = deque([(args, kwargs)])
+        self._ready.put_nowait(key)
+
+    async def _worker(self) -> None:
+        """Берет чат из очереди и обрабатывает его следующее обновление."""
+        while True:
+            key = await self._ready.get()
+            updates = self._chats[key]
+            args, kwargs = updates.popleft()
+            self.busy += 1
+            try:
+                await self.process(*args, **kwargs)
+            except Exception as e:
+                self.failed += 1
+                logger.exception(f"Ошибка обработки обновления: {e}")
+            finally:
+                self.busy -= 1
+                self.queued -= 1
+                self.processed += 1
+                self._slots.release()
+                if updates:
+                    # Остальные обновления чата - в конец очереди, чтобы не задерживать другие чаты
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+                self._ready.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики конвейера: глубина очереди, занятость пула, счетчики."""
+        return {
+            'workers': self.workers,
+            'busy': self.busy,
+            'queued': self.queued,
+            'chats': len(self._chats),
+            'max_chat_queue': max((len(updates) for updates in self._chats.values()), default=0),
+            'max_queued': self.max_queued,
+            'queue_size': self.queue_size,
+            'processed': self.processed,
+            'failed': self.failed,
+        }
+
+    async def join(self) -> None:
+        """Ждет, пока будут обработаны все принятые обновления."""
+        if self._ready is not None:
+            await self._ready.join()
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Дообрабатывает принятые обновления (не дольше timeout секунд) и останавливает пул."""
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не дождались обработки {self.queued} обновлений при остановке")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+class PipelineDispatcher(Dispatcher):
+    """
+    Dispatcher, пропускающий обновления через UpdatePipeline.
+
+    feed_update ставит обновление в очередь его чата и сразу возвращается;
+    обработка (Dispatcher.feed_update) выполняется пулом. Ответ обработчика
+    в виде метода Telegram отправляется отдельным запросом, а не ответом
+    на webhook.
+    """
+
+    def __init__(self, *args, workers: Optional[int] = None, queue_size: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pipeline = UpdatePipeline(self._process, workers=workers, queue_size=queue_size)
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        """Ставит обновление в очередь его чата."""
+        await self.pipeline.submit(update_chat_id(update), bot, update, **kwargs)
+        return None
+
+    async def _process(self, bot: Bot, update: Update, **kwargs: Any) -> None:
+        """Обрабатывает обновление в пуле."""
+        result = await super().feed_update(bot, update, **kwargs)
+        if isinstance(result, TelegramMethod):
+            await self.silent_call_request(bot=bot, result=result)
@@ -4,22 +4,34 @@
 
 import os
 import json
-from typing import Any
+import time
+import threading
+from typing import Any, Optional
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:
+    # Windows: межпроцессная блокировка недоступна, остается блокировка потоков
+    fcntl = None
 
-def atomic_write(file_path: str, data: Any) -> None:
+
+def atomic_write(file_path: str, data: Any, fsync: bool = False) -> None:
     """
     Атомарная запись в JSON файл через временный файл.
     
     Args:
         file_path: Путь к целевому файлу
         data: Данные для записи
+        fsync: Сбросить данные на диск до переименования
     """
     tmp_path = file_path + '.tmp'
     try:
         with open(tmp_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+            json.dump(data, f, ensure_ascii=False, indent=2, default=json_default)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
         os.replace(tmp_path, file_path)
     except Exception as e:
         # Удаляем временный файл в случае ошибки
@@ -28,6 +40,115 @@ def atomic_write(file_path: str, data: Any) -> None:
         raise e
 
 
+def json_default(obj: Any) -> Any:
+    """
+    Сериализует в JSON объекты с методом to_json() (например, очередь ожидания).
+    
+    Используется как параметр default для json.dump/json.dumps.
+    """
+    if hasattr(obj, 'to_json'):
+        return obj.to_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def clone_json(data: Any) -> Any:
+    """
+    Быстрая глубокая копия JSON-совместимых данных (dict/list/скаляры).
+    
+    В отличие от copy.deepcopy не ведёт memo-таблицу, поэтому заметно быстрее
+    на больших деревьях словарей и списков.
+    
+    Args:
+        data: Данные для копирования
+        
+    Returns:
+        Независимая копия данных
+    """
+    if isinstance(data, dict):
+        return {key: clone_json(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [clone_json(value) for value in data]
+    if hasattr(data, 'to_json'):
+        return clone_json(data.to_json())
+    return data
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на основе fcntl.flock (рекурсивная внутри процесса).
+    
+    Блокирует отдельный файл-замок, поэтому защищаемые файлы можно свободно
+    заменять через os.replace. Повторный захват тем же потоком только
+    увеличивает счетчик. Без fcntl (Windows) работает как обычная RLock.
+    
+    Пример:
+        lock = FileLock('data.json.lock')
+        with lock:
+            ...
+    """
+    
+    def __init__(self, path: str, timeout: float = 30.0, poll_interval: float = 0.01):
+        """
+        Args:
+            path: Путь к файлу-замку (создается при первом захвате)
+            timeout: Сколько секунд ждать блокировку другого процесса
+            poll_interval: Пауза между попытками захвата
+        """
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._thread_lock = threading.RLock()
+        self._fd: Optional[int] = None
+        self._depth = 0
+    
+    def acquire(self) -> None:
+        """Захватывает блокировку; TimeoutError, если другой процесс не отпустил её вовремя."""
+        self._thread_lock.acquire()
+        if self._depth:
+            self._depth += 1
+            return
+        try:
+            if fcntl is not None:
+                self._fd = self._lock_file()
+            self._depth = 1
+        except BaseException:
+            self._thread_lock.release()
+            raise
+    
+    def _lock_file(self) -> int:
+        """Открывает файл-замок и захватывает flock, ожидая не дольше timeout."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Не удалось захватить блокировку {self.path} за {self.timeout} с")
+                    time.sleep(self.poll_interval)
+        except BaseException:
+            os.close(fd)
+            raise
+    
+    def release(self) -> None:
+        """Отпускает блокировку."""
+        self._depth -= 1
+        if not self._depth and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+    
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
 def ensure_file_exists(file_path: str, default_content: Any = None) -> None:
     """
     Убеждается, что файл существует. Если нет - создает с дефолтным содержимым.
@@ -0,0 +1,208 @@
+"""
+Очередь ожидания с индексом позиций.
+
+Элементы лежат в массиве слотов в порядке очереди; удаленные слоты
+помечаются пустыми, а дерево Фенвика над слотами считает живые элементы.
+Это дает O(1) проверку членства, вставку в начало и конец и удаление,
+O(log n) вычисление позиции и доступ по индексу. Пустые слоты
+периодически вычищаются перестроением за O(n), амортизированно O(1).
+
+В JSON очередь сериализуется обычным списком (см. to_json).
+"""
+
+from itertools import islice
+from typing import Any, Dict, Hashable, Iterable, Iterator, List
+
+# Пустой слот (элементы очереди могут быть любыми hashable, включая None)
+_EMPTY = object()
+
+# Минимальный запас свободных слотов при перестроении
+_MIN_SPARE = 16
+
+
+class WaitingQueue:
+    """FIFO-очередь уникальных элементов с быстрым поиском позиции."""
+
+    def __init__(self, items: Iterable[Hashable] = ()):
+        unique: Dict[Hashable, None] = dict.fromkeys(items)
+        self._rebuild(list(unique))
+
+    def _rebuild(self, items: List[Hashable]) -> None:
+        """Раскладывает элементы по слотам с запасом с обеих сторон."""
+        size = len(items)
+        head = size // 2 + _MIN_SPARE
+        capacity = head + size + size + _MIN_SPARE
+
+        self._slots: List[Any] = [_EMPTY] * capacity
+        self._slots[head:head + size] = items
+        self._head = head
+        self._tail = head + size
+        self._size = size
+        self._pos: Dict[Hashable, int] = {item: head + i for i, item in enumerate(items)}
+
+        # Линейное построение дерева Фенвика (индексы с 1)
+        tree = [0] * (capacity + 1)
+        for slot in range(head, head + size):
+            tree[slot + 1] += 1
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _add(self, slot: int, delta: int) -> None:
+        """Изменяет счетчик слота в дереве Фенвика."""
+        i = slot + 1
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _count_before(self, slot: int) -> int:
+        """Возвращает число живых элементов в слотах [0, slot)."""
+        i = slot
+        total = 0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _slot_of_rank(self, rank: int) -> int:
+        """Возвращает слот элемента с позицией rank (0-based)."""
+        tree = self._tree
+        slot = 0
+        remaining = rank + 1
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = slot + step
+            if nxt < len(tree) and tree[nxt] < remaining:
+                slot = nxt
+                remaining -= tree[nxt]
+            step >>= 1
+        return slot
+
+    def _compact_if_sparse(self) -> None:
+        """Перестраивает слоты, когда пустых стало больше, чем живых."""
+        holes = self._tail - self._head - self._size
+        if holes > max(_MIN_SPARE, self._size):
+            self._rebuild(list(self))
+
+    def append(self, item: Hashable) -> None:
+        """Добавляет элемент в конец очереди."""
+        if item in self._pos:
+            raise ValueError(f"{item!r} уже в очереди")
+        if self._tail == len(self._slots):
+            self._rebuild(list(self))
+        slot = self._tail
+        self._slots[slot] = item
+        self._pos[item] = slot
+        self._tail += 1
+        self._size += 1
+        self._add(slot, 1)
+
+    def appendleft(self, item: Hashable) -> None:
+        """Добавляет элемент в начало очереди."""
+        if item in self._pos:
+            raise ValueError(f"{item!r} уже в очереди")
+        if self._head == 0:
+            self._rebuild(list(self))
+        self._head -= 1
+        slot = self._head
+        self._slots[slot] = item
+        self._pos[item] = slot
+        self._size += 1
+        self._add(slot, 1)
+
+    def extend(self, items: Iterable[Hashable]) -> None:
+        """Добавляет элементы в конец очереди по порядку."""
+        for item in items:
+            self.append(item)
+
+    def extendleft(self, items: Iterable[Hashable]) -> None:
+        """Добавляет элементы в начало очереди, сохраняя их порядок."""
+        for item in reversed(list(items)):
+            self.appendleft(item)
+
+    def insert(self, index: int, item: Hashable) -> None:
+        """Вставляет элемент; в начало и конец - за O(1), в середину - перестроением."""
+        if index < 0:
+            index = max(0, index + self._size)
+        if index == 0:
+            self.appendleft(item)
+        elif index >= self._size:
+            self.append(item)
+        else:
+            if item in self._pos:
+                raise ValueError(f"{item!r} уже в очереди")
+            items = list(self)
+            items.insert(index, item)
+            self._rebuild(items)
+
+    def remove(self, item: Hashable) -> None:
+        """Удаляет элемент из очереди. ValueError, если его нет."""
+        slot = self._pos.pop(item, None)
+        if slot is None:
+            raise ValueError(f"{item!r} нет в очереди")
+        self._slots[slot] = _EMPTY
+        self._size -= 1
+        self._add(slot, -1)
+
+        # Сдвигаем границы, если удалили крайний элемент
+        while self._head < self._tail and self._slots[self._head] is _EMPTY:
+            self._head += 1
+        while self._tail > self._head and self._slots[self._tail - 1] is _EMPTY:
+            self._tail -= 1
+        self._compact_if_sparse()
+
+    def index(self, item: Hashable) -> int:
+        """Возвращает позицию элемента (0-based). ValueError, если его нет."""
+        slot = self._pos.get(item)
+        if slot is None:
+            raise ValueError(f"{item!r} нет в очереди")
+        return self._count_before(slot)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._pos
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Hashable]:
+        slots = self._slots
+        for slot in range(self._head, self._tail):
+            item = slots[slot]
+            if item is not _EMPTY:
+                yield item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._size)
+            if step == 1 and start == 0:
+                return list(islice(self, stop))
+            return self.to_json()[index]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('индекс вне очереди')
+        return self._slots[self._slot_of_rank(index)]
+
+    def __add__(self, other) -> list:
+        return self.to_json() + list(other)
+
+    def __radd__(self, other) -> list:
+        return list(other) + self.to_json()
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, WaitingQueue):
+            return self.to_json() == other.to_json()
+        if isinstance(other, list):
+            return self.to_json() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"WaitingQueue({self.to_json()!r})"
+
+    def to_json(self) -> list:
+        """Возвращает очередь обычным списком (формат data.json)."""
+        return list(self)
@@ -2,7 +2,7 @@
 Модели данных для Telegram-бота комплектовщика команд.
 """
 
-from typing import TypedDict, List, Dict, Literal, Optional
+from typing import Any, TypedDict, List, Dict, Literal, Optional, Union
 
 Status = Literal['waiting', 'teamed', 'registering', 'asking_question']
 
@@ -17,11 +17,22 @@ class User(TypedDict, total=False):
     status: Status
     team_id: Optional[str]
     registration_step: Optional[str]  # для отслеживания этапа регистрации
+    queued_at: Optional[str]  # ISO-время последней постановки в очередь
+    cohort: Optional[str]  # когорта (см. services.cohorts), нет - общая очередь
+    # Атрибуты для сбалансированного комплектования (см. services.matching_strategies)
+    district: Optional[str]
+    age_group: Optional[str]
+    participations: Optional[int]  # в скольких командах уже был (считается при комплектовании)
+    skills: Optional[List[str]]
 
 
-class Team(TypedDict):
+class _TeamOptional(TypedDict, total=False):
+    cohort: str  # когорта команды (нет - общая очередь)
+
+
+class Team(_TeamOptional):
     """Модель команды."""
-    id: str  # "C-12"
+    id: str  # "C-12", в когорте - "C-hack-12"
     members: List[int]  # порядок: 1-й — капитан
     created_at: str
     status: Literal['active', 'archived']
@@ -40,6 +51,42 @@ class Question(TypedDict):
     answered_at: Optional[str]
 
 
+class Broadcast(TypedDict):
+    """Задание рассылки (см. services.broadcast_jobs)."""
+    id: str  # "B-3"
+    kind: Literal['message', 'team_cards']
+    title: str  # аудитория для отчета: "ожидающим", "командам C-1, C-2"
+    text: Optional[str]  # текст для kind='message'
+    team_ids: List[str]  # команды для kind='team_cards' (карточки строятся при отправке)
+    recipients: List[str]  # строковые tg_id в порядке отправки
+    results: Dict[str, str]  # tg_id -> sent/failed/unreachable
+    cursor: int  # сколько первых получателей из recipients уже обработано
+    sent: int
+    failed: int
+    unreachable: int
+    status: Literal['running', 'done', 'failed']  # failed - исчерпаны попытки (см. attempts)
+    attempts: int  # сколько запусков задания завершились ошибкой
+    error: Optional[str]  # текст последней такой ошибки
+    created_at: str
+    finished_at: Optional[str]
+    report_chat_id: Optional[Union[int, str]]  # чат сообщения с прогрессом
+    report_message_id: Optional[int]
+
+
+class Unreachable(TypedDict):
+    """Получатель, до которого не доходят сообщения (см. services.broadcast)."""
+    since: str  # ISO-время, когда доставка не удалась
+    reason: Literal['blocked', 'deactivated', 'not_found']
+    error: str  # текст ответа Telegram
+
+
+class UserSnapshot(TypedDict):
+    """Данные пользователя для одного обновления (см. services.request_store)."""
+    user: Optional[User]
+    queue_position: int  # позиция в очереди когорты, -1 - не в очереди
+    queue_size: int  # размер очереди когорты
+
+
 class Store(TypedDict):
     """Главная модель хранилища данных."""
     users: Dict[str, User]  # используем str(tg_id) как ключи
@@ -51,3 +98,7 @@ class Store(TypedDict):
     next_match_time: Optional[str]  # время следующего автоматического объединения
     user_messages: Optional[Dict[str, List[int]]]  # сообщения пользователей
     cache: Optional[Dict[str, str]]  # кэш для file_id и других данных
+    version: Optional[int]  # версия данных, растет при каждой записи
+    stats: Optional[Dict[str, Any]]  # агрегаты (см. services.aggregates)
+    broadcasts: Optional[Dict[str, Broadcast]]  # задания рассылок
+    unreachable: Optional[Dict[str, Unreachable]]  # недоступные получатели по tg_id
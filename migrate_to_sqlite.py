@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Скрипт для одноразового импорта data.json в SQLite-хранилище.
+
+Использование:
+    python migrate_to_sqlite.py [data.json] [data.db]
+
+После импорта включите бэкенд в .env: STORAGE_BACKEND=sqlite
+"""
+
+import sys
+
+from app.services.storage_backends import import_json_file
+
+
+def main():
+    json_path = sys.argv[1] if len(sys.argv) > 1 else 'data.json'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'data.db'
+    
+    print(f"📦 Импорт {json_path} -> {db_path}...")
+    try:
+        counts = import_json_file(json_path, db_path)
+    except FileNotFoundError:
+        print(f"❌ Файл {json_path} не найден")
+        sys.exit(1)
+    
+    print(f"✅ Импортировано: пользователей {counts['users']}, команд {counts['teams']}, "
+          f"в очереди {counts['queue']}, вопросов {counts['questions']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -269,6 +269,23 @@ class MonitoringDashboard:
                 </div>
             </div>
             
+            <!-- Хранилище -->
+            <div class="card">
+                <div class="card-title">🗄️ Хранилище</div>
+                <div class="metric">
+                    <span class="metric-label">В очереди:</span>
+                    <span class="metric-value">{{ storage_stats.queue_size or 0 }}</span>
+                </div>
+                <div class="metric">
+                    <span class="metric-label">Активных команд:</span>
+                    <span class="metric-value">{{ storage_stats.active_teams or 0 }}</span>
+                </div>
+                <div class="metric">
+                    <span class="metric-label">Пользователей:</span>
+                    <span class="metric-value">{{ storage_stats.users_total or 0 }}</span>
+                </div>
+            </div>
+            
             <!-- Системные ресурсы -->
             <div class="card">
                 <div class="card-title">💻 Система</div>
@@ -393,6 +410,7 @@ class MonitoringDashboard:
             metrics = self.get_current_metrics()
             health_data = self.get_health_data()
             system_info = self.get_system_info()
+            storage_stats = self.get_storage_stats()
             logs = self.get_recent_logs()
             
             # Время работы
@@ -407,6 +425,7 @@ class MonitoringDashboard:
                 'overall_status': health_data.get('overall_status', 'unknown'),
                 'last_check': datetime.now().strftime('%H:%M:%S'),
                 'system_info': system_info,
+                'storage_stats': storage_stats,
                 'uptime': uptime,
                 'logs': logs
             }
@@ -418,6 +437,7 @@ class MonitoringDashboard:
                 'overall_status': 'unknown',
                 'last_check': 'Error',
                 'system_info': {},
+                'storage_stats': {},
                 'uptime': 'N/A',
                 'logs': f'Ошибка загрузки логов: {str(e)}'
             }
@@ -510,6 +530,15 @@ class MonitoringDashboard:
             logger.error(f"Ошибка получения системной информации: {e}")
             return {}
     
+    def get_storage_stats(self):
+        """Получает агрегаты хранилища (очередь, команды, пользователи)."""
+        try:
+            from app.services.storage import Storage
+            return Storage().get_stats()
+        except Exception as e:
+            logger.error(f"Ошибка получения статистики хранилища: {e}")
+            return {}
+    
     def get_recent_logs(self, lines=50):
         """Получает последние строки из логов."""
         try:
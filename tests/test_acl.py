@@ -0,0 +1,53 @@
+"""
+Unit-тесты для проверки прав админа.
+"""
+
+import pytest
+from app.services.acl import AdminACL
+from app.services.storage import Storage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Отдельное хранилище."""
+    return Storage(str(tmp_path / 'data.json'))
+
+
+class TestAdminACL:
+    """Тесты для AdminACL."""
+
+    def test_env_whitelist_parsed_once(self, storage, monkeypatch):
+        monkeypatch.setenv('ADMINS', '1, 2')
+        acl = AdminACL(storage)
+        monkeypatch.setenv('ADMINS', '3')
+        assert acl.is_admin(1) and acl.is_admin(2)
+        assert not acl.is_admin(3)
+
+    def test_cached_between_checks(self, storage, monkeypatch):
+        acl = AdminACL(storage, ttl=60)
+        storage.set_admin(5)
+        assert acl.is_admin(5)
+
+        monkeypatch.setattr(storage, 'get_admin_ids', lambda: pytest.fail('storage read per check'))
+        assert acl.is_admin(5)
+        assert not acl.is_admin(6)
+
+    def test_set_admin_invalidates(self, storage):
+        acl = AdminACL(storage, ttl=60)
+        assert not acl.is_admin(5)
+        storage.set_admin(5)
+        assert acl.is_admin(5)
+        storage.set_admin(5, False)
+        assert not acl.is_admin(5)
+
+    def test_ttl_picks_up_external_changes(self, storage):
+        """Изменения из другого процесса видны после истечения ttl."""
+        acl = AdminACL(storage, ttl=0)
+        assert not acl.is_admin(5)
+        with storage.transaction() as store:
+            store['admins']['5'] = True
+        assert acl.is_admin(5)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
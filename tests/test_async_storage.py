@@ -0,0 +1,56 @@
+"""
+Unit-тесты для асинхронного фасада хранилища.
+"""
+
+import asyncio
+import inspect
+import threading
+
+import pytest
+from app.services.async_storage import AsyncStorage
+from app.services.storage import Storage
+
+
+@pytest.fixture
+def async_storage(tmp_path):
+    """AsyncStorage над отдельным файлом хранилища."""
+    return AsyncStorage(str(tmp_path / 'data.json'))
+
+
+class TestAsyncStorage:
+    """Тесты для AsyncStorage."""
+
+    def test_has_all_public_methods(self):
+        """У каждого публичного метода Storage есть awaitable-версия."""
+        for name in ('get_user', 'enqueue', 'get_queue_size', 'update_user', 'create_teams'):
+            assert inspect.iscoroutinefunction(getattr(AsyncStorage, name))
+        assert AsyncStorage.get_user.__doc__ == Storage.get_user.__doc__
+
+    @pytest.mark.asyncio
+    async def test_calls_run_off_event_loop(self, async_storage):
+        """Методы выполняются в потоке-писателе, а не в потоке цикла событий."""
+        seen = []
+        await async_storage.run(lambda: seen.append(threading.current_thread().name))
+        assert seen[0].startswith('storage-writer')
+        assert threading.current_thread().name not in seen
+
+    @pytest.mark.asyncio
+    async def test_round_trip(self, async_storage):
+        """Изменения через фасад видны синхронному Storage."""
+        await async_storage.update_user(1, full_name='Иван Иванов')
+        await asyncio.gather(*(async_storage.enqueue(tg_id) for tg_id in range(1, 6)))
+
+        assert await async_storage.get_queue_size() == 5
+        assert async_storage.storage.get_user(1)['full_name'] == 'Иван Иванов'
+        # Вызовы выполняются в порядке поступления
+        assert async_storage.storage.load()['queue'] == ['1', '2', '3', '4', '5']
+
+    @pytest.mark.asyncio
+    async def test_writer_shared_per_store(self, async_storage):
+        """Экземпляры над одним хранилищем используют один поток-писатель."""
+        other = AsyncStorage(async_storage.storage.file_path)
+        assert other._executor is async_storage._executor
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
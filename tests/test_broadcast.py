@@ -0,0 +1,202 @@
+"""
+Unit-тесты для движка рассылок.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+)
+from aiogram.methods import SendMessage
+
+from app.middlewares.unreachable import UnreachableResetMiddleware
+from app.services.broadcast import (
+    BLOCKED, FAILED, NOT_FOUND, SENT, UNREACHABLE, BroadcastEngine, TokenBucket
+)
+from app.services.storage import Storage
+
+METHOD = SendMessage(chat_id=1, text='')
+
+
+class FakeBot:
+    """Бот, имитирующий задержку сети и заданные ошибки."""
+
+    def __init__(self, errors=None, latency=0.01):
+        # chat_id -> список исключений, выдаваемых по очереди перед успехом
+        self.errors = {str(chat_id): list(items) for chat_id, items in (errors or {}).items()}
+        self.latency = latency
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            pending = self.errors.get(str(chat_id))
+            if pending:
+                raise pending.pop(0)
+            self.sent.append((chat_id, text, kwargs))
+        finally:
+            self.in_flight -= 1
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestTokenBucket:
+    """Тесты для корзины токенов."""
+
+    def test_rate_limit(self):
+        async def scenario():
+            bucket = TokenBucket(rate=100, capacity=10)
+            started = time.monotonic()
+            for _ in range(30):
+                await bucket.acquire()
+            return time.monotonic() - started
+
+        # 10 токенов сразу, еще 20 - со скоростью 100 в секунду
+        assert 0.15 <= run(scenario()) < 0.5
+
+    def test_pause(self):
+        async def scenario():
+            bucket = TokenBucket(rate=1000)
+            bucket.pause(0.1)
+            started = time.monotonic()
+            await bucket.acquire()
+            return time.monotonic() - started
+
+        assert run(scenario()) >= 0.09
+
+
+class TestBroadcastEngine:
+    """Тесты для BroadcastEngine."""
+
+    def test_parallel_and_bounded(self):
+        """Отправка идет параллельно, но не больше concurrency запросов сразу."""
+        bot = FakeBot(latency=0.02)
+        engine = BroadcastEngine(bot, rate=1000, concurrency=10, per_chat_interval=0)
+        started = time.monotonic()
+        result = run(engine.broadcast(range(100), 'Привет'))
+        elapsed = time.monotonic() - started
+
+        assert result.sent == 100
+        assert bot.max_in_flight == 10
+        # Последовательно это заняло бы 2 секунды
+        assert elapsed < 1.0
+
+    def test_duplicates_skipped(self):
+        bot = FakeBot(latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0)
+        result = run(engine.broadcast([1, '1', 2, 2], 'Привет'))
+        assert result.sent == 2
+
+    def test_retry_after_is_honored(self):
+        """RetryAfter приостанавливает отправку, затем сообщение доставляется."""
+        bot = FakeBot(errors={1: [TelegramRetryAfter(METHOD, 'Flood control', 0)]}, latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0)
+        result = run(engine.broadcast([1, 2], 'Привет'))
+        assert result.sent == 2
+        assert result.failed == 0
+
+    def test_transient_errors_retried(self):
+        bot = FakeBot(errors={1: [TelegramNetworkError(METHOD, 'timeout')] * 2}, latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0, max_retries=3, backoff=0.001)
+        assert run(engine.send(1, 'Привет')).status == SENT
+
+    def test_transient_errors_give_up(self):
+        bot = FakeBot(errors={1: [TelegramNetworkError(METHOD, 'timeout')] * 5}, latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0, max_retries=2, backoff=0.001)
+        assert run(engine.send(1, 'Привет')).status == FAILED
+
+    def test_unreachable(self):
+        bot = FakeBot(errors={
+            1: [TelegramForbiddenError(METHOD, 'Forbidden: bot was blocked by the user')],
+            2: [TelegramBadRequest(METHOD, 'Bad Request: chat not found')],
+            3: [TelegramBadRequest(METHOD, 'Bad Request: message is too long')],
+        }, latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0)
+        deliveries = []
+        result = run(engine.broadcast([1, 2, 3, 4], 'Привет', on_delivery=deliveries.append))
+
+        assert (result.sent, result.failed, result.unreachable) == (1, 1, 2)
+        statuses = {delivery.chat_id: delivery.status for delivery in deliveries}
+        assert statuses == {1: UNREACHABLE, 2: UNREACHABLE, 3: FAILED, 4: SENT}
+
+    def test_per_chat_interval(self):
+        """Сообщения в один чат идут не чаще per_chat_interval."""
+        bot = FakeBot(latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0.05)
+
+        async def scenario():
+            started = time.monotonic()
+            await asyncio.gather(*(engine.send(1, f'#{n}') for n in range(3)))
+            return time.monotonic() - started
+
+        assert run(scenario()) >= 0.09
+        assert len(bot.sent) == 3
+
+
+class TestUnreachableRegistry:
+    """Тесты для реестра недоступных получателей."""
+
+    @pytest.fixture
+    def storage(self, tmp_path):
+        return Storage(str(tmp_path / 'data.json'))
+
+    def test_marked_and_skipped(self, storage):
+        bot = FakeBot(errors={
+            1: [TelegramForbiddenError(METHOD, 'Forbidden: bot was blocked by the user')],
+            2: [TelegramBadRequest(METHOD, 'Bad Request: chat not found')],
+        }, latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0, storage=storage)
+        run(engine.broadcast([1, 2, 3], 'Привет'))
+
+        assert storage.get_unreachable(1)['reason'] == BLOCKED
+        assert storage.get_unreachable(2)['reason'] == NOT_FOUND
+        assert storage.get_unreachable_stats() == {BLOCKED: 1, NOT_FOUND: 1}
+
+        # Следующие рассылки и одиночные отправки им не пишут, но учитывают их
+        bot.sent.clear()
+        result = run(engine.broadcast([1, 2, 3], 'Еще раз'))
+        assert (result.sent, result.unreachable) == (1, 2)
+        assert run(engine.send(1, 'Привет')).status == UNREACHABLE
+        assert [chat_id for chat_id, _, _ in bot.sent] == [3]
+
+    def test_service_and_group_chats_not_registered(self, storage, monkeypatch):
+        """Группы и служебные чаты не попадают в реестр и не пропускаются."""
+        monkeypatch.setenv('MOD_CHAT_ID', '555')
+        monkeypatch.setenv('ADMINS', '7, 8')
+        not_found = [TelegramBadRequest(METHOD, 'Bad Request: chat not found')]
+        bot = FakeBot(errors={-100123: list(not_found), 555: list(not_found), 7: list(not_found)}, latency=0)
+        engine = BroadcastEngine(bot, rate=1000, per_chat_interval=0, storage=storage)
+        run(engine.broadcast([-100123, 555, 7, '@channel'], 'Привет'))
+
+        assert storage.get_unreachable_ids() == set()
+        # Запись, оставшаяся от прежних версий, не мешает доставке в чат модераторов
+        storage.mark_unreachable({'555': (NOT_FOUND, 'Bad Request: chat not found')})
+        assert run(engine.send(555, 'Вопрос')).status == SENT
+
+    def test_cleared_when_user_writes(self, storage):
+        storage.mark_unreachable({'1': (BLOCKED, 'Forbidden: bot was blocked by the user')})
+        middleware = UnreachableResetMiddleware(storage)
+        handled = []
+
+        async def handler(event, data):
+            handled.append(event)
+
+        event = SimpleNamespace(from_user=SimpleNamespace(id=1))
+        run(middleware(handler, event, {}))
+
+        assert handled == [event]
+        assert not storage.is_unreachable(1)
+        assert storage.get_unreachable_stats() == {}
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,271 @@
+"""
+Unit-тесты для заданий рассылок.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from app.services.broadcast import FAILED, SENT, UNREACHABLE, BroadcastEngine
+from app.services.broadcast_jobs import BroadcastJobManager, format_progress
+from app.services.storage import Storage
+
+METHOD = SendMessage(chat_id=1, text='')
+
+
+class FakeBot:
+    """Бот, запоминающий отправленные и отредактированные сообщения."""
+
+    def __init__(self, errors=None, latency=0.0):
+        self.errors = {str(chat_id): error for chat_id, error in (errors or {}).items()}
+        self.latency = latency
+        self.sent = []
+        self.edits = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        if str(chat_id) in self.errors:
+            raise self.errors[str(chat_id)]
+        self.sent.append((str(chat_id), text, kwargs))
+        return SimpleNamespace(message_id=len(self.sent))
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        self.edits.append((chat_id, message_id, text))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Отдельное хранилище."""
+    return Storage(str(tmp_path / 'data.json'))
+
+
+def make_manager(bot, storage, progress_interval=60):
+    """Менеджер с быстрым движком (без пауз между сообщениями)."""
+    BroadcastEngine._engines[bot] = BroadcastEngine(bot, rate=10000, concurrency=5, per_chat_interval=0)
+    return BroadcastJobManager(bot, storage, progress_interval=progress_interval)
+
+
+def run_job(manager, job_id):
+    async def scenario():
+        await manager.submit(job_id)
+    asyncio.run(scenario())
+
+
+class TestBroadcastProgress:
+    """Тесты для учета прогресса задания в хранилище."""
+
+    def test_cursor_counts_processed_prefix(self, storage):
+        job_id = storage.create_broadcast('message', [1, 2, 3, 4, 2], text='hi')
+        assert storage.get_broadcast(job_id)['recipients'] == ['1', '2', '3', '4']
+
+        # Получатели завершаются не по порядку: курсор стоит на первом необработанном
+        job = storage.record_broadcast_progress(job_id, {'2': SENT, '3': UNREACHABLE})
+        assert job['cursor'] == 0
+        job = storage.record_broadcast_progress(job_id, {'1': SENT})
+        assert job['cursor'] == 3
+        assert (job['sent'], job['failed'], job['unreachable']) == (2, 0, 1)
+
+        # Повторная запись итога не увеличивает счетчики
+        job = storage.record_broadcast_progress(job_id, {'1': SENT, '4': FAILED}, finished=True)
+        assert (job['sent'], job['failed'], job['unreachable']) == (2, 1, 1)
+        assert job['cursor'] == 4
+        assert job['status'] == 'done'
+        assert storage.get_unfinished_broadcasts() == []
+
+    @pytest.mark.parametrize('backend', ['json', 'journal', 'shards', 'sqlite'])
+    def test_persisted_by_backends(self, tmp_path, monkeypatch, backend):
+        """Задания и их прогресс сохраняются всеми бэкендами."""
+        monkeypatch.setenv('STORAGE_BACKEND', backend)
+        storage = Storage(str(tmp_path / 'data.json'))
+        job_id = storage.create_broadcast('message', [1, 2], text='hi')
+        storage.record_broadcast_progress(job_id, {'1': SENT})
+
+        job = storage.backend.read()['broadcasts'][job_id]
+        assert job['results'] == {'1': SENT}
+        assert job['cursor'] == 1
+
+
+class TestBroadcastJobManager:
+    """Тесты для выполнения заданий."""
+
+    def test_message_job(self, storage):
+        bot = FakeBot(errors={3: TelegramForbiddenError(method=METHOD, message='bot was blocked')})
+        manager = make_manager(bot, storage)
+        job_id = manager.create_message_job([1, 2, 3], 'Привет', title='ожидающим',
+                                            report_chat_id=100, report_message_id=7)
+        run_job(manager, job_id)
+
+        job = storage.get_broadcast(job_id)
+        assert job['status'] == 'done'
+        assert job['results'] == {'1': SENT, '2': SENT, '3': UNREACHABLE}
+        assert sorted(chat_id for chat_id, _, _ in bot.sent) == ['1', '2']
+
+        # Прогресс показывается в сообщении администратора, итог - последней правкой
+        chat_id, message_id, text = bot.edits[-1]
+        assert (chat_id, message_id) == (100, 7)
+        assert text == format_progress(job)
+        assert 'завершена' in text
+
+    def test_report_message_created(self, storage):
+        bot = FakeBot()
+        manager = make_manager(bot, storage)
+        job_id = manager.create_message_job([1], 'Привет', report_chat_id=100)
+        run_job(manager, job_id)
+
+        # Сообщение с прогрессом отправлено один раз, дальше оно редактируется
+        assert [chat_id for chat_id, _, _ in bot.sent] == ['100', '1']
+        assert storage.get_broadcast(job_id)['report_message_id'] == 1
+        assert bot.edits and all(message_id == 1 for _, message_id, _ in bot.edits)
+
+    def test_resume_skips_delivered(self, storage):
+        """После перезапуска отправляются только получатели без итога."""
+        job_id = storage.create_broadcast('message', [1, 2, 3, 4], text='hi')
+        storage.record_broadcast_progress(job_id, {'1': SENT, '3': SENT})
+
+        bot = FakeBot()
+        manager = make_manager(bot, storage)
+
+        async def scenario():
+            assert manager.resume() == [job_id]
+            await manager.submit(job_id)
+
+        asyncio.run(scenario())
+        assert sorted(chat_id for chat_id, _, _ in bot.sent) == ['2', '4']
+        job = storage.get_broadcast(job_id)
+        assert job['status'] == 'done'
+        assert job['sent'] == 4
+
+    def test_stop_keeps_progress(self, storage):
+        """Остановка сохраняет итоги уже отправленных, продолжение досылает остальным."""
+        bot = FakeBot(latency=0.02)
+        manager = make_manager(bot, storage)
+        BroadcastEngine._engines[bot].concurrency = 1
+        job_id = manager.create_message_job(list(range(1, 21)), 'hi')
+
+        async def interrupted():
+            task = manager.submit(job_id)
+            await asyncio.sleep(0.15)
+            await manager.stop()
+            assert task.cancelled()
+
+        asyncio.run(interrupted())
+        job = storage.get_broadcast(job_id)
+        delivered = len(bot.sent)
+        assert job['status'] == 'running'
+        assert 0 < job['sent'] == delivered < 20
+
+        run_job(manager, job_id)
+        assert sorted(int(chat_id) for chat_id, _, _ in bot.sent) == list(range(1, 21))
+        assert storage.get_broadcast(job_id)['status'] == 'done'
+
+    def test_failing_job_stops_after_max_attempts(self, storage, monkeypatch):
+        """Задание с постоянной ошибкой помечается failed, и администратор получает отчет."""
+        bot = FakeBot()
+        manager = make_manager(bot, storage)
+        manager.max_attempts = 2
+        job_id = manager.create_message_job([1, 2], 'hi', report_chat_id=100, report_message_id=7)
+
+        async def broken_send(job, on_delivery):
+            raise RuntimeError('нет шаблона')
+
+        monkeypatch.setattr(manager, '_send', broken_send)
+
+        async def scenario():
+            for _ in range(3):
+                manager.resume()
+                await manager.join()
+
+        asyncio.run(scenario())
+        job = storage.get_broadcast(job_id)
+        assert job['status'] == 'failed'
+        assert job['attempts'] == 2
+        assert 'нет шаблона' in job['error']
+        assert storage.get_unfinished_broadcasts() == []
+        assert 'остановлена' in bot.edits[-1][2]
+
+    def test_team_cards_job(self, storage):
+        for tg_id in range(1, 6):
+            storage.enqueue(tg_id)
+        team_id = storage.create_team(['1', '2', '3', '4', '5'])
+
+        bot = FakeBot()
+        manager = make_manager(bot, storage)
+        job_id = manager.create_team_cards_job([team_id])
+        # Участник ушел из команды до отправки карточек
+        storage.remove_from_team(team_id, 5)
+        run_job(manager, job_id)
+
+        assert sorted(chat_id for chat_id, _, _ in bot.sent) == ['1', '2', '3', '4']
+        assert all('reply_markup' in kwargs for _, _, kwargs in bot.sent)
+        job = storage.get_broadcast(job_id)
+        assert job['results']['5'] == FAILED
+        assert job['status'] == 'done'
+
+    def test_cards_rendered_from_one_snapshot(self, storage, monkeypatch):
+        """Карточки всех команд строятся одним чтением пользователей, текст - один на команду."""
+        for tg_id in range(1, 7):
+            storage.update_user(tg_id, full_name=f'Участник {tg_id}', telegram_link=f'@u{tg_id}')
+        teams = [storage.create_team(['1', '2', '3']), storage.create_team(['4', '5', '6'])]
+
+        bot = FakeBot()
+        manager = make_manager(bot, storage)
+        job_id = manager.create_team_cards_job(teams)
+        monkeypatch.setattr(storage, 'get_user', lambda tg_id: pytest.fail('get_user per member'))
+        run_job(manager, job_id)
+
+        texts = {chat_id: text for chat_id, text, _ in bot.sent}
+        assert texts['1'] == texts['2'] == texts['3'] != texts['4']
+        assert 'Участник 1, @u1 (модератор)' in texts['1']
+        assert 'Участник 6, @u6' in texts['4']
+
+
+class TestTeamCardsOutbox:
+    """Тесты для задания карточек, записываемого вместе с командами."""
+
+    def test_written_with_teams(self, storage):
+        for tg_id in range(1, 4):
+            storage.enqueue(tg_id)
+        created = storage.create_teams([['1', '2', '3']], notify=True, report_chat_id=100)
+
+        jobs = storage.get_unfinished_broadcasts()
+        assert len(jobs) == 1
+        assert jobs[0]['team_ids'] == created
+        assert jobs[0]['recipients'] == ['1', '2', '3']
+        assert jobs[0]['report_chat_id'] == 100
+
+    def test_rolled_back_with_teams(self, storage):
+        """Задание не остается без команд и команды не остаются без задания."""
+        storage.enqueue(1)
+        with pytest.raises(RuntimeError):
+            with storage.transaction():
+                storage.create_teams([['1']], notify=True)
+                raise RuntimeError('сбой до фиксации')
+
+        assert storage.get_unfinished_broadcasts() == []
+        assert storage.get_team('C-1') is None
+
+    def test_drained_once(self, storage):
+        for tg_id in range(1, 4):
+            storage.enqueue(tg_id)
+        storage.create_teams([['1', '2', '3']], notify=True)
+
+        bot = FakeBot(latency=0.01)
+        manager = make_manager(bot, storage)
+
+        async def scenario():
+            first = manager.resume()
+            # Выполняемое задание повторно не запускается
+            assert manager.resume() == []
+            await manager.join()
+            return first
+
+        assert len(asyncio.run(scenario())) == 1
+        assert sorted(chat_id for chat_id, _, _ in bot.sent) == ['1', '2', '3']
+        assert storage.get_unfinished_broadcasts() == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
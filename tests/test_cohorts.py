@@ -0,0 +1,175 @@
+"""
+Unit-тесты для когорт.
+"""
+
+import asyncio
+
+import pytest
+from app.services.cohorts import get_cohort, load_cohorts, queue_key
+from app.services.matching_strategies import FifoMatcher
+from app.services.scheduler import MatchScheduler
+from app.services.storage import Storage
+
+
+@pytest.fixture
+def cohorts_env(monkeypatch):
+    """Общая очередь 5+2 и когорты hack (3+1) и art (размеры по умолчанию)."""
+    monkeypatch.setenv('TEAM_BASE', '5')
+    monkeypatch.setenv('ELASTIC_MAX', '2')
+    monkeypatch.setenv('COHORTS', 'hack:3:1, art')
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Отдельное хранилище."""
+    return Storage(str(tmp_path / 'data.json'))
+
+
+class TestLoadCohorts:
+    """Тесты для настройки когорт."""
+
+    def test_parse(self, cohorts_env):
+        cohorts = load_cohorts()
+        assert list(cohorts) == ['', 'hack', 'art']
+        assert cohorts['hack'].team_base == 3
+        assert cohorts['hack'].elastic_max == 1
+        assert cohorts['art'].team_base == 5
+
+    def test_unknown_and_default(self, cohorts_env):
+        assert get_cohort('') == get_cohort(None)
+        assert get_cohort('HACK').id == 'hack'
+        assert get_cohort('chess') is None
+
+    def test_invalid_id(self, monkeypatch):
+        monkeypatch.setenv('COHORTS', '../etc:3:1')
+        with pytest.raises(ValueError):
+            load_cohorts()
+
+
+class TestCohortStorage:
+    """Тесты для очередей и команд когорт."""
+
+    def test_separate_queues(self, storage):
+        """Пользователь встает в очередь своей когорты и уходит из нее."""
+        storage.update_user(1, full_name='Анна', cohort='hack')
+        storage.update_user(2, full_name='Иван')
+        storage.enqueue(1)
+        storage.enqueue(2)
+
+        assert storage.get_queue_size() == 1
+        assert storage.get_queue_size('hack') == 1
+        assert storage.get_queue_position(1) == 0
+        assert storage.remove_from_queue(1) is True
+        assert storage.get_queue_size('hack') == 0
+        assert storage.load()['queue'] == ['2']
+
+    def test_team_sequence_per_cohort(self, storage):
+        """Нумерация команд у каждой когорты своя."""
+        for tg_id in range(1, 7):
+            storage.enqueue(tg_id, cohort='hack')
+        storage.enqueue(7)
+
+        created, remaining = storage.match_teams(FifoMatcher(), base=3, elastic=0, cohort='hack')
+
+        assert created == ['C-hack-1', 'C-hack-2']
+        assert remaining == []
+        assert storage.get_team('C-hack-1')['cohort'] == 'hack'
+        assert storage.create_team([7]) == 'C-1'
+
+    def test_commit_skips_departed(self, storage):
+        """Раунд, посчитанный вне транзакции, не создает команды с ушедшими участниками."""
+        for tg_id in range(1, 7):
+            storage.enqueue(tg_id, cohort='hack')
+        head, users = storage.get_match_input('hack')
+        teams, _ = FifoMatcher().match(head, users, 3, 0)
+        storage.remove_from_queue(5, cohort='hack')
+
+        assert storage.commit_match(teams, 'hack') == ['C-hack-1']
+        assert storage.load()[queue_key('hack')] == ['4', '6']
+
+    def test_enqueue_front_creates_cohort_queue(self, storage):
+        """Возврат в начало еще не созданной очереди когорты проходит через enqueue."""
+        storage.update_user(1, full_name='Анна')
+        storage.update_user(2, full_name='Иван')
+        storage.enqueue(3, cohort='art')
+        for tg_id in (2, 1):
+            storage.enqueue(tg_id, cohort='art', front=True)
+
+        assert storage.load()[queue_key('art')] == ['1', '2', '3']
+        assert storage.get_user(1)['cohort'] == 'art'
+        assert storage.get_user(1)['queued_at']
+
+    def test_queue_sizes_cover_all_cohorts(self, storage):
+        """Позиция и размер очереди берутся из одной очереди, агрегаты считают все очереди."""
+        storage.update_user(1, username='anna', cohort='hack')
+        for tg_id in range(2, 5):
+            storage.enqueue(tg_id)
+        storage.enqueue(1)
+
+        snapshot = storage.get_user_snapshot(1)
+        assert (snapshot['queue_position'], snapshot['queue_size']) == (0, 1)
+        assert storage.get_stats()['queue_size'] == 4
+        assert storage.get_queue_sizes() == {'': 3, 'hack': 1}
+        assert storage.get_queue_usernames(cohort='hack') == ['@anna']
+
+    def test_waiting_recipients_from_all_cohorts(self, storage):
+        """Рассылка «Ожидающим» доходит до очередей всех когорт."""
+        from app.services.notify import NotificationService
+
+        storage.enqueue(1)
+        storage.enqueue(2, cohort='hack')
+        storage.enqueue(3, cohort='art')
+
+        service = NotificationService(bot=None, storage=storage)
+        assert service.get_waiting_recipients() == ['1', '3', '2']
+
+    @pytest.mark.parametrize('backend', ['json', 'journal', 'shards', 'sqlite'])
+    def test_persisted_by_backends(self, tmp_path, monkeypatch, backend):
+        """Очереди когорт сохраняются всеми бэкендами."""
+        monkeypatch.setenv('STORAGE_BACKEND', backend)
+        path = str(tmp_path / 'data.json')
+        storage = Storage(path)
+        storage.enqueue(1, cohort='hack')
+        storage.enqueue(2, cohort='hack')
+        storage.remove_from_queue(1, cohort='hack')
+
+        backend_store = storage.backend.read()
+        assert list(backend_store[queue_key('hack')]) == ['2']
+
+
+class TestParallelRounds:
+    """Тесты для параллельных раундов когорт в планировщике."""
+
+    def test_rounds_per_cohort(self, cohorts_env, storage, monkeypatch):
+        """Каждая когорта комплектуется по своим размерам и фиксируется отдельно."""
+        for tg_id in range(1, 5):
+            storage.enqueue(tg_id, cohort='hack')
+        for tg_id in range(11, 16):
+            storage.enqueue(tg_id)
+
+        scheduler = MatchScheduler(None)
+        scheduler.storage = storage
+        scheduler.broadcast_jobs.storage = storage
+        sent = []
+
+        async def send_card(team, members=None, on_delivery=None, text=None):
+            sent.append(team['id'])
+
+        monkeypatch.setattr(scheduler.notify_service, 'send_team_card_to_members', send_card)
+        monkeypatch.delenv('MOD_CHAT_ID', raising=False)
+
+        async def scenario():
+            await scheduler._perform_auto_match()
+            # Карточки рассылаются в фоне из outbox
+            await scheduler.broadcast_jobs.join()
+
+        asyncio.run(scenario())
+
+        assert sorted(sent) == ['C-1', 'C-hack-1']
+        assert storage.get_team('C-hack-1')['members'] == ['1', '2', '3', '4']
+        assert storage.get_queue_size() == 0
+        assert storage.get_queue_size('art') == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
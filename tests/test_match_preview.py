@@ -0,0 +1,88 @@
+"""
+Unit-тесты для предпросмотра матчинга.
+"""
+
+import pytest
+from app.services.cohorts import Cohort
+from app.services.match_preview import get_match_preview
+from app.services.matching_strategies import FifoMatcher
+from app.services.storage import Storage
+
+
+class CountingMatcher(FifoMatcher):
+    """FifoMatcher, считающий вызовы."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def match(self, queue, users, base=5, elastic=2):
+        self.calls += 1
+        return super().match(queue, users, base, elastic)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Хранилище с 6 ожидающими."""
+    storage = Storage(str(tmp_path / 'data.json'))
+    for tg_id in range(1, 7):
+        storage.update_user(tg_id, full_name=f'Участник {tg_id}', username=f'user{tg_id}')
+        storage.enqueue(tg_id)
+    return storage
+
+
+class TestQueueVersion:
+    """Тесты для версии очереди."""
+
+    def test_bumped_by_queue_changes(self, storage):
+        version = storage.get_queue_version()
+        storage.enqueue(7)
+        assert storage.get_queue_version() == version + 1
+        storage.remove_from_queue(7)
+        assert storage.get_queue_version() == version + 2
+
+    def test_not_bumped_by_other_changes(self, storage):
+        version = storage.get_queue_version()
+        storage.update_user(1, full_name='Другое имя')
+        storage.enqueue(1)  # уже в очереди
+        assert storage.get_queue_version() == version
+
+    def test_per_cohort(self, storage):
+        version = storage.get_queue_version()
+        storage.enqueue(8, cohort='hack')
+        assert storage.get_queue_version('hack') == 1
+        assert storage.get_queue_version() == version
+
+
+class TestMatchPreview:
+    """Тесты для get_match_preview."""
+
+    def test_preview_text(self, storage):
+        text = get_match_preview(storage, Cohort('', 5, 2), FifoMatcher())
+        assert 'Будет сформировано команд: 1' in text
+        assert '👑 Участник 1 (@user1)' in text
+        assert 'Участник 6 (@user6)' in text
+
+    def test_cached_until_queue_changes(self, storage):
+        matcher = CountingMatcher()
+        cohort = Cohort('', 5, 2)
+        first = get_match_preview(storage, cohort, matcher)
+        assert get_match_preview(storage, cohort, matcher) == first
+        assert matcher.calls == 1
+
+        storage.enqueue(7)
+        assert 'Участник' in get_match_preview(storage, cohort, matcher)
+        assert matcher.calls == 2
+
+    def test_preview_does_not_change_store(self, storage):
+        version = storage.get_version()
+        get_match_preview(storage, Cohort('', 5, 2), FifoMatcher())
+        assert storage.get_version() == version
+        assert storage.get_queue_size() == 6
+
+    def test_not_enough_people(self, storage):
+        text = get_match_preview(storage, Cohort('', 7, 0), FifoMatcher())
+        assert 'нужно минимум 7' in text
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -3,7 +3,7 @@ Unit-тесты для модуля matcher.
 """
 
 import pytest
-from app.services.matcher import match_round, validate_team_constraints, get_match_stats
+from app.services.matcher import match_boundaries, match_round, validate_team_constraints, get_match_stats
 
 
 class TestMatchRound:
@@ -89,6 +89,53 @@ class TestMatchRound:
         assert teams[1] == [4, 5, 6]     # точно 3
         assert leftover == []
 
+    def test_leftover_when_elastic_full(self):
+        """Все эластичные места заняты - остаток остается в очереди."""
+        queue = list(range(1, 10))
+        teams, leftover = match_round(queue, base=5, elastic=2)
+        
+        assert teams == [[1, 2, 3, 4, 5, 6, 7]]
+        assert leftover == [8, 9]
+    
+    def test_large_queue(self):
+        """Большая очередь комплектуется без потерь и с сохранением порядка."""
+        queue = list(range(1_000_003))
+        teams, leftover = match_round(queue)
+        
+        assert len(teams) == 200_000
+        assert teams[0] == [0, 1, 2, 3, 4, 1_000_000, 1_000_001]
+        assert teams[1] == [5, 6, 7, 8, 9, 1_000_002]
+        assert teams[2] == [10, 11, 12, 13, 14]
+        assert leftover == []
+        assert queue == list(range(1_000_003))  # исходная очередь не изменена
+
+
+class TestMatchBoundaries:
+    """Тесты для расчета границ команд."""
+    
+    def test_no_teams(self):
+        """Очередь меньше базы - команд нет, остаток с начала."""
+        assert match_boundaries(4) == ([], 0)
+    
+    def test_boundaries(self):
+        """Границы базовой части и эластичных участников."""
+        boundaries, leftover_start = match_boundaries(12, base=5, elastic=2)
+        
+        assert boundaries == [(0, 5, 10, 12), (5, 10, 12, 12)]
+        assert leftover_start == 12
+    
+    @pytest.mark.parametrize('base,elastic', [(5, 2), (3, 1), (4, 0), (2, 3)])
+    def test_parity_with_stats(self, base, elastic):
+        """match_round и get_match_stats согласованы на любых размерах очереди."""
+        for size in range(40):
+            teams, leftover = match_round(list(range(size)), base=base, elastic=elastic)
+            stats = get_match_stats(size, base=base, elastic=elastic)
+            
+            assert stats['teams_count'] == len(teams)
+            assert stats['players_remaining'] == len(leftover)
+            assert sorted(sum(teams, []) + leftover) == list(range(size))
+            assert validate_team_constraints(teams, base=base, elastic=elastic)
+
 
 class TestValidateTeamConstraints:
     """Тесты для функции validate_team_constraints."""
@@ -0,0 +1,165 @@
+"""
+Unit-тесты для стратегий комплектования.
+"""
+
+import random
+
+import pytest
+from app.services.matcher import match_round, validate_team_constraints
+from app.services.matching_strategies import FifoMatcher, Matcher, ScoringMatcher, create_matcher
+from app.services.storage import Storage
+
+
+def make_users(count, seed=1):
+    """Пользователи со случайными атрибутами."""
+    rng = random.Random(seed)
+    return {
+        str(tg_id): {
+            'tg_id': tg_id,
+            'status': 'waiting',
+            'district': rng.choice(['Центральный', 'Северный', 'Южный']),
+            'age_group': rng.choice(['18-25', '26-35', '36+']),
+            'participations': rng.randint(0, 5),
+            'skills': rng.sample(['дизайн', 'код', 'тексты', 'логистика'], 2),
+        }
+        for tg_id in range(1, count + 1)
+    }
+
+
+class TestScoringMatcher:
+    """Тесты для ScoringMatcher."""
+
+    @pytest.mark.parametrize('size', [0, 4, 5, 12, 13, 100, 1003])
+    def test_same_round_as_fifo(self, size):
+        """Те же участники, размеры команд и остаток, что у match_round."""
+        queue = [str(tg_id) for tg_id in range(1, size + 1)]
+        users = make_users(size)
+        fifo_teams, fifo_leftover = match_round(queue)
+        teams, leftover = ScoringMatcher().match(queue, users)
+
+        assert leftover == fifo_leftover
+        assert sorted(map(len, teams)) == sorted(map(len, fifo_teams))
+        assert sorted(sum(teams, [])) == sorted(sum(fifo_teams, []))
+        assert validate_team_constraints(teams)
+
+    def test_captain_waited_longest(self):
+        """Участники команды идут в порядке очереди, капитан - первый."""
+        queue = [str(tg_id) for tg_id in range(1, 101)]
+        teams, _ = ScoringMatcher().match(queue, make_users(100))
+
+        for team in teams:
+            assert team == sorted(team, key=queue.index)
+
+    def test_spreads_attribute_values(self):
+        """Одинаковые участники расходятся по разным командам."""
+        queue = [str(tg_id) for tg_id in range(1, 11)]
+        users = {tg_id: {'district': 'Северный' if int(tg_id) <= 5 else 'Южный'} for tg_id in queue}
+        matcher = ScoringMatcher(['district'])
+        teams, _ = matcher.match(queue, users)
+
+        for team in teams:
+            districts = [users[tg_id]['district'] for tg_id in team]
+            assert districts.count('Северный') in (2, 3)
+        assert matcher.imbalance(teams, users) < matcher.imbalance(FifoMatcher().match(queue, users)[0], users)
+
+    def test_missing_users_and_attributes(self):
+        """Пользователи без атрибутов или без записи не мешают комплектованию."""
+        queue = [str(tg_id) for tg_id in range(1, 8)]
+        users = {'1': {'district': 'Южный', 'skills': []}, '2': {'participations': 3}}
+        teams, leftover = ScoringMatcher().match(queue, users)
+
+        assert sorted(teams[0], key=int) == queue
+        assert leftover == []
+
+    def test_without_attributes_keeps_fifo(self, caplog):
+        """Без атрибутов у участников раунд собирается по очереди с предупреждением."""
+        queue = [str(tg_id) for tg_id in range(1, 13)]
+        users = {tg_id: {'tg_id': int(tg_id), 'full_name': 'Имя'} for tg_id in queue}
+
+        with caplog.at_level('WARNING'):
+            result = ScoringMatcher(['district', 'skills']).match(queue, users)
+
+        assert result == match_round(queue)
+        assert 'fifo' in caplog.text
+
+    def test_newcomers_spread_by_participations(self):
+        """По умолчанию новички (без счетчика участий) и опытные расходятся по командам."""
+        queue = [str(tg_id) for tg_id in range(1, 11)]
+        users = {tg_id: {'participations': 2} for tg_id in queue[5:]}
+        teams, _ = ScoringMatcher().match(queue, users)
+
+        for team in teams:
+            assert sum(1 for tg_id in team if tg_id in users) in (2, 3)
+
+    @pytest.mark.parametrize('seed', range(5))
+    def test_not_worse_than_fifo(self, seed):
+        """Оценка imbalance у результата не хуже, чем у FIFO-раунда."""
+        queue = [str(tg_id) for tg_id in range(1, 48)]
+        users = make_users(47, seed)
+        matcher = ScoringMatcher()
+        teams, _ = matcher.match(queue, users)
+
+        assert matcher.imbalance(teams, users) <= matcher.imbalance(match_round(queue)[0], users)
+
+    def test_large_queue(self):
+        """Большая очередь комплектуется целиком."""
+        queue = [str(tg_id) for tg_id in range(1, 20_001)]
+        teams, leftover = ScoringMatcher().match(queue, make_users(20_000))
+
+        assert len(teams) == 4_000
+        assert leftover == []
+
+
+class TestCreateMatcher:
+    """Тесты для выбора стратегии."""
+
+    def test_matcher_is_abstract(self):
+        with pytest.raises(TypeError):
+            Matcher()
+
+    def test_default_fifo(self, monkeypatch):
+        monkeypatch.delenv('MATCHER', raising=False)
+        assert isinstance(create_matcher(), FifoMatcher)
+
+    def test_scoring_attributes(self, monkeypatch):
+        monkeypatch.setenv('MATCHER', 'scoring')
+        monkeypatch.setenv('MATCH_ATTRIBUTES', 'district, skills')
+        matcher = create_matcher()
+        assert isinstance(matcher, ScoringMatcher)
+        assert matcher.attributes == ('district', 'skills')
+
+
+def test_storage_match_teams(tmp_path):
+    """Storage.match_teams фиксирует команды и не трогает оставшихся в очереди."""
+    storage = Storage(str(tmp_path / 'data.json'))
+    users = make_users(13)
+    with storage.transaction() as store:
+        for tg_id, user in users.items():
+            store['users'][tg_id] = user
+            store['queue'].append(tg_id)
+
+    created, remaining = storage.match_teams(ScoringMatcher(), base=5, elastic=1)
+
+    assert len(created) == 2
+    assert remaining == ['13']
+    assert storage.get_queue_size() == 1
+    assert storage.get_user(13)['status'] == 'waiting'
+    assert storage.get_stats()['users_by_status'] == {'teamed': 12, 'waiting': 1}
+
+
+def test_create_teams_counts_participations(tmp_path):
+    """Попадание в команду увеличивает счетчик участий, по которому балансирует ScoringMatcher."""
+    storage = Storage(str(tmp_path / 'data.json'))
+    for tg_id in range(1, 4):
+        storage.enqueue(tg_id)
+    storage.update_user(2, participations=1)
+
+    storage.create_teams([['1', '2']])
+
+    assert storage.get_user(1)['participations'] == 1
+    assert storage.get_user(2)['participations'] == 2
+    assert storage.load()['queue'] == ['3']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,105 @@
+"""
+Unit-тесты для фонового удаления сообщений.
+"""
+
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import DeleteMessages
+
+from app.services.message_cleanup import DELETE_MESSAGES_LIMIT, DeletionQueue
+from app.services.message_manager import MessageManager
+from app.services.message_store import MessageIdStore
+
+
+class FakeBot:
+    """Бот, запоминающий запросы на удаление."""
+
+    def __init__(self, bulk_fails=False, latency=0.0):
+        self.bulk_fails = bulk_fails
+        self.latency = latency
+        self.bulk = []
+        self.single = []
+
+    async def delete_messages(self, chat_id, message_ids):
+        await asyncio.sleep(self.latency)
+        if self.bulk_fails:
+            raise TelegramBadRequest(method=DeleteMessages(chat_id=chat_id, message_ids=message_ids),
+                                     message='bad request')
+        self.bulk.append((chat_id, list(message_ids)))
+        return True
+
+    async def delete_message(self, chat_id, message_id):
+        if message_id == 13:
+            raise TelegramBadRequest(method=DeleteMessages(chat_id=chat_id, message_ids=[message_id]),
+                                     message='message to delete not found')
+        self.single.append((chat_id, message_id))
+        return True
+
+
+class TestDeletionQueue:
+    """Тесты для DeletionQueue."""
+
+    def test_coalesces_per_chat(self):
+        bot = FakeBot()
+        queue = DeletionQueue(workers=2)
+
+        async def scenario():
+            queue.schedule(bot, 1, [10, 11])
+            queue.schedule(bot, 1, [12, 11])
+            queue.schedule(bot, 2, [20])
+            queue.schedule(bot, 2, [])
+            assert queue.size == 2
+            await queue.join()
+
+        asyncio.run(scenario())
+        assert sorted(bot.bulk) == [(1, [10, 11, 12]), (2, [20])]
+        assert queue.size == 0
+
+    def test_chunks_by_limit(self):
+        bot = FakeBot()
+        queue = DeletionQueue(workers=1)
+
+        async def scenario():
+            queue.schedule(bot, 1, range(DELETE_MESSAGES_LIMIT + 5))
+            await queue.join()
+
+        asyncio.run(scenario())
+        assert [len(ids) for _, ids in bot.bulk] == [DELETE_MESSAGES_LIMIT, 5]
+
+    def test_falls_back_to_single_deletes(self):
+        """Если пакетное удаление не удалось, сообщения удаляются по одному, ошибки не мешают остальным."""
+        bot = FakeBot(bulk_fails=True)
+        queue = DeletionQueue(workers=1)
+
+        async def scenario():
+            queue.schedule(bot, 1, [12, 13, 14])
+            await queue.join()
+
+        asyncio.run(scenario())
+        assert sorted(bot.single) == [(1, 12), (1, 14)]
+
+
+class TestMessageManagerCleanup:
+    """Тесты для удаления предыдущих сообщений в MessageManager."""
+
+    def test_does_not_wait_for_deletes(self, tmp_path):
+        bot = FakeBot(latency=0.05)
+        manager = MessageManager(MessageIdStore(str(tmp_path / 'messages.db')), DeletionQueue(workers=1))
+        for message_id in (1, 2, 3):
+            manager.store_message(7, message_id)
+
+        async def scenario():
+            await manager.delete_previous_messages(bot, 7, 7, exclude_message_id=3)
+            # Обработчик уже продолжил работу, удаление еще выполняется
+            assert bot.bulk == []
+            assert manager.get_user_messages(7) == [3]
+            await manager.deletion_queue.join()
+
+        asyncio.run(scenario())
+        assert bot.bulk == [(7, [1, 2])]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
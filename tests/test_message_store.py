@@ -0,0 +1,137 @@
+"""
+Unit-тесты для хранения ID сообщений бота.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from app.services.message_manager import MessageManager
+from app.services.message_store import MessageIdStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Отдельный файл для каждого теста."""
+    return str(tmp_path / 'messages.db')
+
+
+class TestMessageIdStore:
+    """Тесты для MessageIdStore."""
+
+    def test_flush_persists_batch(self, db_path):
+        store = MessageIdStore(db_path)
+        store.set(1, [10, 11])
+        store.set(2, [20])
+        assert store.flush() == 2
+        assert store.flush() == 0
+
+        reopened = MessageIdStore(db_path)
+        assert reopened.get(1) == [10, 11]
+        assert reopened.get(2) == [20]
+        assert reopened.get(3) == []
+
+    def test_lru_is_bounded(self, db_path):
+        """Кэш держит не больше capacity пользователей, вытесненные читаются снова."""
+        store = MessageIdStore(db_path, capacity=2)
+        for user_id in range(1, 6):
+            store.set(user_id, [user_id * 10])
+        assert len(store._lru) == 2
+
+        # Вытеснен до сброса - значение берется из несохраненных изменений
+        assert store.get(1) == [10]
+        store.flush()
+        for user_id in range(1, 6):
+            assert store.get(user_id) == [user_id * 10]
+        assert len(store._lru) == 2
+
+    def test_flush_does_not_block_cache(self, db_path):
+        """Пока пачка пишется в файл, get()/set() работают, а вытесненные берутся из пачки."""
+        store = MessageIdStore(db_path, capacity=1)
+        store.set(1, [10])
+        store.set(2, [20])
+        conn = store.conn
+        writing, release = threading.Event(), threading.Event()
+
+        class SlowConnection:
+            def __enter__(self):
+                return conn.__enter__()
+
+            def __exit__(self, *exc):
+                return conn.__exit__(*exc)
+
+            def execute(self, *args):
+                return conn.execute(*args)
+
+            def executemany(self, *args):
+                writing.set()
+                release.wait(5)
+                return conn.executemany(*args)
+
+        store._conn = SlowConnection()
+        flusher = threading.Thread(target=store.flush)
+        flusher.start()
+        try:
+            assert writing.wait(5)
+            store.set(3, [30])
+            assert store.get(1) == [10]
+            # Запись еще идет
+            assert flusher.is_alive()
+        finally:
+            release.set()
+            flusher.join()
+
+        store._conn = conn
+        assert store.flush() == 1
+        assert MessageIdStore(db_path).get(1) == [10]
+        assert MessageIdStore(db_path).get(3) == [30]
+
+    def test_returns_copies(self, db_path):
+        store = MessageIdStore(db_path)
+        store.set(1, [10])
+        store.get(1).append(99)
+        assert store.get(1) == [10]
+
+    def test_legacy_import(self, db_path):
+        """При создании файла списки переносятся из Store['user_messages']."""
+        legacy = {'user_messages_1': [5, 6], 'user_messages_2': []}
+        store = MessageIdStore(db_path, legacy_loader=lambda: legacy)
+        assert store.get(1) == [5, 6]
+        assert store.get(2) == []
+
+        # Перенос выполняется только один раз
+        legacy['user_messages_1'] = [7]
+        assert MessageIdStore(db_path, legacy_loader=lambda: legacy).get(1) == [5, 6]
+
+    def test_background_flush_and_stop(self, db_path):
+        store = MessageIdStore(db_path)
+
+        async def scenario():
+            store.start(interval=0.01)
+            store.set(1, [10])
+            await asyncio.sleep(0.05)
+            assert MessageIdStore(db_path).get(1) == [10]
+            store.set(1, [11])
+            store.stop()
+
+        asyncio.run(scenario())
+        assert MessageIdStore(db_path).get(1) == [11]
+
+
+class TestMessageManager:
+    """Тесты для учета сообщений в MessageManager."""
+
+    def test_store_keeps_last_ten(self, db_path):
+        manager = MessageManager(MessageIdStore(db_path))
+        for message_id in range(15):
+            manager.store_message(1, message_id)
+        assert manager.get_user_messages(1) == list(range(5, 15))
+
+        manager._keep_only_message(1, 14)
+        assert manager.get_user_messages(1) == [14]
+        manager.clear_user_messages(1)
+        assert manager.get_user_messages(1) == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
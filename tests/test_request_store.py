@@ -0,0 +1,114 @@
+"""
+Unit-тесты для доступа к хранилищу в пределах обновления.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from app.middlewares.request_store import RequestStoreMiddleware
+from app.services.async_storage import AsyncStorage
+from app.services.request_store import RequestStore
+from app.services.storage import Storage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Отдельное хранилище."""
+    return Storage(str(tmp_path / 'data.json'))
+
+
+def count_calls(monkeypatch, obj, name):
+    """Подменяет метод счетчиком вызовов."""
+    calls = []
+    method = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return method(*args, **kwargs)
+
+    monkeypatch.setattr(obj, name, wrapper)
+    return calls
+
+
+class TestRequestStore:
+    """Тесты для RequestStore."""
+
+    def test_snapshot_read_once(self, storage, monkeypatch):
+        for tg_id in (1, 2):
+            storage.update_user(tg_id, status='waiting')
+            storage.enqueue(tg_id)
+        reads = count_calls(monkeypatch, storage, 'get_user_snapshot')
+        request_store = RequestStore(2, AsyncStorage(storage=storage))
+
+        async def scenario():
+            assert (await request_store.get_user())['status'] == 'waiting'
+            assert await request_store.get_queue_position() == 1
+            assert await request_store.get_queue_size() == 2
+
+        asyncio.run(scenario())
+        assert len(reads) == 1
+
+    def test_unknown_user(self, storage):
+        request_store = RequestStore(5, AsyncStorage(storage=storage))
+
+        async def scenario():
+            assert await request_store.get_user() is None
+            assert await request_store.get_queue_position() == -1
+
+        asyncio.run(scenario())
+
+    def test_writes_committed_in_one_transaction(self, storage, monkeypatch):
+        storage.update_user(1, full_name='Участник')
+        writes = count_calls(monkeypatch, storage.backend, 'write')
+        request_store = RequestStore(1, AsyncStorage(storage=storage))
+
+        async def scenario():
+            assert await request_store.get_queue_position() == -1
+            request_store.write('set_user_status', 1, 'waiting', None)
+            request_store.write('enqueue', 1)
+            assert request_store.pending == 2
+            await request_store.commit()
+            # После фиксации снимок перечитывается
+            assert await request_store.get_queue_position() == 0
+
+        asyncio.run(scenario())
+        assert len(writes) == 1
+        assert storage.get_user(1)['status'] == 'waiting'
+
+    def test_unknown_method_rejected(self, storage):
+        with pytest.raises(AttributeError):
+            RequestStore(1, AsyncStorage(storage=storage)).write('drop_everything')
+
+
+class TestRequestStoreMiddleware:
+    """Тесты для RequestStoreMiddleware."""
+
+    def test_commits_after_handler(self, storage):
+        middleware = RequestStoreMiddleware(AsyncStorage(storage=storage))
+        event = SimpleNamespace(from_user=SimpleNamespace(id=1))
+
+        async def handler(event, data):
+            data['request_store'].write('enqueue', event.from_user.id)
+            # До завершения обработчика ничего не записано
+            assert storage.get_queue_position(1) == -1
+            return 'ok'
+
+        assert asyncio.run(middleware(handler, event, {})) == 'ok'
+        assert storage.get_queue_position(1) == 0
+
+    def test_discards_on_error(self, storage):
+        middleware = RequestStoreMiddleware(AsyncStorage(storage=storage))
+        event = SimpleNamespace(from_user=SimpleNamespace(id=1))
+
+        async def handler(event, data):
+            data['request_store'].write('enqueue', event.from_user.id)
+            raise RuntimeError('сбой обработчика')
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(middleware(handler, event, {}))
+        assert storage.get_queue_position(1) == -1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
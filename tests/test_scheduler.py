@@ -0,0 +1,98 @@
+"""
+Unit-тесты для непрерывного режима планировщика.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from app.services.cohorts import get_cohort
+from app.services.matching_strategies import FifoMatcher
+from app.services.scheduler import MatchScheduler
+from app.services.storage import Storage
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """Планировщик в непрерывном режиме: порог 3 команды, ожидание до 30 минут."""
+    monkeypatch.setenv('MATCH_MODE', 'continuous')
+    monkeypatch.setenv('MATCH_THRESHOLD_TEAMS', '3')
+    monkeypatch.setenv('MATCH_MAX_WAIT_MINUTES', '30')
+    return MatchScheduler(None)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Хранилище с 17 ожидающими пользователями."""
+    storage = Storage(str(tmp_path / 'data.json'))
+    for tg_id in range(1, 18):
+        storage.update_user(tg_id, full_name=f'Участник {tg_id}')
+        storage.enqueue(tg_id)
+    return storage
+
+
+class TestBatchSize:
+    """Тесты для решения о комплектовании партии."""
+
+    def test_too_few(self, scheduler):
+        """Меньше базы - не комплектуем даже после долгого ожидания."""
+        assert scheduler.get_batch_size(4, timedelta(hours=5), 5) == 0
+
+    def test_below_threshold(self, scheduler):
+        """Порог не набран и ждут недолго - рано."""
+        assert scheduler.get_batch_size(14, timedelta(minutes=5), 5) == 0
+
+    def test_threshold_takes_whole_teams(self, scheduler):
+        """По порогу берется целое число базовых команд из начала очереди."""
+        assert scheduler.get_batch_size(15, None, 5) == 15
+        assert scheduler.get_batch_size(17, timedelta(minutes=5), 5) == 15
+
+    def test_max_wait_flushes_queue(self, scheduler):
+        """После максимального ожидания комплектуется вся очередь."""
+        assert scheduler.get_batch_size(7, timedelta(minutes=30), 5) == 7
+
+    def test_unknown_wait_counts_as_exceeded(self, scheduler):
+        """Первый в очереди без queued_at (встал до обновления) не ждет бесконечно."""
+        assert scheduler.get_batch_size(7, None, 5) == 7
+        assert scheduler.get_batch_size(4, None, 5) == 0
+
+    def test_next_match_text(self, scheduler):
+        """Пользователю сообщается порог и максимальное ожидание."""
+        text = scheduler.get_next_match_time_str()
+        assert '15 человек' in text
+        assert '30 мин.' in text
+
+
+class TestMicroBatch:
+    """Тесты для комплектования начала очереди."""
+
+    def test_queue_head_since(self, storage):
+        """Время постановки в очередь первого в ней."""
+        since = storage.get_queue_head_since()
+        assert since is not None
+        assert datetime.now() - since < timedelta(minutes=1)
+
+    def test_match_head_only(self, storage):
+        """Комплектуется только начало очереди, хвост ждет следующей партии."""
+        created, remaining = storage.match_teams(FifoMatcher(), base=5, elastic=2, limit=15)
+
+        assert len(created) == 3
+        assert all(len(storage.get_team(team_id)['members']) == 5 for team_id in created)
+        assert remaining == ['16', '17']
+        assert storage.load()['queue'] == ['16', '17']
+        assert storage.get_user(16)['status'] == 'waiting'
+
+    def test_match_round_off_loop(self, scheduler, storage, monkeypatch):
+        """match_round (им пользуется и /adm_match) комплектует очередь и ставит рассылку карточек."""
+        monkeypatch.delenv('MATCHER', raising=False)
+        scheduler.storage = storage
+
+        created = asyncio.run(scheduler.match_round(get_cohort(''), limit=15, report_chat_id=1))
+
+        assert len(created) == 3
+        assert storage.load()['queue'] == ['16', '17']
+        assert [job['title'] for job in storage.get_unfinished_broadcasts()]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,77 @@
+"""
+Unit-тесты для поискового индекса пользователей.
+"""
+
+import pytest
+from app.services.search_index import UserSearchIndex
+from app.services.storage import Storage
+
+
+@pytest.fixture
+def index():
+    """Индекс с несколькими пользователями."""
+    return UserSearchIndex({
+        '1': {'full_name': 'Иван Иванов', 'username': 'ivan_ivanov'},
+        '2': {'full_name': 'Пётр Петров', 'telegram_link': 'https://t.me/petr_p'},
+        '3': {'full_name': 'Анна Иванова', 'username': 'anna'},
+        '4': {'full_name': 'Елена Козлова'},
+    })
+
+
+class TestUserSearchIndex:
+    """Тесты для UserSearchIndex."""
+
+    def test_substring_case_insensitive(self, index):
+        """Подстрока имени находится без учета регистра."""
+        hits = index.search('ИВАНОВ')
+        assert [hit.tg_id for hit in hits] == ['1', '3']
+        assert all(hit.exact for hit in hits)
+
+    def test_yo_equals_ye(self, index):
+        """Буквы «ё» и «е» не различаются."""
+        assert [hit.tg_id for hit in index.search('петр')] == ['2']
+
+    def test_username_and_link(self, index):
+        """Поиск идет также по username и ссылке на Telegram."""
+        assert [hit.tg_id for hit in index.search('@anna')] == ['3']
+        assert [hit.tg_id for hit in index.search('petr_p')] == ['2']
+
+    def test_typo_gives_fuzzy_results(self, index):
+        """При опечатке возвращаются похожие записи без признака точности."""
+        hits = index.search('Казлова')
+        assert [hit.tg_id for hit in hits] == ['4']
+        assert not hits[0].exact
+
+    def test_short_query_matches_inside_word(self, index):
+        """Короткий запрос находит подстроку и внутри слова, как прежний линейный поиск."""
+        assert {hit.tg_id for hit in index.search('ан')} == {'1', '3'}
+        assert {hit.tg_id for hit in index.search('ов')} == {'1', '2', '3', '4'}
+        assert {hit.tg_id for hit in index.search('_p')} == {'2'}
+
+    def test_update_and_remove(self, index):
+        """Переиндексация и удаление пользователя отражаются в поиске."""
+        index.update('4', {'full_name': 'Елена Смирнова'})
+        index.remove('1')
+        assert [hit.tg_id for hit in index.search('смирнова')] == ['4']
+        assert [hit.tg_id for hit in index.search('Иванов')] == ['3']
+
+
+class TestStorageSearch:
+    """Тесты для Storage.search_users."""
+
+    def test_index_follows_update_user(self, tmp_path):
+        """Изменения пользователей после построения индекса видны в поиске."""
+        storage = Storage(str(tmp_path / 'data.json'))
+        storage.update_user(1, full_name='Иван Иванов')
+        assert [hit.tg_id for hit, _ in storage.search_users('иванов')] == ['1']
+
+        storage.update_user(1, full_name='Иван Смирнов')
+        storage.update_user(2, full_name='Мария Иванова', username='masha')
+
+        results = storage.search_users('иванов')
+        assert [(hit.tg_id, user['username']) for hit, user in results] == [('2', 'masha')]
+        assert [hit.tg_id for hit, _ in storage.search_users('смирнов')] == ['1']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
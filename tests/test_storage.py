@@ -0,0 +1,645 @@
+"""
+Unit-тесты для модуля storage.
+"""
+
+import json
+import multiprocessing
+import os
+
+import pytest
+from app.services.aggregates import compute_stats
+from app.services.storage import Storage, StoreConflictError, StoreCorruptedError, TransactionAbortedError
+from app.services.util import FileLock
+from app.services.storage_backends import (
+    JournalBackend, ShardedBackend, SqliteBackend, import_json_file
+)
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    """Путь к отдельному файлу хранилища для каждого теста."""
+    return str(tmp_path / 'data.json')
+
+
+class TestStoreCache:
+    """Тесты для кэширования Store в памяти процесса."""
+
+    def test_instances_share_cache(self, data_path):
+        """Изменения через один экземпляр видны другому без перечитывания."""
+        first = Storage(data_path)
+        second = Storage(data_path)
+        first.enqueue(1)
+        assert second.get_queue_position(1) == 0
+        assert first._read() is second._read()
+
+    def test_external_change_is_detected(self, data_path):
+        """Файл, переписанный другим процессом, перечитывается."""
+        storage = Storage(data_path)
+        storage.enqueue(1)
+
+        with open(data_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['queue'] = ['2', '3']
+        tmp_path = data_path + '.ext'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, data_path)
+
+        assert storage.get_queue_position(1) == -1
+        assert storage.get_queue_position(3) == 1
+
+    def test_construction_skips_file_lock(self, data_path):
+        """Storage() над существующим хранилищем не ждет межпроцессную блокировку."""
+        storage = Storage(data_path)
+        with storage._cache.file_lock:
+            acquired = []
+            storage._cache.file_lock.acquire = lambda *args, **kwargs: acquired.append(1)
+            try:
+                Storage(data_path)
+            finally:
+                del storage._cache.file_lock.acquire
+        assert acquired == []
+
+    def test_load_returns_independent_copy(self, data_path):
+        """Изменение результата load() не влияет на кэш."""
+        storage = Storage(data_path)
+        store = storage.load()
+        store['queue'].append('42')
+        assert storage.get_queue_size() == 0
+
+    def test_save_keeps_cache_consistent(self, data_path):
+        """save() обновляет кэш, а последующие правки вызывающего в него не попадают."""
+        storage = Storage(data_path)
+        store = storage.load()
+        store['queue'].append('7')
+        storage.save(store)
+        store['queue'].append('8')
+        assert storage.get_queue_size() == 1
+
+        with open(data_path, 'r', encoding='utf-8') as f:
+            assert json.load(f)['queue'] == ['7']
+
+    def test_getters_return_copies(self, data_path):
+        """Изменение возвращенного пользователя не меняет хранилище."""
+        storage = Storage(data_path)
+        storage.update_user(5, full_name='Иван Иванов')
+        user = storage.get_user(5)
+        user['full_name'] = 'Другое'
+        assert storage.get_user(5)['full_name'] == 'Иван Иванов'
+
+    def test_get_users_batch(self, data_path):
+        """get_users отдает копии найденных пользователей по строковым ID."""
+        storage = Storage(data_path)
+        storage.update_user(1, full_name='Анна')
+        storage.update_user(2, full_name='Борис')
+        users = storage.get_users([1, '2', 3])
+        assert {tg_id: user['full_name'] for tg_id, user in users.items()} == {'1': 'Анна', '2': 'Борис'}
+        users['1']['full_name'] = 'Другое'
+        assert storage.get_user(1)['full_name'] == 'Анна'
+
+
+    def test_get_active_teams(self, data_path):
+        """get_active_teams отдает копии только активных команд."""
+        storage = Storage(data_path)
+        active = storage.create_team([1, 2])
+        archived = storage.create_team([3])
+        storage.remove_from_team(archived, 3)
+
+        teams = storage.get_active_teams()
+        assert [team['id'] for team in teams] == [active]
+        teams[0]['members'].append(9)
+        assert storage.get_team(active)['members'] == [1, 2]
+
+class TestTransaction:
+    """Тесты для Storage.transaction."""
+
+    def test_single_write_per_transaction(self, data_path, monkeypatch):
+        """Вложенные вызовы методов пишут файл один раз при выходе."""
+        import app.services.storage_backends as storage_module
+
+        storage = Storage(data_path)
+        writes = []
+        original = storage_module.atomic_write
+        monkeypatch.setattr(storage_module, 'atomic_write',
+                            lambda path, data: (writes.append(path), original(path, data)))
+
+        with storage.transaction():
+            for tg_id in range(1, 8):
+                storage.enqueue(tg_id)
+            assert writes == []
+        assert len(writes) == 1
+        assert Storage(data_path).get_queue_size() == 7
+
+    def test_rollback_on_exception(self, data_path):
+        """Исключение внутри транзакции откатывает изменения."""
+        storage = Storage(data_path)
+        storage.enqueue(1)
+
+        with pytest.raises(RuntimeError):
+            with storage.transaction() as store:
+                store['queue'].append('2')
+                storage.set_user_status(1, 'teamed', 'C-1')
+                raise RuntimeError('boom')
+
+        assert storage.get_queue_size() == 1
+        assert storage.get_user(1) is None
+
+    def test_caught_nested_failure_rolls_back_outer(self, data_path):
+        """Перехваченная ошибка вложенной транзакции не дает зафиксировать ее частичные изменения."""
+        storage = Storage(data_path)
+        storage.enqueue(1)
+
+        with pytest.raises(TransactionAbortedError) as excinfo:
+            with storage.transaction() as store:
+                store['queue'].append('2')
+                try:
+                    with storage.transaction() as inner:
+                        inner['queue'].append('3')
+                        raise ValueError('сбой')
+                except ValueError:
+                    pass
+
+        assert isinstance(excinfo.value.__cause__, ValueError)
+        assert storage.load()['queue'] == ['1']
+        # Следующая транзакция работает как обычно
+        storage.enqueue(4)
+        assert Storage(data_path).load()['queue'] == ['1', '4']
+
+    def test_corrupted_store_is_not_overwritten(self, data_path):
+        """Транзакция над поврежденными данными не открывается и не затирает файл."""
+        storage = Storage(data_path)
+        storage.enqueue(1)
+        with open(data_path, 'w', encoding='utf-8') as f:
+            f.write('{"queue": ["1"')
+
+        # Чтение видит пустой Store, но не пишет его
+        assert storage.get_queue_size() == 0
+        with pytest.raises(StoreCorruptedError):
+            with storage.transaction() as store:
+                store['queue'].append('2')
+        with pytest.raises(StoreCorruptedError):
+            storage.enqueue(3)
+
+        with open(data_path, encoding='utf-8') as f:
+            assert f.read() == '{"queue": ["1"'
+
+    def test_create_teams(self, data_path):
+        """create_teams создает команды и убирает участников из очереди."""
+        storage = Storage(data_path)
+        for tg_id in range(1, 8):
+            storage.enqueue(tg_id)
+
+        created = storage.create_teams([['1', '2', '3'], ['4', '5', '6']])
+
+        assert created == ['C-1', 'C-2']
+        assert storage.load()['queue'] == ['7']
+        assert storage.get_user(4)['team_id'] == 'C-2'
+        assert storage.get_user(4)['status'] == 'teamed'
+
+    def test_legacy_int_queue_is_normalized(self, data_path):
+        """Числовые ID в очереди из старых данных приводятся к строкам."""
+        with open(data_path, 'w', encoding='utf-8') as f:
+            json.dump({'queue': [1, '2', '1'], 'users': {}, 'teams': {}}, f)
+
+        storage = Storage(data_path)
+        assert storage.get_queue_position(1) == 0
+        assert storage.get_queue_size() == 2
+        assert storage.load()['queue'] == ['1', '2']
+
+
+class TestStats:
+    """Тесты для инкрементально поддерживаемых агрегатов."""
+
+    def test_stats_follow_mutations(self, data_path):
+        """Агрегаты после серии изменений совпадают с полным пересчетом."""
+        storage = Storage(data_path)
+        for tg_id in range(1, 9):
+            storage.update_user(tg_id, full_name=f'Участник {tg_id}')
+            storage.enqueue(tg_id)
+        storage.create_teams([['1', '2', '3'], ['4', '5', '6', '7']])
+        storage.remove_from_team('C-2', 7)
+        storage.set_user_status(7, 'waiting')
+        with storage.transaction() as store:
+            store['teams']['C-1']['status'] = 'archived'
+
+        stats = storage.get_stats()
+        assert stats == compute_stats(storage.load())
+        assert stats['queue_size'] == 1
+        assert stats['users_by_status'] == {'waiting': 2, 'teamed': 6}
+        assert stats['active_teams'] == 1
+        assert storage.get_active_teams_avg_size() == 3.0
+
+    def test_stats_are_persisted(self, data_path):
+        """Агрегаты записываются вместе с данными и не пересчитываются при чтении."""
+        storage = Storage(data_path)
+        storage.update_user(1, full_name='Иван')
+        storage.enqueue(1)
+
+        with open(data_path, encoding='utf-8') as f:
+            data = json.load(f)
+        assert data['stats']['queue_size'] == 1
+        assert data['stats']['users_total'] == 1
+
+    def test_legacy_data_without_stats(self, data_path):
+        """Для данных без агрегатов они считаются при чтении."""
+        with open(data_path, 'w', encoding='utf-8') as f:
+            json.dump({'queue': ['1'], 'users': {'1': {'tg_id': 1, 'status': 'waiting'}},
+                       'teams': {'C-1': {'members': [2, 3], 'status': 'active'}}}, f)
+
+        storage = Storage(data_path)
+        assert storage.get_active_teams_count() == 1
+        assert storage.get_stats()['users_by_status'] == {'waiting': 1}
+
+    def test_rollback_keeps_stats(self, data_path):
+        """Откаченная транзакция не меняет агрегаты."""
+        storage = Storage(data_path)
+        storage.update_user(1, full_name='Иван')
+        with pytest.raises(RuntimeError):
+            with storage.transaction():
+                storage.set_user_status(1, 'teamed', 'C-1')
+                raise RuntimeError('boom')
+        storage.enqueue(1)
+        assert storage.get_stats()['users_by_status'] == {'waiting': 1}
+
+
+def _enqueue_many(data_path, start, count):
+    """Добавляет в очередь count пользователей (запускается в отдельном процессе)."""
+    storage = Storage(data_path)
+    for tg_id in range(start, start + count):
+        storage.enqueue(tg_id)
+
+
+class TestConcurrency:
+    """Тесты для межпроцессной блокировки и версий хранилища."""
+
+    def test_version_grows_on_commit(self, data_path):
+        """Версия растет при каждой фиксации с изменениями."""
+        storage = Storage(data_path)
+        version = storage.get_version()
+        storage.enqueue(1)
+        storage.enqueue(1)  # уже в очереди - изменений нет
+        with storage.transaction():
+            pass
+        assert storage.get_version() == version + 1
+
+    def test_stale_save_is_rejected(self, data_path):
+        """save() данных, прочитанных до чужой записи, отклоняется."""
+        storage = Storage(data_path)
+        stale = storage.load()
+        storage.enqueue(1)
+
+        stale['queue'].append('2')
+        with pytest.raises(StoreConflictError):
+            storage.save(stale)
+        assert storage.load()['queue'] == ['1']
+
+    def test_update_retries_on_conflict(self, data_path):
+        """update() повторяет изменение на свежих данных после конфликта."""
+        storage = Storage(data_path)
+        calls = []
+
+        def mutate(store):
+            calls.append(1)
+            if len(calls) == 1:
+                # Другой писатель успевает изменить хранилище
+                storage.enqueue(1)
+            store['queue'].append('2')
+
+        storage.update(mutate)
+        assert len(calls) == 2
+        assert storage.load()['queue'] == ['1', '2']
+
+    def test_processes_do_not_lose_updates(self, data_path):
+        """Одновременные записи из нескольких процессов не теряются."""
+        Storage(data_path)
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=_enqueue_many, args=(data_path, i * 100, 25))
+                     for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+        assert Storage(data_path).get_queue_size() == 100
+
+    def test_file_lock_timeout(self, tmp_path):
+        """Занятая другим владельцем блокировка дает TimeoutError по таймауту."""
+        path = str(tmp_path / 'data.json.lock')
+        with FileLock(path):
+            with pytest.raises(TimeoutError):
+                FileLock(path, timeout=0.05).acquire()
+
+
+class TestSqliteBackend:
+    """Тесты для SQLite-бэкенда."""
+
+    @pytest.fixture
+    def sqlite_storage(self, data_path, monkeypatch):
+        monkeypatch.setenv('STORAGE_BACKEND', 'sqlite')
+        return Storage(data_path)
+
+    def test_round_trip(self, sqlite_storage, data_path):
+        """Данные, записанные через Storage, читаются из базы заново."""
+        sqlite_storage.update_user(1, full_name='Иван Иванов', username='ivan')
+        for tg_id in (3, 1, 2):
+            sqlite_storage.enqueue(tg_id)
+        team_id = sqlite_storage.create_team([3, 1])
+        sqlite_storage.remove_from_queue(1)
+
+        backend = SqliteBackend(sqlite_storage.backend.path)
+        store = backend.read()
+        backend.close()
+
+        assert not os.path.exists(data_path)
+        assert store['users']['1']['full_name'] == 'Иван Иванов'
+        assert store['queue'] == ['3', '2']
+        assert store['teams'][team_id]['members'] == [3, 1]
+        assert store['counters']['teamSeq'] == 1
+
+    def test_writes_only_touched_rows(self, sqlite_storage):
+        """Обновление пользователя не трогает строки других пользователей."""
+        sqlite_storage.update_user(1, full_name='А')
+        sqlite_storage.update_user(2, full_name='Б')
+        conn = sqlite_storage.backend.conn
+        before = conn.total_changes
+        sqlite_storage.update_user(2, full_name='В')
+        # Одна строка пользователя, версия и служебная отметка в meta
+        assert conn.total_changes - before == 3
+
+    def test_queue_changes_are_incremental(self, sqlite_storage):
+        """Добавление в очередь не переписывает остальные её строки."""
+        for tg_id in range(1, 6):
+            sqlite_storage.enqueue(tg_id)
+        conn = sqlite_storage.backend.conn
+        before = conn.total_changes
+        with sqlite_storage.transaction() as store:
+            store['queue'].appendleft('9')
+            store['queue'].remove('3')
+        # Две строки очереди, версия очереди в counters, версия и служебная отметка в meta
+        assert conn.total_changes - before == 5
+
+        backend = SqliteBackend(sqlite_storage.backend.path)
+        assert backend.read()['queue'] == ['9', '1', '2', '4', '5']
+        backend.close()
+
+    def test_cohort_queue_changes_are_incremental(self, sqlite_storage):
+        """Очереди когорт лежат в таблице очереди и тоже пишутся по строкам."""
+        for tg_id in range(1, 6):
+            sqlite_storage.enqueue(tg_id, cohort='hack')
+        sqlite_storage.enqueue(9)
+        conn = sqlite_storage.backend.conn
+        before = conn.total_changes
+        sqlite_storage.remove_from_queue(3, cohort='hack')
+        # Строка очереди, версия очереди в counters, агрегаты, версия и служебная отметка в meta
+        assert conn.total_changes - before == 5
+
+        backend = SqliteBackend(sqlite_storage.backend.path)
+        store = backend.read()
+        backend.close()
+        assert store['queue.hack'] == ['1', '2', '4', '5']
+        assert store['queue'] == ['9']
+
+    def test_legacy_queue_table_is_migrated(self, tmp_path):
+        """База со старой таблицей очереди и очередями когорт в meta переводится на колонку cohort."""
+        import sqlite3
+
+        db_path = str(tmp_path / 'legacy.db')
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE queue (tg_id TEXT PRIMARY KEY, position INTEGER NOT NULL);
+            CREATE INDEX idx_queue_position ON queue(position);
+            CREATE TABLE meta (key TEXT PRIMARY KEY, data TEXT NOT NULL);
+            INSERT INTO queue VALUES ('1', 1), ('2', 2);
+            INSERT INTO meta VALUES ('queue.hack', '["7", "8"]'), ('__initialized__', 'true');
+        """)
+        conn.commit()
+        conn.close()
+
+        backend = SqliteBackend(db_path)
+        store = backend.read()
+        meta_keys = {key for (key,) in backend.conn.execute('SELECT key FROM meta')}
+        backend.close()
+        assert store['queue'] == ['1', '2']
+        assert store['queue.hack'] == ['7', '8']
+        assert meta_keys == {'__initialized__'}
+
+    def test_indexes_exist(self, sqlite_storage):
+        """Созданы индексы по статусам, позиции в очереди и ответам."""
+        names = {row[0] for row in sqlite_storage.backend.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'idx_users_status', 'idx_queue_position',
+                'idx_teams_status', 'idx_questions_answered'} <= names
+
+    def test_import_json_file(self, data_path, tmp_path):
+        """Импорт переносит все коллекции data.json в базу."""
+        json_storage = Storage(data_path)
+        json_storage.update_user(7, full_name='Имя')
+        json_storage.enqueue(7)
+        json_storage.create_question(7, 'user', 'Вопрос?')
+
+        db_path = str(tmp_path / 'data.db')
+        counts = import_json_file(data_path, db_path)
+
+        backend = SqliteBackend(db_path)
+        store = backend.read()
+        backend.close()
+        assert counts == {'users': 1, 'teams': 0, 'queue': 1, 'questions': 1}
+        assert store['queue'] == ['7']
+        assert store['questions']['Q-1']['text'] == 'Вопрос?'
+        assert store['counters']['questionSeq'] == 1
+
+
+class TestJournalBackend:
+    """Тесты для режима журнала поверх JSON-снимка."""
+
+    @pytest.fixture
+    def journal_storage(self, data_path, monkeypatch):
+        monkeypatch.setenv('STORAGE_BACKEND', 'journal')
+        return Storage(data_path)
+
+    def test_mutations_append_to_journal(self, journal_storage, data_path):
+        """Изменения дописываются в журнал, снимок не переписывается."""
+        snapshot_before = open(data_path, encoding='utf-8').read()
+        journal_storage.update_user(1, full_name='Иван')
+        journal_storage.enqueue(1)
+
+        assert open(data_path, encoding='utf-8').read() == snapshot_before
+        lines = open(journal_storage.backend.journal_path, encoding='utf-8').read().splitlines()
+        assert len(lines) == 2
+        ops = json.loads(lines[0])
+        assert ['users', '1', {'tg_id': 1, 'status': 'waiting', 'full_name': 'Иван'}] in ops
+        assert ['version', None, 1] in ops
+
+    def test_append_is_fsynced(self, journal_storage, monkeypatch):
+        """Строка журнала сбрасывается на диск до завершения фиксации."""
+        import app.services.storage_backends as storage_module
+
+        synced = []
+        original = os.fsync
+        monkeypatch.setattr(storage_module.os, 'fsync', lambda fd: (synced.append(fd), original(fd)))
+        journal_storage.enqueue(1)
+        assert len(synced) == 1
+
+    def test_replay_over_snapshot(self, journal_storage, data_path):
+        """Новый процесс видит состояние снимка с проигранным журналом."""
+        journal_storage.update_user(1, full_name='Иван')
+        journal_storage.enqueue(1)
+        journal_storage.enqueue(2)
+        journal_storage.remove_from_queue(1)
+
+        store = JournalBackend(data_path).read()
+        assert store['queue'] == ['2']
+        assert store['users']['1']['full_name'] == 'Иван'
+
+    def test_queue_ops_are_logged(self, journal_storage, data_path):
+        """Очередь пишется в журнал операциями, а не целым списком."""
+        for tg_id in range(1, 4):
+            journal_storage.enqueue(tg_id)
+        with journal_storage.transaction() as store:
+            store['queue'].extendleft(['7', '8'])
+        journal_storage.remove_from_queue(2)
+
+        lines = open(journal_storage.backend.journal_path, encoding='utf-8').read().splitlines()
+        assert ['queue', None, 'remove', '2'] in json.loads(lines[-1])
+        assert JournalBackend(data_path).read()['queue'] == ['7', '8', '1', '3']
+
+    def test_torn_last_line_is_ignored(self, journal_storage, data_path):
+        """Оборванная последняя строка журнала не ломает чтение."""
+        journal_storage.enqueue(1)
+        with open(journal_storage.backend.journal_path, 'a', encoding='utf-8') as f:
+            f.write('[["queue", null, ["1", "2"')
+
+        assert JournalBackend(data_path).read()['queue'] == ['1']
+
+    def test_compaction_folds_journal(self, data_path):
+        """Превышение порога сворачивает журнал в снимок."""
+        backend = JournalBackend(data_path, compact_threshold=200)
+        storage = Storage(data_path)
+        storage._cache.backend = storage.backend = backend
+        storage._cache.invalidate()
+
+        for tg_id in range(20):
+            storage.update_user(tg_id, full_name=f'Участник {tg_id}')
+            if backend._compactor is not None:
+                backend._compactor.join()
+
+        with open(data_path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        journal_lines = open(backend.journal_path, encoding='utf-8').read().splitlines()
+        assert len(snapshot['users']) + len(journal_lines) >= 20
+        assert len(journal_lines) < 20
+        assert len(JournalBackend(data_path).read()['users']) == 20
+
+
+    def test_compaction_keeps_lines_after_snapshot(self, journal_storage, data_path):
+        """Строки, дописанные после снятия копии, остаются в журнале."""
+        backend = journal_storage.backend
+        journal_storage.enqueue(1)
+        snapshot = journal_storage.load()
+        offset = os.path.getsize(backend.journal_path)
+        inode = os.stat(backend.journal_path).st_ino
+        journal_storage.enqueue(2)
+
+        backend._compact(snapshot, inode, offset)
+
+        assert json.load(open(data_path, encoding='utf-8'))['queue'] == ['1']
+        assert JournalBackend(data_path).read()['queue'] == ['1', '2']
+
+    def test_stale_compaction_is_skipped(self, journal_storage, data_path):
+        """Компактор не перезаписывает снимок, если журнал уже свернул другой процесс."""
+        backend = journal_storage.backend
+        journal_storage.enqueue(1)
+        stale = journal_storage.load()
+        inode = os.stat(backend.journal_path).st_ino
+        offset = os.path.getsize(backend.journal_path)
+
+        journal_storage.enqueue(2)
+        backend._compact(journal_storage.load(), inode, os.path.getsize(backend.journal_path))
+        journal_storage.enqueue(3)
+        backend._compact(stale, inode, offset)
+
+        assert json.load(open(data_path, encoding='utf-8'))['queue'] == ['1', '2']
+        assert JournalBackend(data_path).read()['queue'] == ['1', '2', '3']
+
+
+class TestShardedBackend:
+    """Тесты для хранения коллекций в отдельных файлах."""
+
+    @pytest.fixture
+    def sharded_storage(self, data_path, monkeypatch):
+        monkeypatch.setenv('STORAGE_BACKEND', 'shards')
+        return Storage(data_path)
+
+    def _files(self, backend):
+        with open(backend.manifest_path, encoding='utf-8') as f:
+            return json.load(f)['files']
+
+    def test_only_touched_shard_is_rewritten(self, sharded_storage):
+        """Изменение очереди не переписывает файлы других коллекций."""
+        sharded_storage.update_user(1, full_name='Иван')
+        before = self._files(sharded_storage.backend)
+
+        # Пользователя 2 нет в users - меняется только очередь (и ее версия в counters)
+        sharded_storage.enqueue(2)
+
+        after = self._files(sharded_storage.backend)
+        changed = {name for name in after if after[name] != before.get(name)}
+        assert changed == {'queue', 'counters', 'stats', 'version'}
+        assert sorted(os.listdir(sharded_storage.backend.path)) == sorted(['MANIFEST', *after.values()])
+        assert ShardedBackend(sharded_storage.backend.path).read()['queue'] == ['2']
+
+    def test_imports_existing_json(self, data_path, monkeypatch):
+        """При первом запуске data.json раскладывается по файлам коллекций."""
+        Storage(data_path).update_user(3, full_name='Анна')
+
+        monkeypatch.setenv('STORAGE_BACKEND', 'shards')
+        storage = Storage(data_path)
+        assert storage.get_user(3)['full_name'] == 'Анна'
+        assert os.path.exists(os.path.join(storage.backend.path, 'users.json'))
+        assert os.path.exists(storage.backend.manifest_path)
+
+    def test_failed_commit_keeps_previous_generation(self, sharded_storage, monkeypatch):
+        """Сбой посреди фиксации не оставляет на диске смесь старых и новых коллекций."""
+        import app.services.storage_backends as storage_module
+
+        sharded_storage.update_user(1, full_name='Иван')
+        sharded_storage.enqueue(1)
+        original = storage_module.atomic_write
+
+        def failing_write(path, data, fsync=False):
+            if os.path.basename(path).startswith('queue.'):
+                raise OSError('disk full')
+            original(path, data, fsync)
+
+        monkeypatch.setattr(storage_module, 'atomic_write', failing_write)
+        with pytest.raises(OSError):
+            sharded_storage.create_teams([[1]])
+        monkeypatch.setattr(storage_module, 'atomic_write', original)
+
+        store = ShardedBackend(sharded_storage.backend.path).read()
+        assert store['users']['1']['status'] == 'waiting'
+        assert store['queue'] == ['1']
+        assert store['teams'] == {}
+
+        sharded_storage.create_teams([[1]])
+        store = ShardedBackend(sharded_storage.backend.path).read()
+        assert store['users']['1']['status'] == 'teamed'
+        assert store['queue'] == []
+
+    def test_legacy_directory_without_manifest(self, sharded_storage):
+        """Каталог, созданный до манифеста, читается и получает манифест при первой фиксации."""
+        backend = sharded_storage.backend
+        sharded_storage.update_user(1, full_name='Иван')
+        for name in self._files(backend).values():
+            collection = name.split('.')[0]
+            os.replace(os.path.join(backend.path, name), os.path.join(backend.path, collection + '.json'))
+        os.unlink(backend.manifest_path)
+
+        legacy = ShardedBackend(backend.path)
+        assert legacy.read()['users']['1']['full_name'] == 'Иван'
+        sharded_storage._cache.invalidate()
+        sharded_storage.enqueue(1)
+        store = ShardedBackend(backend.path).read()
+        assert store['users']['1']['full_name'] == 'Иван'
+        assert store['queue'] == ['1']
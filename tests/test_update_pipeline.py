@@ -0,0 +1,164 @@
+"""
+Unit-тесты для конвейера обработки обновлений.
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from aiogram import Bot, Router
+from aiogram.types import Update
+
+from app.services.update_pipeline import PipelineDispatcher, UpdatePipeline, update_chat_id
+
+
+def make_update(update_id, chat_id, text='hi'):
+    """Текстовое сообщение от пользователя chat_id в личном чате."""
+    return Update.model_validate({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(datetime.now().timestamp()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Тест'},
+            'text': text,
+        },
+    })
+
+
+class TestUpdatePipeline:
+    """Тесты для UpdatePipeline."""
+
+    def test_ordered_within_chat_parallel_across_chats(self):
+        log = []
+        active = set()
+        overlap = []
+
+        async def process(chat_id, n):
+            if active:
+                overlap.append((chat_id, n))
+            active.add((chat_id, n))
+            await asyncio.sleep(0.01 if chat_id == 1 else 0)
+            active.discard((chat_id, n))
+            log.append((chat_id, n))
+
+        pipeline = UpdatePipeline(process, workers=4)
+
+        async def scenario():
+            for n in range(5):
+                for chat_id in (1, 2):
+                    await pipeline.submit(chat_id, chat_id, n)
+            await pipeline.join()
+
+        asyncio.run(scenario())
+        for chat_id in (1, 2):
+            assert [n for c, n in log if c == chat_id] == list(range(5))
+        # Быстрый чат не ждет медленный
+        assert log.index((2, 4)) < log.index((1, 4))
+        assert overlap
+
+    def test_slow_chat_blocks_only_itself(self):
+        done = []
+
+        async def scenario():
+            gate = asyncio.Event()
+
+            async def process(chat_id):
+                if chat_id == 1:
+                    await gate.wait()
+                done.append(chat_id)
+
+            pipeline = UpdatePipeline(process, workers=2)
+            await pipeline.submit(1, 1)
+            for chat_id in (2, 3, 4):
+                await pipeline.submit(chat_id, chat_id)
+            await asyncio.sleep(0.01)
+            assert sorted(done) == [2, 3, 4]
+            assert pipeline.stats()['busy'] == 1
+            gate.set()
+            await pipeline.join()
+
+        asyncio.run(scenario())
+        assert done[-1] == 1
+
+    def test_bounded_queue_and_metrics(self):
+        async def scenario():
+            gate = asyncio.Event()
+
+            async def process(n):
+                await gate.wait()
+
+            pipeline = UpdatePipeline(process, workers=1, queue_size=3)
+            for n in range(3):
+                await pipeline.submit(7, n)
+            stats = pipeline.stats()
+            assert (stats['queued'], stats['chats'], stats['max_chat_queue']) == (3, 1, 3)
+
+            # Конвейер полон - прием ждет освобождения места
+            blocked = asyncio.create_task(pipeline.submit(7, 3))
+            await asyncio.sleep(0.01)
+            assert not blocked.done()
+
+            gate.set()
+            await blocked
+            await pipeline.join()
+            return pipeline.stats()
+
+        stats = asyncio.run(scenario())
+        assert (stats['queued'], stats['processed'], stats['max_queued']) == (0, 4, 3)
+
+    def test_errors_do_not_stop_chat(self):
+        log = []
+
+        async def process(n):
+            if n == 0:
+                raise RuntimeError('сбой обработчика')
+            log.append(n)
+
+        pipeline = UpdatePipeline(process, workers=1)
+
+        async def scenario():
+            for n in range(3):
+                await pipeline.submit(1, n)
+            await pipeline.join()
+
+        asyncio.run(scenario())
+        assert log == [1, 2]
+        assert pipeline.stats()['failed'] == 1
+
+
+class TestPipelineDispatcher:
+    """Тесты для PipelineDispatcher."""
+
+    def test_chat_id(self):
+        assert update_chat_id(make_update(1, 42)) == 42
+
+    def test_feed_update_goes_through_pipeline(self):
+        bot = Bot('123456:TEST')
+        dp = PipelineDispatcher(workers=2)
+        router = Router()
+        handled = []
+
+        @router.message()
+        async def handler(message):
+            await asyncio.sleep(0.01 if message.chat.id == 1 else 0)
+            handled.append((message.chat.id, message.message_id))
+
+        dp.include_router(router)
+
+        async def scenario():
+            updates = [make_update(1, 1), make_update(2, 2), make_update(3, 1), make_update(4, 2)]
+            for update in updates:
+                assert await dp.feed_update(bot, update) is None
+            # feed_update не ждет обработчиков
+            assert len(handled) < 4
+            await dp.pipeline.join()
+            await bot.session.close()
+
+        asyncio.run(scenario())
+        assert [m for c, m in handled if c == 1] == [1, 3]
+        assert [m for c, m in handled if c == 2] == [2, 4]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
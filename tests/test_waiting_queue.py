@@ -0,0 +1,78 @@
+"""
+Unit-тесты для очереди ожидания.
+"""
+
+import json
+import random
+
+import pytest
+from app.services.waiting_queue import WaitingQueue
+from app.services.util import json_default
+
+
+class TestWaitingQueue:
+    """Тесты для WaitingQueue."""
+
+    def test_fifo_order_and_positions(self):
+        """Порядок и позиции совпадают с обычным списком."""
+        queue = WaitingQueue(['1', '2', '3'])
+        queue.append('4')
+        queue.appendleft('0')
+        queue.remove('2')
+
+        assert list(queue) == ['0', '1', '3', '4']
+        assert queue.index('3') == 2
+        assert queue[0] == '0' and queue[-1] == '4'
+        assert queue[:2] == ['0', '1']
+        assert '2' not in queue
+        assert len(queue) == 4
+
+    def test_duplicates_rejected(self):
+        """Элемент не может оказаться в очереди дважды."""
+        queue = WaitingQueue(['1', '2', '1'])
+        assert list(queue) == ['1', '2']
+        with pytest.raises(ValueError):
+            queue.append('2')
+        with pytest.raises(ValueError):
+            queue.remove('3')
+
+    def test_extendleft_keeps_order(self):
+        """extendleft добавляет группу в начало в исходном порядке."""
+        queue = WaitingQueue(['3'])
+        queue.extendleft(['1', '2'])
+        assert queue == ['1', '2', '3']
+
+    def test_serializes_as_list(self):
+        """В JSON очередь пишется обычным списком."""
+        queue = WaitingQueue(['1', '2'])
+        assert json.dumps({'queue': queue}, default=json_default) == '{"queue": ["1", "2"]}'
+
+    def test_matches_list_on_random_operations(self):
+        """Случайная последовательность операций дает тот же результат, что и список."""
+        rng = random.Random(42)
+        queue = WaitingQueue()
+        reference = []
+        for step in range(3000):
+            action = rng.random()
+            if action < 0.4 or not reference:
+                item = str(step)
+                if rng.random() < 0.5:
+                    queue.append(item)
+                    reference.append(item)
+                else:
+                    queue.appendleft(item)
+                    reference.insert(0, item)
+            else:
+                item = rng.choice(reference)
+                assert queue.index(item) == reference.index(item)
+                queue.remove(item)
+                reference.remove(item)
+            assert len(queue) == len(reference)
+
+        assert list(queue) == reference
+        for position, item in enumerate(reference):
+            assert queue[position] == item
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])